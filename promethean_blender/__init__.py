@@ -1,18 +1,50 @@
 
 from multiprocessing import current_process
+import sys
+import time
+
+# Importing and registering the add-on should stay under this, it's part of blender's startup time.
+# Heavy modules (numpy, gpu, bmesh and the command modules) are imported when first used instead, see command_manager.command_dictionary
+import_time_budget_ms = 100.0
+# Modules which shouldn't be imported just by enabling the add-on
+heavy_modules = ('numpy', 'gpu', 'gpu_extras', 'bmesh')
+
+import_start = time.perf_counter()
+modules_before_import = set(sys.modules)
 
 # Check to make sure we are in the main process, 
 # subprocesses will automatically call __init__.py, but does not have access to blender's api
 # this check makes sure that subprocesses never try to access blender's api
 if current_process().name == 'MainProcess':
     from .operators import drag_drop_modal, server_manager
-    from . import side_panel
+    from . import side_panel, log
     #from . import side_panel
 
+import_time_ms = (time.perf_counter() - import_start) * 1000.0
+
+def report_import_time(register_times):
+    """Logs how long importing and registering the add-on took, and which heavy modules it imported"""
+    imported = set(sys.modules) - modules_before_import
+    heavy = [name for name in heavy_modules if name in imported]
+    register_time_ms = sum(register_times.values())
+    total_ms = import_time_ms + register_time_ms
+
+    log.info("Add-on imported in %.1f ms (%s modules) and registered in %.1f ms (%s)", import_time_ms, len(imported), register_time_ms,
+             ", ".join(name + " %.1f ms" % time_ms for name, time_ms in register_times.items()))
+
+    if heavy:
+        log.warning("Enabling the add-on imported %s, import them where they're used instead", ", ".join(heavy))
+    if total_ms > import_time_budget_ms:
+        log.warning("Add-on import and register took %.1f ms, over the %.1f ms budget", total_ms, import_time_budget_ms)
+
 def register():
-    server_manager.register()
-    drag_drop_modal.register()
-    side_panel.register()
+    register_times = {}
+    for module in (server_manager, drag_drop_modal, side_panel):
+        start = time.perf_counter()
+        module.register()
+        register_times[module.__name__.rpartition('.')[2]] = (time.perf_counter() - start) * 1000.0
+
+    report_import_time(register_times)
 
 
 def unregister():
@@ -0,0 +1,395 @@
+# Benchmarks every command in command_manager.command_dictionary against synthetic scenes, and writes the timings to a json file.
+# Example usage:
+# blender --background --factory-startup --python "D:\Source Codes\Git\PrometheanAI\background_tasks\benchmark_task.py" -- --output "D:\benchmarks\results.json"
+#
+# Fewer or larger scenes, and only some commands:
+# blender --background --factory-startup --python "D:\Source Codes\Git\PrometheanAI\background_tasks\benchmark_task.py" -- --output "D:\benchmarks\results.json" --sizes 1000,50000 --commands get_transform_data,learn --repeat 10
+#
+# Notice:
+# '--factory-startup' is used to avoid the user default settings from
+#                     interfering with automated scene generation.
+#
+# '--' causes blender to ignore all following arguments so python can use them.
+#
+# See blender --help for details.
+#
+# There is no 3D viewport in background mode, so commands which need one (eg: get_camera_info) are timed, but report what they return without one.
+#
+# Commands run through command_manager.do_command with the object and spatial indexes registered, as they do in the add-on.
+# Each scene is saved once it is built, and loaded again before a command runs after one which changed it, so every command
+# is timed against the scene as it was built.
+
+import bpy
+import sys
+import os
+import json
+import time
+import math
+import random
+import shutil
+import tempfile
+import importlib
+from os.path import dirname, abspath, basename
+
+#The commands use relative imports, so the PrometheanAI directory is imported as a package
+addon_dir = dirname(dirname(abspath(__file__)))
+sys.path.append(dirname(addon_dir))
+
+command_manager = importlib.import_module(basename(addon_dir) + '.command_manager')
+command_arguments = importlib.import_module(basename(addon_dir) + '.command_arguments')
+
+# Registered while the benchmarks run, like the add-on does when the server starts, see operators/server_manager.py
+indexes = [importlib.import_module(basename(addon_dir) + '.' + name) for name in ("object_index", "spatial_index", "raycast")]
+
+# Commands which aren't timed: they open files or other processes, wait for the user, or control the server itself
+skipped_commands = {
+    "open_scene", "save_current_scene", "screenshot", "learn_file", "create_assets_from_selection", "add_mesh_on_selection",
+    "set_mesh", "set_mesh_on_selection", "drop_asset", "start_dragging_asset", "asset_drop_finished", "kill", "internal_server_error",
+    "start_job", "get_job", "await_job", "profile_next", "profile_command", "get_profiles", "start_recording", "stop_recording", "get_logs", "set_log_level",
+    "start_simulation", "cancel_simulation", "end_simulation", "enable_simulation_on_objects",
+}
+
+class Scene:
+    """A synthetic scene, and the object names used to build command parameters"""
+    def __init__(self, name, objects):
+        self.name = name
+        self.objects = objects
+        self.names = [object.name for object in objects]
+        self.sample = []
+        self.output_dir = tempfile.mkdtemp(prefix='promethean_benchmark_')
+        self.blend_path = os.path.join(self.output_dir, name + '.blend')
+        # Whether a command changed the scene since it was last loaded
+        self.changed = False
+
+    def sample_names(self, count):
+        random.seed(0)
+        self.sample = random.sample(self.names, min(count, len(self.names)))
+
+    def save(self):
+        bpy.ops.wm.save_as_mainfile(filepath=self.blend_path, copy=True)
+
+    def load(self):
+        # The indexes are reset by their load_post handlers
+        bpy.ops.wm.open_mainfile(filepath=self.blend_path)
+        self.changed = False
+
+    def remove(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+def clear_scene():
+    for object in list(bpy.data.objects):
+        bpy.data.objects.remove(object)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+
+def create_cube_mesh(name):
+    mesh = bpy.data.meshes.new(name)
+    verts = [(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (0.0, 1.0)]
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
+    return mesh
+
+def set_selection_and_visibility(objects, selected_fraction=0.1, hidden_fraction=0.1):
+    random.seed(0)
+    for object in objects:
+        value = random.random()
+        if value < hidden_fraction:
+            object.hide_set(True)
+        elif value < hidden_fraction + selected_fraction:
+            object.select_set(True)
+
+def create_camera():
+    camera_data = bpy.data.cameras.new("BenchmarkCamera")
+    camera = bpy.data.objects.new("BenchmarkCamera", camera_data)
+    bpy.context.scene.collection.objects.link(camera)
+    camera.location = (0.0, -50.0, 30.0)
+    camera.rotation_euler = (math.radians(60.0), 0.0, 0.0)
+    bpy.context.scene.camera = camera
+
+def build_flat_scene(count):
+    """count mesh objects on a grid, sharing one mesh"""
+    clear_scene()
+    mesh = create_cube_mesh("BenchmarkCube")
+    collection = bpy.context.scene.collection
+
+    side = max(1, int(math.ceil(math.sqrt(count))))
+    objects = []
+    for i in range(count):
+        object = bpy.data.objects.new("Mesh_" + str(i), mesh)
+        object.location = ((i % side) * 2.0, (i // side) * 2.0, 0.0)
+        collection.objects.link(object)
+        objects.append(object)
+
+    create_camera()
+    bpy.context.view_layer.update()
+    set_selection_and_visibility(objects)
+    return Scene("flat_" + str(count), objects)
+
+def build_hierarchy_scene(chains, depth):
+    """chains of objects, each parented to the one before it"""
+    clear_scene()
+    mesh = create_cube_mesh("BenchmarkCube")
+    collection = bpy.context.scene.collection
+
+    objects = []
+    for chain in range(chains):
+        parent = None
+        for level in range(depth):
+            object = bpy.data.objects.new("Chain_" + str(chain) + "_" + str(level), mesh)
+            object.location = (chain * 2.0, 0.0, 1.0) if parent is None else (0.0, 0.0, 1.0)
+            object.parent = parent
+            collection.objects.link(object)
+            objects.append(object)
+            parent = object
+
+    create_camera()
+    bpy.context.view_layer.update()
+    set_selection_and_visibility(objects)
+    return Scene("hierarchy_" + str(chains) + "x" + str(depth), objects)
+
+def build_high_poly_scene(count, subdivisions):
+    """a few dense ico spheres"""
+    clear_scene()
+
+    objects = []
+    for i in range(count):
+        bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=subdivisions, radius=1.0, location=(i * 3.0, 0.0, 1.0))
+        object = bpy.context.active_object
+        object.name = "HighPoly_" + str(i)
+        objects.append(object)
+
+    create_camera()
+    bpy.context.view_layer.update()
+    set_selection_and_visibility(objects, selected_fraction=0.5, hidden_fraction=0.0)
+    return Scene("high_poly_" + str(count) + "x" + str(subdivisions), objects)
+
+def get_command_parameters(command, scene):
+    """Parameters for a command, using the scene's sample of object names"""
+    names = scene.sample
+    names_str = ','.join(names)
+    first = names[0] if names else ''
+
+    parameters = {
+        "get_location_data": names_str,
+        "get_pivot_data": names_str,
+        "get_transform_data": names_str,
+        "get_objects_in_box": json.dumps([[-1000.0, -1000.0, -1000.0], [1000.0, 1000.0, 1000.0]]),
+        "get_overlapping_objects": names_str,
+        "get_nearest_objects": json.dumps([[[0.0, 0.0, 0.0]] + names, 5]),
+        "get_vertex_colors": names_str,
+        "parent": names_str,
+        "unparent": names_str,
+        "set_hidden": names_str,
+        "set_visible": names_str,
+        "select": names_str,
+        "remove": names_str,
+        "remove_descendents": names_str,
+        "rename": first + ',' + first,
+        "get_vertex_data_from_scene_object": first,
+        "get_vertex_data_from_scene_objects": json.dumps(names),
+        "translate": json.dumps([[100.0, 200.0, 0.0], names]),
+        "translate_relative": json.dumps([[1.0, 0.0, 0.0], names]),
+        "scale": json.dumps([[1.0, 1.0, 1.0], names]),
+        "scale_relative": json.dumps([[1.0, 1.0, 1.0], names]),
+        "rotate": json.dumps([[0.0, 0.0, 45.0], names]),
+        "rotate_relative": json.dumps([[0.0, 0.0, 1.0], names]),
+        "translate_and_raytrace": json.dumps([[100.0, 200.0, 500.0], 1000.0, names, []]),
+        "translate_and_snap": json.dumps([[100.0, 200.0, 500.0], 1000.0, 45.0, names, []]),
+        "raytrace": json.dumps([[0.0, 0.0, -1.0], 1000.0, names]),
+        "raytrace_bidirectional": json.dumps([[0.0, 0.0, -1.0], 1000.0, names]),
+        "add_objects": json.dumps({"BenchmarkGroup": {"group": True, "name": "BenchmarkGroup", "location": [0, 0, 0], "rotation": [0, 0, 0], "scale": [1, 1, 1]}}),
+        "add_objects_from_polygons": json.dumps({"name": "BenchmarkPolygons", "points": [[0, 0, 0], [100, 0, 0], [100, 0, 60], [0, 0, 60]]}),
+        "add_objects_from_triangles": json.dumps({"BenchmarkTriangles": {"name": "BenchmarkTriangles", "verts": [[0, 0, 0], [100, 0, 0], [100, 100, 0], [0, 100, 0]], "tri_ids": [[0, 1, 2], [0, 2, 3]]}}),
+        "set_vertex_color": "1.0,0.0,0.0",
+        "select_vertex_color": names_str + " 255,0,0",
+        "set_uv_quadrant": "0 0",
+        "set_metallic": "True False",
+        "set_texture_tiling": "False False",
+        "set_roughness": "0.5",
+        "learn": os.path.join(scene.output_dir, "learn_cache.json") + " False",
+    }
+
+    return parameters.get(command, "")
+
+def get_response_size(response):
+    # Size of what the server sends, commands which return python values are serialized by the server
+    response = command_arguments.serialize_result(response)
+    if isinstance(response, (str, bytes, bytearray)):
+        return len(response)
+    return len(str(response))
+
+def time_command(command, parameters_str, repeat, scene):
+    timings = []
+    result = {}
+
+    for i in range(repeat):
+        if scene.changed:
+            scene.load()
+
+        start = time.perf_counter()
+        try:
+            response = command_manager.do_command(command, parameters_str)
+        except Exception as e:
+            result['error'] = type(e).__name__ + ": " + str(e)
+            break
+        finally:
+            scene.changed |= command not in command_manager.read_only_commands
+        timings.append((time.perf_counter() - start) * 1000.0)
+        result['response_size'] = get_response_size(response)
+
+    if timings:
+        timings.sort()
+        result.update({
+            'runs': len(timings),
+            'min_ms': timings[0],
+            'median_ms': timings[len(timings) // 2],
+            'mean_ms': sum(timings) / len(timings),
+            'max_ms': timings[-1],
+        })
+
+    return result
+
+def benchmark_scene(scene, commands, repeat, sample_size):
+    scene.sample_names(sample_size)
+    results = {}
+
+    for command in commands:
+        parameters_str = get_command_parameters(command, scene)
+        results[command] = time_command(command, parameters_str, repeat, scene)
+
+        timing = results[command]
+        print("PrometheanAI: " + scene.name + " " + command + ": " + (str(round(timing['median_ms'], 3)) + "ms" if 'median_ms' in timing else timing.get('error', '')))
+
+    return results
+
+def run_benchmarks(sizes, hierarchy, high_poly, commands, repeat, sample_size):
+    if commands:
+        unknown = [command for command in commands if command not in command_manager.command_dictionary]
+        if unknown:
+            print("Error: unknown commands: " + ','.join(unknown))
+        commands = [command for command in commands if command in command_manager.command_dictionary]
+    else:
+        commands = [command for command in command_manager.command_dictionary if command not in skipped_commands]
+
+    builders = [lambda size=size: build_flat_scene(size) for size in sizes]
+    builders.append(lambda: build_hierarchy_scene(*hierarchy))
+    builders.append(lambda: build_high_poly_scene(*high_poly))
+
+    results = {
+        'blender_version': bpy.app.version_string,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'repeat': repeat,
+        'sample_size': sample_size,
+        'skipped_commands': sorted(skipped_commands),
+        'scenes': {},
+    }
+
+    for index in indexes:
+        index.register()
+
+    try:
+        for builder in builders:
+            start = time.perf_counter()
+            scene = builder()
+            build_time = time.perf_counter() - start
+
+            print("PrometheanAI: Built " + scene.name + " in " + str(round(build_time, 2)) + "s")
+
+            try:
+                scene.save()
+                scene.load()
+
+                results['scenes'][scene.name] = {
+                    'objects': len(scene.names),
+                    'build_s': build_time,
+                    'commands': benchmark_scene(scene, commands, repeat, sample_size),
+                }
+            finally:
+                scene.remove()
+    finally:
+        for index in indexes:
+            index.unregister()
+
+    return results
+
+def main():
+    import sys       # to get command line args
+    import argparse  # to parse options for us and print a nice help message
+
+    # get the args passed to blender after "--", all of which are ignored by
+    # blender so scripts may receive their own arguments
+    argv = sys.argv
+
+    if "--" not in argv:
+        argv = []  # as if no args are passed
+    else:
+        argv = argv[argv.index("--") + 1:]  # get all args after "--"
+
+    # When --help or no args are given, print this help
+    usage_text = (
+        "Run blender in background mode with this script:"
+        "  blender --background --factory-startup --python " + __file__ + " -- [options]"
+    )
+
+    parser = argparse.ArgumentParser(description=usage_text)
+
+    parser.add_argument(
+        "-o", "--output", dest="output", type=str, required=True,
+        help="Where to write the json results",
+    )
+
+    parser.add_argument(
+        "-s", "--sizes", dest="sizes", type=str, default="100,1000,10000,50000",
+        help="Comma separated object counts of the flat scenes",
+    )
+
+    parser.add_argument(
+        "--hierarchy", dest="hierarchy", type=str, default="20,50",
+        help="Chains and depth of the hierarchy scene, eg: 20,50",
+    )
+
+    parser.add_argument(
+        "--high_poly", dest="high_poly", type=str, default="4,7",
+        help="Object count and ico sphere subdivisions of the high poly scene, eg: 4,7",
+    )
+
+    parser.add_argument(
+        "-c", "--commands", dest="commands", type=str, default="",
+        help="Comma separated commands to time, all commands by default",
+    )
+
+    parser.add_argument(
+        "-r", "--repeat", dest="repeat", type=int, default=5,
+        help="Number of times each command is run",
+    )
+
+    parser.add_argument(
+        "--sample", dest="sample", type=int, default=100,
+        help="Number of object names passed to commands which take a list of objects",
+    )
+
+    args = parser.parse_args(argv)
+
+    if not argv:
+        parser.print_help()
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    hierarchy = [int(x) for x in args.hierarchy.split(',')]
+    high_poly = [int(x) for x in args.high_poly.split(',')]
+    commands = [command for command in args.commands.split(',') if command]
+
+    results = run_benchmarks(sizes, hierarchy, high_poly, commands, args.repeat, args.sample)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+
+    print("PrometheanAI: Benchmark results written to " + args.output)
+
+if __name__ == "__main__":
+    main()
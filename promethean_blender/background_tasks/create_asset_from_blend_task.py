@@ -16,6 +16,12 @@ import os
 import re
 import unicodedata
 import hashlib
+from os.path import dirname, abspath
+
+#Get the PrometheanAI directory and add to path
+sys.path.append(dirname(dirname(abspath(__file__))))
+
+import log
 
 def get_unique_file_path(desired_path):
     """
@@ -64,7 +70,7 @@ def append_object_from_blend_file(file_path, collection, objects=None):
         objects.append(object)
         collection.objects.link(object)
 
-    print(objects)
+    log.debug("Appended objects: %s", log.truncate(objects))
     
     return objects
 
@@ -86,7 +92,7 @@ def make_assets(asset_path, blend_file, asset_names):
     for asset in asset_names:
         #out_path = os.path.join(asset_path, asset, asset + ".blend")
         out_path = asset_name_to_path(asset_path, asset, blend_file)
-        print(out_path)
+        log.debug("Writing asset: %s", out_path)
 
         delete_all()
         objects = append_object_from_blend_file(blend_file, bpy.context.scene.collection, [asset])
@@ -7,7 +7,6 @@
 # See blender --help for details.
 
 
-from gettext import install
 import bpy
 import sys
 
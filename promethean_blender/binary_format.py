@@ -0,0 +1,116 @@
+# Binary encoding for geometry commands, used instead of json by clients which negotiate it with the server.
+#
+# Layout: BINARY_MAGIC, the size of the header as a little endian uint32, the json header, then the array data.
+# The header holds the json value of the message, where each array is replaced by {ARRAY_KEY: index},
+# and a description of each array: its little endian dtype string, shape, and offset from the start of the array data.
+# Arrays start on an 8 byte boundary, so they can be viewed in place without copying.
+
+import json
+import struct
+
+BINARY_MAGIC = b'PRMB'
+HEADER_SIZE = struct.Struct('<I')
+ARRAY_KEY = '__array__'
+ALIGNMENT = 8
+
+ENCODING_JSON = 'json'
+ENCODING_BINARY = 'binary'
+
+# Encoding negotiated by the client which sent the command being run. Set by command_manager
+response_encoding = ENCODING_JSON
+
+def wants_binary():
+    return response_encoding == ENCODING_BINARY
+
+def is_binary(buffer):
+    return bytes(buffer[:len(BINARY_MAGIC)]) == BINARY_MAGIC
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def encode(value):
+    """Encodes a json compatible value, which may contain numpy arrays, to a bytearray"""
+    # Imported when used, commands that never send arrays don't need numpy loaded
+    import numpy
+
+    arrays = []
+
+    def replace_arrays(item):
+        if isinstance(item, numpy.ndarray):
+            arrays.append(numpy.ascontiguousarray(item, dtype=item.dtype.newbyteorder('<')))
+            return {ARRAY_KEY: len(arrays) - 1}
+        if isinstance(item, dict):
+            return {key: replace_arrays(x) for key, x in item.items()}
+        if isinstance(item, (list, tuple)):
+            return [replace_arrays(x) for x in item]
+        return item
+
+    data = replace_arrays(value)
+
+    descriptions = []
+    offset = 0
+    for array in arrays:
+        offset = align(offset)
+        descriptions.append({'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset += array.nbytes
+
+    header = json.dumps({'data': data, 'arrays': descriptions}).encode()
+    data_start = align(len(BINARY_MAGIC) + HEADER_SIZE.size + len(header))
+
+    out = bytearray(data_start + offset)
+    HEADER_SIZE.pack_into(out, len(BINARY_MAGIC), len(header))
+    out[:len(BINARY_MAGIC)] = BINARY_MAGIC
+    out[len(BINARY_MAGIC) + HEADER_SIZE.size:len(BINARY_MAGIC) + HEADER_SIZE.size + len(header)] = header
+
+    view = memoryview(out)
+    for array, description in zip(arrays, descriptions):
+        start = data_start + description['offset']
+        view[start:start + array.nbytes] = array.reshape(-1).view(numpy.uint8)
+
+    return out
+
+def decode(buffer):
+    """Decodes a binary message. Arrays are returned as read only numpy views of the buffer"""
+    import numpy
+
+    if not is_binary(buffer):
+        raise ValueError("Not a binary message")
+
+    header_size, = HEADER_SIZE.unpack_from(buffer, len(BINARY_MAGIC))
+    header_start = len(BINARY_MAGIC) + HEADER_SIZE.size
+    header = json.loads(bytes(buffer[header_start:header_start + header_size]))
+    data_start = align(header_start + header_size)
+
+    arrays = []
+    for description in header['arrays']:
+        dtype = numpy.dtype(description['dtype'])
+        shape = description['shape']
+        count = int(numpy.prod(shape))
+        array = numpy.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + description['offset'])
+        arrays.append(array.reshape(shape))
+
+    def restore_arrays(item):
+        if isinstance(item, dict):
+            if len(item) == 1 and ARRAY_KEY in item:
+                return arrays[item[ARRAY_KEY]]
+            return {key: restore_arrays(x) for key, x in item.items()}
+        if isinstance(item, list):
+            return [restore_arrays(x) for x in item]
+        return item
+
+    return restore_arrays(header['data'])
+
+def load_parameters(parameters):
+    """Parameters of geometry commands are either a json string, or a value already decoded from a binary message"""
+    if isinstance(parameters, str):
+        return json.loads(parameters)
+    return parameters
+
+def encode_response(value, json_value=None):
+    """Encodes a response with the negotiated encoding. json_value builds the json response for clients which don't use binary"""
+    if wants_binary():
+        return encode(value)
+
+    if json_value is not None:
+        return json.dumps(json_value(value))
+    return json.dumps(value, default=lambda x: x.tolist())
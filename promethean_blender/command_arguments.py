@@ -0,0 +1,150 @@
+# Parsing of command parameters and serialization of command results, done in the server process so blender's main thread
+# only runs the bpy work.
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# The server parses text messages into a ParsedMessage before queueing them, commands listed in parameter_formats get their
+# parameters already parsed. Commands return plain python values, which the server turns into json after they come back.
+# Messages the server leaves alone (binary parameters, or parameters that don't parse) reach blender as text like before,
+# so commands accept either form, see load_json and load_list.
+
+import json
+
+from .constants import BATCH_COMMAND
+from .binary_format import BINARY_MAGIC
+
+# How the parameters of a command are parsed. Commands which aren't listed get the parameter string
+JSON = 'json'   # translate [[0, 0, 0], ["Cube", "Cube.001"]]
+LIST = 'list'   # get_location_data Cube,Cube.001
+
+parameter_formats = {
+    "get_location_data": LIST,
+    "get_pivot_data": LIST,
+    "get_transform_data": LIST,
+    "get_overlapping_objects": LIST,
+    "parent": LIST,
+    "unparent": LIST,
+    "rename": LIST,
+    "set_hidden": LIST,
+    "set_visible": LIST,
+    "select": LIST,
+    "remove": LIST,
+    "remove_descendents": LIST,
+    "add_mesh_on_selection": LIST,
+    "get_vertex_colors": LIST,
+    "set_vertex_color": LIST,
+    "enable_simulation_on_objects": LIST,
+    "add_objects": JSON,
+    "add_objects_from_polygons": JSON,
+    "add_objects_from_triangles": JSON,
+    "get_vertex_data_from_scene_objects": JSON,
+    "get_objects_in_box": JSON,
+    "get_nearest_objects": JSON,
+    "translate": JSON,
+    "scale": JSON,
+    "rotate": JSON,
+    "translate_relative": JSON,
+    "scale_relative": JSON,
+    "rotate_relative": JSON,
+    "translate_and_snap": JSON,
+    "translate_and_raytrace": JSON,
+    "set_mesh": JSON,
+    "raytrace": JSON,
+    "raytrace_bidirectional": JSON,
+}
+
+class ParsedMessage:
+    """A message parsed by the server: a list of (command, parameters), and the batch options if the message is a batch"""
+    def __init__(self, commands, batch_options=None):
+        self.commands = commands
+        self.batch_options = batch_options
+
+    def to_text(self):
+        """The message as text again, for the trace recorder"""
+        lines = [BATCH_COMMAND + ' ' + json.dumps(self.batch_options)] if self.batch_options is not None else []
+        for command, parameters in self.commands:
+            lines.append(command + ' ' + format_parameters(command, parameters) if parameters != '' else command)
+        return '\n'.join(lines)
+
+class BatchResults(list):
+    """Results of a batch, one {'command', 'result' or 'error'} dictionary per command. Each result is serialized on its own,
+    so a batch result is the same text the command would have sent alone"""
+
+def load_json(parameters):
+    if isinstance(parameters, str):
+        return json.loads(parameters)
+    return parameters
+
+def load_list(parameters):
+    if isinstance(parameters, str):
+        return parameters.split(',')
+    return parameters
+
+def parse_parameters(command, parameters_str):
+    parameter_format = parameter_formats.get(command)
+    if parameter_format == JSON:
+        return json.loads(parameters_str)
+    if parameter_format == LIST:
+        return parameters_str.split(',')
+    return parameters_str
+
+def format_parameters(command, parameters):
+    parameter_format = parameter_formats.get(command)
+    if parameter_format == JSON:
+        return json.dumps(parameters)
+    if parameter_format == LIST:
+        return ','.join(parameters)
+    return parameters
+
+def split_message(message_str):
+    """Splits a message into a list of (command, parameters) and the batch options, if the message starts with BATCH_COMMAND"""
+    commands = []
+    batch_options = None
+
+    for command_str in message_str.split('\n'):
+        if not command_str:
+            continue
+
+        command, _, command_parameters_str = command_str.partition(' ')
+
+        if not command:
+            continue
+
+        if command == BATCH_COMMAND and not commands and batch_options is None:
+            batch_options = json.loads(command_parameters_str) if command_parameters_str.strip() else {}
+            continue
+
+        commands.append((command, command_parameters_str))
+
+    return commands, batch_options
+
+def parse_message(data):
+    """Parses a text message, used by the server. Returns None for messages left to blender: binary parameters,
+    which need numpy to decode, and parameters which don't parse, so the command reports the error like it always has"""
+    command_end = bytes(data[:256]).find(b' ')
+    if command_end >= 0 and bytes(data[command_end + 1:command_end + 1 + len(BINARY_MAGIC)]) == BINARY_MAGIC:
+        return None
+
+    try:
+        message_str = str(data, 'utf-8')
+        commands, batch_options = split_message(message_str)
+        commands = [(command, parse_parameters(command, parameters_str)) for command, parameters_str in commands]
+    except ValueError:
+        # Also catches UnicodeDecodeError, binary parameters aren't utf-8
+        return None
+
+    return ParsedMessage(commands, batch_options)
+
+def serialize_result(result):
+    """Turns a command result into the text sent to the client. Text and binary results are sent as they are"""
+    if result is None:
+        return None
+    if isinstance(result, (str, bytes, bytearray, memoryview)):
+        return result
+    if isinstance(result, BatchResults):
+        return json.dumps([serialize_batch_entry(entry) for entry in result])
+    return json.dumps(result)
+
+def serialize_batch_entry(entry):
+    if 'result' in entry and not isinstance(entry['result'], str):
+        entry = dict(entry, result=serialize_result(entry['result']))
+    return entry
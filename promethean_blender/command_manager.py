@@ -1,6 +1,9 @@
-from .commands import mesh_commands, simulation_commands, scene_commands, object_commands, misc_commands
-
 import bpy
+import importlib
+import json
+import time
+
+from . import binary_format, command_arguments, jobs, profiling, log, trace_recorder, health, object_index, spatial_index, snapshot_publisher
 
 # temporary function to use for commands I haven't implemented yet
 def no_op(parameters_str):
@@ -11,107 +14,363 @@ def return_none(parameters_str):
     return 'None'
 
 def internal_server_error(parameters_str):
-    print("PrometheanAI Internal Server Error: " + parameters_str)
+    log.error("Internal Server Error: %s", parameters_str)
+
+# start_job create_assets_from_selection D:/assets
+def start_job(parameters_str):
+    command, _, command_parameters_str = parameters_str.partition(' ')
+
+    if command not in command_dictionary:
+        return json.dumps({'error': 'Unknown command: ' + command})
+
+    function = get_job_function(command) or (lambda job_parameters_str: do_command(command, job_parameters_str))
+    job = jobs.start_job(command, function, command_parameters_str)
+    return json.dumps({'job_id': job.job_id})
+
+def get_job(parameters_str):
+    job = jobs.get_job(int(parameters_str))
+    if not job:
+        return json.dumps({'error': 'Unknown job: ' + parameters_str})
+    return json.dumps(job.to_dict())
+
+def await_job(parameters_str):
+    job = jobs.get_job(int(parameters_str))
+    if not job:
+        return json.dumps({'error': 'Unknown job: ' + parameters_str})
+    return jobs.await_job(job)
+
+# profile_next {"count": 5, "commands": ["learn"], "folder": "D:/profiles", "top": 20}
+# Profiles the next 5 learn commands, or the next 5 commands of any kind if commands is left out. A count of 0 stops profiling
+def profile_next(parameters_str):
+    parameters = json.loads(parameters_str) if parameters_str.strip() else {}
+    profiling.configure(parameters)
+    profiling.profile_next(int(parameters.get('count', 1)), parameters.get('commands'))
+    return json.dumps({'count': profiling.remaining, 'folder': profiling.output_folder})
+
+# profile_command get_camera_info
+# Runs the command under the profiler, and returns its result along with the profile summary
+def profile_command(parameters_str):
+    command, _, command_parameters_str = parameters_str.partition(' ')
+
+    if command not in command_dictionary or command in profiling_commands:
+        return json.dumps({'error': 'Can not profile command: ' + command})
+
+    response, summary = do_command(command, command_parameters_str, profile=True)
+    if isinstance(response, jobs.DeferredResponse):
+        return json.dumps({'error': command + " can't be profiled"})
+
+    # Binary responses can't be put in the json summary
+    response = command_arguments.serialize_result(response)
+    return json.dumps({'result': response if isinstance(response, str) else None, 'profile': summary})
+
+# get_logs {"level": "warning", "since": 1700000000.0, "limit": 100}
+# Returns the most recent log messages from blender, see log.py
+def get_logs(parameters_str):
+    try:
+        parameters = json.loads(parameters_str) if parameters_str.strip() else {}
+        if not isinstance(parameters, dict):
+            raise ValueError("Expected a json object")
+        return json.dumps(log.get_logs(parameters.get('level', 'NOTSET'), parameters.get('since', 0.0), parameters.get('limit')))
+    except ValueError as e:
+        return json.dumps({'error': 'Invalid get_logs parameters: ' + str(e)})
 
-# All commands are a function which takes one parameter, a string containing parameters from Promethean
+# set_log_level debug
+def set_log_level(parameters_str):
+    try:
+        return json.dumps({'level': log.set_level(parameters_str.strip() or log.default_level)})
+    except ValueError as e:
+        return json.dumps({'error': str(e)})
+
+# start_recording {"path": "D:/traces/session.jsonl.gz", "responses": false}
+# Records every message from now on to a trace file, which can be replayed with tools/replay_trace.py. See trace_recorder.py
+def start_recording(parameters_str):
+    parameters = json.loads(parameters_str) if parameters_str.strip() else {}
+    path = trace_recorder.start(parameters.get('path'), parameters.get('responses', False))
+    log.info("Recording trace to %s", path)
+    return json.dumps({'path': path})
+
+def stop_recording(parameters_str):
+    recorded = trace_recorder.stop()
+    return json.dumps({'path': trace_recorder.trace_path, 'recorded': recorded})
+
+# get_profiles {"clear": true}
+def get_profiles(parameters_str):
+    parameters = json.loads(parameters_str) if parameters_str.strip() else {}
+    return json.dumps(profiling.get_profiles(clear=parameters.get('clear', False)))
+
+# All commands are a function which takes one parameter, a string containing parameters from Promethean.
+# Commands from the commands package are named "module:function", the module is imported the first time one of its commands runs,
+# so enabling the add-on doesn't import every command module and what they import. See get_command_function
 command_dictionary = {
-    "get_scene_name": scene_commands.get_scene_name,
-    "save_current_scene": scene_commands.save_current_scene,
-    "open_scene": scene_commands.open_scene,
-    "get_selection": object_commands.get_selection,
-    "get_visible_static_mesh_actors": object_commands.get_visible_static_mesh_actors,
-    "get_selected_and_visible_static_mesh_actors": object_commands.get_selected_and_visible_static_mesh_actors,
-    "get_location_data": object_commands.get_location_data,
-    "get_pivot_data": object_commands.get_pivot_data,
-    "get_transform_data": object_commands.get_transform_data,
-    "add_objects": mesh_commands.add_objects,
-    "add_objects_from_polygons": mesh_commands.add_object_from_polygons,
-    "add_objects_from_triangles": mesh_commands.add_objects_from_triangles,
-    "parent": object_commands.parent,
-    "unparent": object_commands.unparent,
+    "get_scene_name": "scene_commands:get_scene_name",
+    "save_current_scene": "scene_commands:save_current_scene",
+    "open_scene": "scene_commands:open_scene",
+    "get_selection": "object_commands:get_selection",
+    "get_visible_static_mesh_actors": "object_commands:get_visible_static_mesh_actors",
+    "get_selected_and_visible_static_mesh_actors": "object_commands:get_selected_and_visible_static_mesh_actors",
+    "get_location_data": "object_commands:get_location_data",
+    "get_pivot_data": "object_commands:get_pivot_data",
+    "get_transform_data": "object_commands:get_transform_data",
+    "get_objects_in_box": "object_commands:get_objects_in_box",
+    "get_overlapping_objects": "object_commands:get_overlapping_objects",
+    "get_nearest_objects": "object_commands:get_nearest_objects",
+    "add_objects": "mesh_commands:add_objects",
+    "add_objects_from_polygons": "mesh_commands:add_object_from_polygons",
+    "add_objects_from_triangles": "mesh_commands:add_objects_from_triangles",
+    "parent": "object_commands:parent",
+    "unparent": "object_commands:unparent",
     # Removed match_objects command, told it was not needed due to blender using unique names
-    # "match_objects": object_commands.match_objects,
-    "isolate_selection": object_commands.isolate_selection,
-    "learn_file": object_commands.learn_file_cmd,
-    "get_vertex_data_from_scene_objects": object_commands.get_vertex_data_from_scene_objects,
-    "get_vertex_data_from_scene_object": object_commands.get_vertex_data_from_scene_object,
-    "report_done": misc_commands.report_done,
-    "screenshot": scene_commands.screenshot,
-    "kill": object_commands.kill,
-    "rename": object_commands.rename,
-    "learn": object_commands.learn_cmd,
-    "set_vertex_color": mesh_commands.set_vertex_color_cmd,
-    "set_roughness": mesh_commands.set_roughness,
-    "set_metallic": mesh_commands.set_metallic,
-    "set_texture_tiling": mesh_commands.set_texture_tiling,
-    "set_uv_quadrant": mesh_commands.set_uv_quadrant_cmd,
-    "get_vertex_colors": mesh_commands.get_vertex_colors,
-    "select_vertex_color": mesh_commands.select_vertex_color_cmd,
-    "add_mesh_on_selection": object_commands.add_mesh_on_selection,
-    "translate": object_commands.translate,
-    "scale": object_commands.scale,
-    "rotate": object_commands.rotate,
-    "translate_relative": object_commands.translate_relative,
-    "scale_relative": object_commands.scale_relative,
-    "rotate_relative": object_commands.rotate_relative,
-    "translate_and_snap": object_commands.translate_and_snap,
-    "translate_and_raytrace": object_commands.translate_and_raytrace,
-    "set_mesh": object_commands.set_mesh,
-    "set_mesh_on_selection": object_commands.set_mesh_on_selection,
-    "remove": object_commands.remove,
-    "remove_descendents": object_commands.remove_descendents,
-    "set_hidden": object_commands.set_hidden,
-    "set_visible": object_commands.set_visible,
-    "select": object_commands.select,
-    "create_assets_from_selection": scene_commands.create_assets_from_selection,
-    "drop_asset": scene_commands.asset_drop_finished,
-    "start_dragging_asset": scene_commands.start_dragging_asset,
-    "asset_drop_finished": scene_commands.asset_drop_finished,
-    "raytrace": scene_commands.raytrace,
-    "raytrace_bidirectional": scene_commands.raytrace,
+    # "match_objects": "object_commands:match_objects",
+    "isolate_selection": "object_commands:isolate_selection",
+    "learn_file": "object_commands:learn_file_cmd",
+    "get_vertex_data_from_scene_objects": "object_commands:get_vertex_data_from_scene_objects",
+    "get_vertex_data_from_scene_object": "object_commands:get_vertex_data_from_scene_object",
+    "report_done": "misc_commands:report_done",
+    "screenshot": "scene_commands:screenshot",
+    "kill": "object_commands:kill",
+    "rename": "object_commands:rename",
+    "learn": "object_commands:learn_cmd",
+    "set_vertex_color": "mesh_commands:set_vertex_color_cmd",
+    "set_roughness": "mesh_commands:set_roughness",
+    "set_metallic": "mesh_commands:set_metallic",
+    "set_texture_tiling": "mesh_commands:set_texture_tiling",
+    "set_uv_quadrant": "mesh_commands:set_uv_quadrant_cmd",
+    "get_vertex_colors": "mesh_commands:get_vertex_colors",
+    "select_vertex_color": "mesh_commands:select_vertex_color_cmd",
+    "add_mesh_on_selection": "object_commands:add_mesh_on_selection",
+    "translate": "object_commands:translate",
+    "scale": "object_commands:scale",
+    "rotate": "object_commands:rotate",
+    "translate_relative": "object_commands:translate_relative",
+    "scale_relative": "object_commands:scale_relative",
+    "rotate_relative": "object_commands:rotate_relative",
+    "translate_and_snap": "object_commands:translate_and_snap",
+    "translate_and_raytrace": "object_commands:translate_and_raytrace",
+    "set_mesh": "object_commands:set_mesh",
+    "set_mesh_on_selection": "object_commands:set_mesh_on_selection",
+    "remove": "object_commands:remove",
+    "remove_descendents": "object_commands:remove_descendents",
+    "set_hidden": "object_commands:set_hidden",
+    "set_visible": "object_commands:set_visible",
+    "select": "object_commands:select",
+    "create_assets_from_selection": "scene_commands:create_assets_from_selection",
+    "drop_asset": "scene_commands:asset_drop_finished",
+    "start_dragging_asset": "scene_commands:start_dragging_asset",
+    "asset_drop_finished": "scene_commands:asset_drop_finished",
+    "raytrace": "scene_commands:raytrace",
+    "raytrace_bidirectional": "scene_commands:raytrace",
     "get_simulation_on_actors_by_name": return_none,
     "get_transform_data_from_simulating_objects": return_none,
-    "enable_simulation_on_objects": simulation_commands.enable_simulation_on_objects,
-    "start_simulation": simulation_commands.start_simulation,
-    "cancel_simulation": simulation_commands.cancel_simulation,
-    "end_simulation": simulation_commands.end_simulation,
-    "toggle_surface_snapping": scene_commands.toggle_surface_snapping,
-    "clear_selection": object_commands.clear_selection,
-    "get_camera_info": scene_commands.get_camera_info, # Just send first [0] viewport
+    "enable_simulation_on_objects": "simulation_commands:enable_simulation_on_objects",
+    "start_simulation": "simulation_commands:start_simulation",
+    "cancel_simulation": "simulation_commands:cancel_simulation",
+    "end_simulation": "simulation_commands:end_simulation",
+    "toggle_surface_snapping": "scene_commands:toggle_surface_snapping",
+    "clear_selection": "object_commands:clear_selection",
+    "get_camera_info": "scene_commands:get_camera_info", # Just send first [0] viewport
+    "start_job": start_job,
+    "get_job": get_job,
+    "await_job": await_job,
+    "profile_next": profile_next,
+    "profile_command": profile_command,
+    "get_profiles": get_profiles,
+    "get_logs": get_logs,
+    "set_log_level": set_log_level,
+    "start_recording": start_recording,
+    "stop_recording": stop_recording,
     "internal_server_error": internal_server_error
 }
 
+# Job versions of commands, which yield while they wait instead of blocking blender. Used when the command is run with start_job
+job_command_dictionary = {
+    "create_assets_from_selection": "scene_commands:create_assets_from_selection_job",
+}
+
 # List of commands which should push an undo state
 undo_commands = ["add_objects", "add_objects_from_polygons", "add_objects_from_triangles", "parent", "unparent", "set_vertex_color", "set_roughness", "set_metallic", "set_texture_tiling", "set_uv_quadrant",
 "add_mesh_on_selection", "translate", "scale", "rotate", "translate_relative", "scale_relative", "rotate_relative", "translate_and_snap", "translate_and_raytrace", "set_mesh", "set_mesh_on_selection", "remove",
 "remove_descendents", "drop_asset", "asset_drop_finished", "enable_simulation_on_objects", "clear_selection"]
 
-def do_command(command, parameters_str):
+# Commands which don't change the scene. Every other command bumps the scene version when it finishes,
+# so the server stops answering from the scene snapshot until blender has published the changes, see snapshot_publisher.py
+read_only_commands = ["get_scene_name", "get_selection", "get_visible_static_mesh_actors", "get_selected_and_visible_static_mesh_actors",
+"get_location_data", "get_pivot_data", "get_transform_data", "get_objects_in_box", "get_overlapping_objects", "get_nearest_objects", "get_vertex_data_from_scene_object",
+"get_vertex_colors", "get_camera_info", "raytrace", "raytrace_bidirectional", "get_simulation_on_actors_by_name", "get_transform_data_from_simulating_objects", "get_job",
+"profile_next", "get_profiles", "get_logs", "set_log_level", "start_recording", "stop_recording"]
+
+# Commands which only change transforms, and never add, remove, rename, select or hide objects. After every other command
+# the object index and the scene snapshot read selection and visibility again, see object_index.py and snapshot_publisher.py
+# Commands which go through bpy.ops don't belong here, scale_relative for example selects the objects to resize them
+transform_only_commands = ["translate", "scale", "rotate", "translate_relative", "rotate_relative", "translate_and_snap", "translate_and_raytrace"]
+
+# Commands which control profiling, these are never profiled themselves
+profiling_commands = ["profile_next", "profile_command", "get_profiles"]
+
+def resolve_function(dictionary, command):
+    """Returns the function for a command, importing its module the first time. None if the command isn't in the dictionary"""
+    function = dictionary.get(command)
+
+    if isinstance(function, str):
+        module_name, _, function_name = function.partition(':')
+        start = time.perf_counter()
+        module = importlib.import_module('.commands.' + module_name, __package__)
+        function = getattr(module, function_name)
+
+        # Later calls skip the lookup, and other commands from the same module find it already imported
+        dictionary[command] = function
+        log.debug("Loaded %s for %s in %.1f ms", module_name, command, (time.perf_counter() - start) * 1000.0)
+
+    return function
+
+def get_command_function(command):
+    return resolve_function(command_dictionary, command)
+
+def get_job_function(command):
+    return resolve_function(job_command_dictionary, command)
+
+def do_command(command, parameters, profile=False):
+    """Runs a command. parameters are the text sent by the client, or already parsed (see command_arguments.py).
+    With profile=True the command is profiled, and (response, profile summary) is returned"""
     if command in command_dictionary:
-        function = command_dictionary[command]
+        function = get_command_function(command)
 
         if command in undo_commands:
             bpy.ops.ed.undo_push(message="Promethean AI: " + command)
 
-        response = function(parameters_str)
+        # The server process reports the command in flight to health checks, see health.py
+        health.start_command(command)
+        try:
+            if profile:
+                response, summary = profiling.run_profiled(command, function, parameters)
+                return 'None' if response is None or response == '' else response, summary
+
+            if command not in profiling_commands and profiling.should_profile(command):
+                response, _ = profiling.run_profiled(command, function, parameters)
+            else:
+                response = function(parameters)
+        finally:
+            health.finish_command()
+            if command not in read_only_commands:
+                check_selection = command not in transform_only_commands
+                # Bumps the scene version, and makes the next snapshot update go out even if the depsgraph reports nothing
+                snapshot_publisher.mark_changed(check=check_selection)
+                spatial_index.mark_changed(check=True)
+                if check_selection:
+                    object_index.mark_changed(check=True)
 
-        response = response or 'None'
+        # Commands return plain values, the server turns them into json. See command_arguments.py
+        if response is None or response == '':
+            response = 'None'
 
         return response
 
-def handle_message(data):
-    message_str = str(data.decode())
-    for command_str in message_str.split('\n'):
-        if not command_str:
+def run_batch(commands, stop_on_error=False):
+    """Runs every command in order, returns a list with one result or error per command"""
+    results = command_arguments.BatchResults()
+    failed = False
+
+    for command, parameters in commands:
+        if failed:
+            results.append({'command': command, 'skipped': True})
             continue
 
-        command, _, command_parameters_str = command_str.partition(' ')
+        try:
+            if command not in command_dictionary:
+                raise KeyError("Unknown command: " + command)
 
-        if not command:
-            continue
-        print("")
-        print("PrometheanAI: " + command_str)
-        print("")
-        response = do_command(command, command_parameters_str)
+            result = do_command(command, parameters)
+            if isinstance(result, jobs.DeferredResponse):
+                raise ValueError(command + " can't be used in a batch")
+
+            results.append({'command': command, 'result': result})
+        except Exception as e:
+            log.error("Error running %s: %s", command, e)
+            results.append({'command': command, 'error': str(e)})
+            failed = stop_on_error
+
+    return results
+
+def split_binary_command(data):
+    """Returns (command, parameters) if the message is a single command with binary parameters, otherwise None"""
+    command_end = bytes(data[:256]).find(b' ')
+    if command_end < 0:
+        return None
+
+    # Slice a memoryview, so the parameters aren't copied
+    parameters = memoryview(data)[command_end + 1:]
+    if not binary_format.is_binary(parameters):
+        return None
+
+    return str(data[:command_end], 'utf-8'), binary_format.decode(parameters)
+
+# Commands which control recording, these aren't written to the trace
+recording_commands = ["start_recording", "stop_recording"]
+
+def record_message(data, options, trace, response):
+    if isinstance(data, command_arguments.ParsedMessage):
+        data = data.to_text().encode()
 
+    command = bytes(data[:256]).partition(b'\n')[0].partition(b' ')[0].decode(errors='replace')
+    if command in recording_commands:
+        return
+
+    duration_ms = (trace.get('finished', 0.0) - trace.get('started', 0.0)) * 1000.0
+    # The time the server received the message, so a replay can send messages with the same timing
+    received_time = trace.get('received', trace.get('picked_up', time.time()))
+    # Only text and binary results are recorded with their size and checksum. Other results, and deferred responses, are turned
+    # into text by the server process, they are recorded without them instead of being serialized a second time here
+    trace_recorder.record(data, command, options.get('encoding', binary_format.ENCODING_JSON), received_time, duration_ms, response)
+
+def handle_message(data, options=None, trace=None):
+    """Runs the commands in a message. trace gets the time the commands started and finished, see latency_stats.py"""
+    options = options or {}
+    trace = trace if trace is not None else {}
+    binary_format.response_encoding = options.get('encoding', binary_format.ENCODING_JSON)
+
+    response = run_message(data, trace)
+
+    if trace_recorder.is_recording():
+        record_message(data, options, trace, response)
+
+    return response
+
+def run_message(data, trace):
+    """Runs a single command, a batch, or a command with binary parameters"""
+    # Most messages arrive already parsed by the server, see command_arguments.py
+    if isinstance(data, command_arguments.ParsedMessage):
+        return run_commands(data.commands, data.batch_options, trace)
+
+    binary_command = split_binary_command(data)
+    if binary_command:
+        command, parameters = binary_command
+        log.debug("%s (binary parameters, %s bytes)", command, len(data))
+        trace['started'] = time.time()
+        response = do_command(command, parameters)
+        trace['finished'] = time.time()
+        return response
+
+    # data can be bytes or a memoryview of shared memory
+    message_str = str(data, 'utf-8')
+    commands, batch_options = command_arguments.split_message(message_str)
+    return run_commands(commands, batch_options, trace)
+
+def run_commands(commands, batch_options, trace):
+    """Runs a list of (command, parameters), the parameters are either the text sent by the client or already parsed"""
+    # A single command keeps the old behaviour, and returns the response on its own
+    if batch_options is None and len(commands) == 1:
+        command, parameters = commands[0]
+        log.debug("%s %s", command, log.truncate(parameters))
+        trace['started'] = time.time()
+        response = do_command(command, parameters)
+        trace['finished'] = time.time()
         return response
+
+    if not commands:
+        return None
+
+    log.debug("Running batch of %s commands", len(commands))
+    batch_options = batch_options or {}
+    trace['started'] = time.time()
+    results = run_batch(commands, stop_on_error=batch_options.get('stop_on_error', False))
+    trace['finished'] = time.time()
+    return results
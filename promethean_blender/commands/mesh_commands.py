@@ -1,12 +1,12 @@
-from lib2to3.pytree import convert
 import bpy
-import json
 from mathutils import Vector, Euler, Quaternion
 import os
 
-from numpy import block
+import numpy
 
 from ..import_file import create_objects_from_file
+from .. import binary_format
+from ..command_arguments import load_json, load_list
 
 from ..utils import *
 from ..constants import *
@@ -15,22 +15,22 @@ from ..constants import *
 # https://docs.blender.org/api/current/bpy.types.Mesh.html
 
 # add_objects_from_triangles {"obj1": {"name": "obj1", "verts": [[0.0,0.0,0.0], [1.0,0.0,0.0], [1.0,1.0,0.0], [0.0,1.0,0.0], [1.0,-1.0,0.0], [0.0,-1.0,0.0]], "tri_ids": [[0,1,2], [0,2,3], [0,1,5], [1,5,4]], "normals": [[0.0,1.0,0.0],[0.0,1.0,0.0],[0.0,1.0,0.0],[0.0,1.0,0.0]]}}
+# verts and tri_ids can also be sent as arrays in a binary message, see binary_format.py
 def add_objects_from_triangles(parameters_str):
-    obj_list = json.loads(parameters_str)
+    obj_list = binary_format.load_parameters(parameters_str)
 
     out_names = {}
     for dcc_name in obj_list:
         geometry_dict = obj_list[dcc_name]
 
-        verts = geometry_dict[VERTICES_KEY]
+        verts = numpy.asarray(geometry_dict[VERTICES_KEY], dtype=numpy.float32)
         faces = geometry_dict[TRI_ID_KEY]
         name = geometry_dict[NAME_KEY]
         
-        verts = [ [convert_in(x) for x in y] for y in verts ]
+        verts = convert_in(verts)
 
         #Create mesh from data
-        mesh = bpy.data.meshes.new(name)
-        mesh.from_pydata(vertices=verts, edges=[], faces=faces)
+        mesh = create_mesh_from_triangles(name, verts, faces)
 
         #Create object with mesh
         obj = bpy.data.objects.new(name, mesh)
@@ -46,7 +46,7 @@ def add_objects_from_triangles(parameters_str):
             obj.scale = Vector(transform[SCALE_KEY])
 
         out_names[dcc_name] = geometry_dict[NAME_KEY]
-    return json.dumps(out_names)
+    return out_names
 
 def construct_vertex_dictionary(vertices):
     result = {}
@@ -93,7 +93,7 @@ def construct_mesh(vertices, name, face_verts=4):
 # add_object_from_polygons {"name": "FixedFurnitureCoatCloset", "points": [ [0.0, 0.0, 0.0], [103.69, 0.0, 0.0], [103.69, 0.0, 60.0], [0.0, 0.0, 60.0], [0.0, 0.0, 0.0], [103.69, 0.0, 0.0], [103.69, 60.0, 0.0], [0.0, 60.0, 0.0] ]}
 def add_object_from_polygons(parameters_str):
 
-    data = json.loads(parameters_str)
+    data = binary_format.load_parameters(parameters_str)
     obj = construct_mesh(data[POINTS_KEY], data[NAME_KEY])
 
     if TRANSFORM_KEY in data:
@@ -108,15 +108,15 @@ def add_object_from_polygons(parameters_str):
 # add_objects {"Group111": {"group": true, "name": "Group111", "location": [0,1,2], "rotation":[3,4,5], "scale":[1,1,1]}}
 # add_objects {"NewMesh111": {"group": false, "name": "NewMesh111", "asset_path":"D:\\Desktop\\monkey.fbx" "location": [10,11,12], "rotation":[3,4,5], "scale":[1,2,3]}}
 
-def add_objects(parameters_str):
-    obj_dict = json.loads(parameters_str)
+def add_objects(parameters):
+    obj_dict = load_json(parameters)
     return_dict = {}
     
     for object_name in obj_dict.keys():
         linked_object = add_object(obj_dict[object_name])
         return_dict[object_name] = object_to_promethean_name(linked_object)
 
-    return json.dumps(return_dict)
+    return return_dict
 
 def add_object(obj_dict):
     #If the object is a group, make an empty
@@ -234,8 +234,8 @@ def set_uv_quadrant_cmd(parameters_str):
     u, v = [int(x) for x in parameters_str.split(' ')]
     set_uv_quadrant(u=u, v=v)
 
-def set_vertex_color_cmd(parameters_str):
-    colors = [float(str(clr)) for clr in parameters_str.split(',')]
+def set_vertex_color_cmd(parameters):
+    colors = [float(str(clr)) for clr in load_list(parameters)]
     color = Vector((colors[0], colors[1], colors[2], 1))
     set_vertex_color(color)
 
@@ -249,8 +249,8 @@ def select_vertex_color_cmd(parameters_str):
     objects = get_objects_by_promethean_names(object_names)
     select_vertex_color(objects, Vector((color[0], color[1], color[2], 1)))
 
-def get_vertex_colors(parameters_str):
-    p_names = parameters_str.split(',')
+def get_vertex_colors(parameters):
+    p_names = load_list(parameters)
     objs = get_objects_by_promethean_names(p_names)
 
     vertex_colors_data = dict()
@@ -285,5 +285,9 @@ def get_vertex_colors(parameters_str):
 
         if vertex_data:
             vertex_colors_data[obj.name] = list(vertex_data)
-    
-    return json.dumps(vertex_colors_data)
+
+    # Binary clients get one (n, 7) float32 array per object
+    if binary_format.wants_binary():
+        vertex_colors_data = {name: numpy.array(data, dtype=numpy.float32) for name, data in vertex_colors_data.items()}
+
+    return binary_format.encode_response(vertex_colors_data)
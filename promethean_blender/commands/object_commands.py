@@ -7,6 +7,9 @@ from ..constants import *
 
 from ..import_file import *
 
+from .. import binary_format, raycast, spatial_index
+from ..command_arguments import load_json, load_list
+
 from mathutils import Vector
 
 def get_selection(parameters_str):
@@ -15,9 +18,7 @@ def get_selection(parameters_str):
     return str(names)
 
 def get_visible_static_mesh_actors(parameters_str):
-    visible_meshes = get_visible_mesh_objects()
-
-    visible_in_camera = [obj for obj in visible_meshes if point_visible_in_any_region(bpy.context, obj.location)]
+    visible_in_camera = get_objects_visible_in_camera()
 
     return str(objects_to_promethean_names(visible_in_camera))
 
@@ -41,26 +42,26 @@ def get_selected_and_visible_static_mesh_actors(parameters_str):
     for i, obj_name in enumerate(visible):
         rendered_paths_dict.setdefault(get_reference_path(obj_name), []).append(i)
 
-    return json.dumps({'selected_names': objects_to_promethean_names(selection),
-                          'rendered_names': objects_to_promethean_names(visible),
-                          'selected_paths': selected_paths_dict,
-                          'rendered_paths': rendered_paths_dict, 'scene_name': scene_name})
+    return {'selected_names': objects_to_promethean_names(selection),
+            'rendered_names': objects_to_promethean_names(visible),
+            'selected_paths': selected_paths_dict,
+            'rendered_paths': rendered_paths_dict, 'scene_name': scene_name}
 
 
 
-def get_location_data(parameters_str):
+def get_location_data(parameters):
 
-    obj_names = parameters_str.split(',')
+    obj_names = load_list(parameters)
     data_dict = {object_to_promethean_name(obj): list(convert_out(obj.location)) for obj in get_objects_by_promethean_names(obj_names) if obj}
-    return json.dumps(data_dict)
+    return data_dict
 
-def parent(parameters_str):
-    object_names = parameters_str.split(',')
+def parent(parameters):
+    object_names = load_list(parameters)
     objects = get_objects_by_promethean_names(object_names)
     parent_objects_keep_transform(objects[0], objects[1:])
 
-def unparent(parameters_str):
-    object_names = parameters_str.split(',')
+def unparent(parameters):
+    object_names = load_list(parameters)
     objects = get_objects_by_promethean_names(object_names)
     unparent_objects_keep_transform(objects)
 
@@ -75,8 +76,8 @@ def kill(parameters_str):
     for obj in selected:
         obj.name = obj.name.replace(KILL_STR, '') if KILL_STR in obj.name else obj.name + KILL_STR
 
-def translate(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def translate(parameters):
+    value, p_names = load_json(parameters)
     value = Vector(value)
     value = convert_in(value)
     objects = get_objects_by_promethean_names(p_names)
@@ -84,8 +85,8 @@ def translate(parameters_str):
     for object in objects:
         object.location = value
 
-def translate_relative(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def translate_relative(parameters):
+    value, p_names = load_json(parameters)
     value = Vector(value)
     value = convert_in(value)
     objects = get_objects_by_promethean_names(p_names)
@@ -93,16 +94,16 @@ def translate_relative(parameters_str):
     for object in objects:
         object.location += value
 
-def scale(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def scale(parameters):
+    value, p_names = load_json(parameters)
     value = Vector(value)
     objects = get_objects_by_promethean_names(p_names)
 
     for object in objects:
         object.scale = value
 
-def scale_relative(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def scale_relative(parameters):
+    value, p_names = load_json(parameters)
     value = Vector(value)
     objects = get_objects_by_promethean_names(p_names)
 
@@ -116,16 +117,16 @@ def scale_relative(parameters_str):
     for object in objects:
         object.select_set(True)
 
-def rotate(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def rotate(parameters):
+    value, p_names = load_json(parameters)
     value = euler_from_degrees(value)
     objects = get_objects_by_promethean_names(p_names)
 
     for object in objects:
         object.rotation_euler = value
 
-def rotate_relative(parameters_str):
-    value, p_names = json.loads(parameters_str)
+def rotate_relative(parameters):
+    value, p_names = load_json(parameters)
     #euler = euler_from_degrees(value)
     objects = get_objects_by_promethean_names(p_names)
 
@@ -135,45 +136,45 @@ def rotate_relative(parameters_str):
         object.rotation_euler.rotate_axis("Y", radians(value[1]))
         object.rotation_euler.rotate_axis("X", radians(value[0]))
 
-def get_pivot_data(parameters_str):
-    obj_names = parameters_str.split(',')
+def get_pivot_data(parameters):
+    obj_names = load_list(parameters)
     data_dict = {object_to_promethean_name(x): list(get_transform(x)[1]) for x in
                      get_objects_by_promethean_names(obj_names) if x}
     msg = json.dumps(data_dict)
 
-def rename(parameters_str):
-    source_name, target_name = parameters_str.split(',')
+def rename(parameters):
+    source_name, target_name = load_list(parameters)
     source_obj = get_object_by_promethean_name(source_name)
     if source_obj:
         source_obj.name = target_name
     return source_obj.name
 
-def set_hidden(parameters_str):
-    p_names = parameters_str.split(',')
+def set_hidden(parameters):
+    p_names = load_list(parameters)
     objects = get_objects_by_promethean_names(p_names)
     for object in objects:
         object.hide_set(True)
 
-def set_visible(parameters_str):
-    p_names = parameters_str.split(',')
+def set_visible(parameters):
+    p_names = load_list(parameters)
     objects = get_objects_by_promethean_names(p_names)
     for object in objects:
         object.hide_set(False)
 
-def select(parameters_str):
-    p_names = parameters_str.split(',')
+def select(parameters):
+    p_names = load_list(parameters)
     objects = get_objects_by_promethean_names(p_names)
     for object in objects:
         object.select_set(True)
 
-def remove(parameters_str):
-    p_names = parameters_str.split(',')
+def remove(parameters):
+    p_names = load_list(parameters)
     objects = get_objects_by_promethean_names(p_names)
 
     delete_objects(objects)
 
-def remove_descendents(parameters_str):
-    p_names = parameters_str.split(',')
+def remove_descendents(parameters):
+    p_names = load_list(parameters)
     objects = get_objects_by_promethean_names(p_names)
     for object in objects:
         delete_hierarchy(object)
@@ -187,7 +188,7 @@ def get_object_transform_data(object):
     scale = list(object.scale)
 
     pivot = get_pivot(object)
-    pivot_offset = convert_out(pivot)
+    pivot_offset = list(convert_out(pivot))
     return {TRANSLATION_KEY: translation, ROTATION_KEY: rotation, SCALE_KEY: scale, PIVOT_OFFSET_KEY: pivot_offset}
 
 def get_raw_object_data(object, predict_rotation=False, is_group=False):
@@ -244,27 +245,66 @@ def learning_data_to_file(file_path, raw_data, scene_id, extra_tags=[], project=
 def clear_selection(parameters_str):
     bpy.ops.object.select_all(action='DESELECT')
 
-def get_transform_data(parameters_str):
-    obj_names = parameters_str.split(',')
+def get_transform_list(object):
+    """An object's entry in get_transform_data, also published in the scene snapshot (see snapshot_publisher.py)"""
+    data = get_raw_object_data(object)
+    return data[TRANSFORM_KEY] + data[SIZE_KEY] + data[PIVOT_OFFSET_KEY] + [data[PARENT_NAME_KEY]]
+
+def get_transform_data(parameters):
+    obj_names = load_list(parameters)
     data_dict = {}
     for obj_name in obj_names:
         object = get_object_by_promethean_name(obj_name)
         if object:
-            data = get_raw_object_data(object)
-            data_dict[obj_name] = data[TRANSFORM_KEY] + data[SIZE_KEY] + data[PIVOT_OFFSET_KEY] + [data[PARENT_NAME_KEY]]
-    return json.dumps(data_dict)
+            data_dict[obj_name] = get_transform_list(object)
+    return data_dict
+
+# get_objects_in_box [[-100, -100, 0], [100, 100, 200]]
+# Names of the meshes whose bounds overlap the box, corners in promethean units
+def get_objects_in_box(parameters):
+    low, high = load_json(parameters)
+    return spatial_index.find_in_box(convert_in(Vector(low)), convert_in(Vector(high)))
+
+# get_overlapping_objects Cube,Cube.001
+# Name -> names of the meshes whose bounds overlap its bounds, objects which aren't meshes are left out
+def get_overlapping_objects(parameters):
+    data_dict = {}
+    for obj_name in load_list(parameters):
+        overlapping = spatial_index.find_overlapping(obj_name)
+        if overlapping is not None:
+            data_dict[obj_name] = overlapping
+    return data_dict
+
+# get_nearest_objects [[[0, 0, 0], "Cube"], 5]
+# The 5 meshes nearest to each location, nearest first. An object name stands for its position, and leaves the object itself out
+def get_nearest_objects(parameters):
+    locations, count = load_json(parameters)
+    nearest = []
+    for location in locations:
+        if isinstance(location, str):
+            object = get_object_by_promethean_name(location)
+            if not object:
+                nearest.append([])
+                continue
+            nearest.append(spatial_index.find_nearest(object.matrix_world.translation, count, exclude=object.name))
+        else:
+            nearest.append(spatial_index.find_nearest(convert_in(Vector(location)), count))
+    return nearest
+
+def vertex_positions_to_json(positions):
+    # json clients expect a list holding one dictionary of vertex index to position
+    return [{i: vert for i, vert in enumerate(positions.tolist())}]
 
 def get_vertex_data_from_scene_object(parameters_str):
     obj = get_object_by_promethean_name(parameters_str)
-    verts = get_triangle_positions(obj)
+    verts = get_triangle_positions_array(obj)
 
-    vert_list = [{i: vert for i, vert in enumerate(verts)}]
-    vert_dict = {'vertex_positions': vert_list}
+    vert_dict = {'vertex_positions': verts}
 
-    return json.dumps(vert_dict)
+    return binary_format.encode_response(vert_dict, lambda x: {'vertex_positions': vertex_positions_to_json(x['vertex_positions'])})
 
-def get_vertex_data_from_scene_objects(parameters_str):
-    obj_names = json.loads(parameters_str)
+def get_vertex_data_from_scene_objects(parameters):
+    obj_names = load_json(parameters)
     out_dict = dict()
     for obj_name in obj_names:
         obj = get_object_by_promethean_name(obj_name)
@@ -272,16 +312,14 @@ def get_vertex_data_from_scene_objects(parameters_str):
         triangulate_object(obj)
 
         if obj.type == 'MESH':
-            vert_list = get_triangle_positions(obj)
-            vert_list = [{i: vert for i, vert in enumerate(vert_list)}]
-            out_dict[obj_name] = vert_list
+            out_dict[obj_name] = get_triangle_positions_array(obj)
 
-    return json.dumps(out_dict)
+    return binary_format.encode_response(out_dict, lambda x: {name: vertex_positions_to_json(verts) for name, verts in x.items()})
 
 def learn_file_cmd(parameters_str):
     learn_dict = json.loads(parameters_str.replace('learn_file ', ''))
     learn_file(learn_dict['file_path'], learn_dict['learn_file_path'], learn_dict['tagsg'], learn_dict['project'])
-    return json.dumps(True)
+    return True
 
 def learn_cmd(parameters_str):
     cache_file_path, from_selection = parameters_str.rpartition(' ')[::2]
@@ -289,38 +327,27 @@ def learn_cmd(parameters_str):
     return str(learn(cache_file_path, [], None, from_selection))
 
 def translate_and_raytrace_objects(objects, location, raytrace_distance, max_normal_deviation, ignore_objects):
-    # Hide objects
-    visibilities = {}
-    for object in ignore_objects:
-        visibilities[object.name] = object.hide_get()
-        object.hide_set(True)
-
     if not raytrace_distance:
         return
-    
-    deps = bpy.context.evaluated_depsgraph_get()
+
+    # One ray straight down from location, passing through the ignored objects instead of hiding them
     down_vec = Vector((0, 0, -1))
     up_vec = Vector((0, 0, 1))
+    ignore_names = {object.name for object in ignore_objects}
 
-    for obj in objects:
-        result, location, normal, index, hit_object, matrix = bpy.context.scene.ray_cast(deps, location, down_vec)
+    result, location, normal, hit_name = raycast.cast_rays([location], [down_vec], exclude=[ignore_names])[0]
 
-        if not result:
-            continue
+    if not result:
+        return
 
+    for obj in objects:
         if up_vec.dot(normal) > max_normal_deviation:
             obj.rotation_euler = normal_to_euler(normal)
 
         obj.location = location
 
-    # Unhide objects
-
-    for object in ignore_objects:
-        visible = visibilities[object.name]
-        object.hide_set(visible)
-
-def translate_and_raytrace(parameters_str):
-    location, raytrace_distance, obj_names, ignore_names  = json.loads(parameters_str)
+def translate_and_raytrace(parameters):
+    location, raytrace_distance, obj_names, ignore_names  = load_json(parameters)
     location = [ convert_in(float(x)) for x in location]
     raytrace_distance = convert_in(float(raytrace_distance))
     max_normal_deviation = 0
@@ -330,9 +357,9 @@ def translate_and_raytrace(parameters_str):
 
     translate_and_raytrace_objects(objects, location, raytrace_distance, max_normal_deviation, ignore_objects)
 
-def translate_and_snap(parameters_str):
+def translate_and_snap(parameters):
 
-    location, raytrace_distance, max_normal_deviation, obj_names, ignore_names  = json.loads(parameters_str)
+    location, raytrace_distance, max_normal_deviation, obj_names, ignore_names  = load_json(parameters)
     location = [convert_in(float(x)) for x in location]
     raytrace_distance = convert_in(float(raytrace_distance))
     max_normal_deviation = float(max_normal_deviation)
@@ -365,8 +392,8 @@ def set_mesh_on_objects(mesh_path, objects):
 
     delete_objects(objects)
 
-def set_mesh(parameter_str):
-    mesh_path, p_names = json.loads(parameter_str)
+def set_mesh(parameters):
+    mesh_path, p_names = load_json(parameters)
     objects = get_objects_by_promethean_names(p_names)
     set_mesh_on_objects(objects)
 
@@ -375,8 +402,8 @@ def set_mesh_on_selection(parameters_str):
     objects = get_selected_mesh_objects()
     set_mesh_on_objects(mesh_path, objects)
     
-def add_mesh_on_selection(parameters_str):
-    mesh_paths = parameters_str.split(',')
+def add_mesh_on_selection(parameters):
+    mesh_paths = load_list(parameters)
     new_objs = []
     objs = get_selected_mesh_objects()
     for obj in objs:
@@ -1,8 +1,7 @@
-from importlib.resources import path
 import bpy
 import mathutils
 import os
-import json
+import tempfile
 import gpu
 from ..constants import PROMETHEAN_MESSAGE_PREFIX, PROMETHEAN_MESSAGE_SUFFIX
 
@@ -12,6 +11,9 @@ from ..import_file import create_objects_from_file
 
 from ..utils import *
 from ..operators.drag_drop_modal import get_current_modal_result
+# Renamed, the utils import brings in math.log
+from .. import log as addon_log, raycast
+from ..command_arguments import load_json
 
 def get_scene_name(parameters):
     file_path = bpy.data.filepath
@@ -27,27 +29,25 @@ def save_current_scene(parameters):
 def open_scene(file_path):
     bpy.ops.wm.open_mainfile('INVOKE_DEFAULT', filepath=file_path, display_file_selector=False)
 
-def raytrace(parameters_str):
-    direction_vec, distance, p_names  = json.loads(parameters_str)
-    direction_vec = mathutils.Vector(direction_vec)
+def raytrace(parameters):
+    direction_vec, distance, p_names  = load_json(parameters)
     distance =  convert_in(distance)
     result_dict = {}
 
-    #raycast from object origin, hide object so the ray doesn't collide with itself
+    #raycast from each object origin, all rays together, each ray passes through its own object so it doesn't collide with itself
+    names = []
+    origins = []
     for name in p_names:
         object = get_object_by_promethean_name(name)
         if object:
+            names.append((name, object.name))
+            origins.append(get_pivot_ws(object))
 
-            hidden = object.hide_get()
-            object.hide_set(True)
+    hits = raycast.cast_rays(origins, [direction_vec] * len(origins), distance, [{object_name} for name, object_name in names])
 
-            deps = bpy.context.evaluated_depsgraph_get()
-            size, origin = get_transform(object)
-            result, location, normal, index, hit_object, matrix = bpy.context.scene.ray_cast(deps, origin, direction_vec, distance=distance)
+    for (name, object_name), (result, location, normal, hit_name) in zip(names, hits):
+        result_dict[name] = [ convert_out(x) for x in location] if result else [0.0, 0.0, 0.0]
 
-            result_dict[name] = [ convert_out(x) for x in location] if result else [0.0, 0.0, 0.0]
-
-            object.hide_set(hidden)
     return result_dict
 
 def toggle_surface_snapping(parameters_str):
@@ -114,8 +114,7 @@ def asset_drop_finished(parameters_str):
 
         rotation_euler = normal_to_euler(normal)
 
-        print("Normal:")
-        print(normal)
+        addon_log.debug("Drop normal: %s", normal)
 
         for object in objects:
             object.location = position
@@ -140,11 +139,10 @@ def get_camera_info(parameters_str):
 
         pos = convert_out(pos)
         info_dict = {'camera_location': pos, 'camera_direction': dir, 'fov': fov, 'objects_on_screen': objects_to_promethean_names(get_objects_visible_in_camera())}
-        return json.dumps(info_dict)
-
-def create_assets_from_selection(parameters_str):
-    content_folder = parameters_str
+        return info_dict
 
+def get_selection_for_assets():
+    """Saves the scene and returns the selected meshes to make assets from, or None if there is nothing to do"""
 
     # File must be saved for function to run
     if len(bpy.data.filepath) == 0:
@@ -154,17 +152,15 @@ def create_assets_from_selection(parameters_str):
     selected = get_selected_mesh_objects()
 
     if len(selected) == 0:
-        print("PrometheanAI: No Assets Selected")
+        addon_log.info("No Assets Selected")
         return None
 
     bpy.ops.wm.save_mainfile()
 
-    response = create_asset_from_blend(content_folder, bpy.data.filepath, selected, blocking=True)
-
-    print("Response:")
-    print(response)
+    return selected
 
-    print("Files:")
+def get_files_from_task_output(response):
+    addon_log.debug("Task output: %s", addon_log.truncate(response))
 
     #Get text between prefix and suffix
     response = response.split(PROMETHEAN_MESSAGE_PREFIX)[1]
@@ -172,6 +168,37 @@ def create_assets_from_selection(parameters_str):
 
     files = response.split(',')
 
-    print(files)
+    addon_log.debug("Created files: %s", addon_log.truncate(files))
+
+    return files
+
+def create_assets_from_selection(parameters_str):
+    content_folder = parameters_str
+
+    selected = get_selection_for_assets()
+    if not selected:
+        return None
+
+    response = create_asset_from_blend(content_folder, bpy.data.filepath, selected, blocking=True)
+
+    return get_files_from_task_output(response)
+
+def create_assets_from_selection_job(parameters_str):
+    """Job version of create_assets_from_selection, yields while the background blender process runs instead of blocking"""
+    content_folder = parameters_str
+
+    selected = get_selection_for_assets()
+    if not selected:
+        return None
+
+    # Output goes to a file rather than a pipe, a full pipe would block the background process
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as output:
+        process = create_asset_from_blend(content_folder, bpy.data.filepath, selected, blocking=False, stdout=output)
+
+        while process.poll() is None:
+            yield
+
+        output.seek(0)
+        response = output.read()
 
-    return json.dumps(files)
\ No newline at end of file
+    return get_files_from_task_output(response)
@@ -5,6 +5,7 @@ import bpy
 from ..utils import *
 
 from ..constants import *
+from ..command_arguments import load_list
 
 # See:
 # https://docs.blender.org/manual/en/latest/physics/rigid_body/world.html
@@ -96,12 +97,12 @@ def create_simulation(active_objects, passive_objects):
     set_rigidbody_end()
 
 
-def enable_simulation_on_objects(parameters_str):
-    object_names = parameters_str.split(',')
+def enable_simulation_on_objects(parameters):
+    object_names = load_list(parameters)
     active_objects = get_objects_by_promethean_names(object_names)
 
     active_objects = [object for object in active_objects if object.visible_get()]
-    active_objects = [object for object in active_objects if is_object_visible_camera(object)]
+    active_objects = get_objects_visible_in_camera(use_bounds=True, objects=active_objects)
 
     passive_objects = get_potential_static_objects(active_objects)
     
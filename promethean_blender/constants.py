@@ -22,6 +22,9 @@ ART_ASSET_PATH_KEY = 'art_asset_path'
 
 VACATE_MESSAGE = 'promethean_vacate_socket'
 
+# First line of a message containing several commands, followed by json options eg: promethean_batch {"stop_on_error": true}
+BATCH_COMMAND = 'promethean_batch'
+
 NO_PARENT = 'no_parent'
 
 #Blender Constants:
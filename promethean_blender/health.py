@@ -0,0 +1,83 @@
+# State of blender's main thread, shared with the server process so it can answer ping and status without going through blender.
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# Blender's message pump writes when it last ran, when it last picked up a message and which command it is running.
+# The server process reads them, so a client can tell a blender that is busy running a command from one that has stopped pumping.
+
+import multiprocessing
+import time
+
+max_command_length = 64
+
+# Without a pump for this long, and no command running, blender's main thread is reported as blocked (eg. rendering or a modal dialog)
+blocked_after = 5.0
+
+class SharedHealth:
+    """Values written by blender's main thread and read by the server process. Created by blender and passed to the server process"""
+    def __init__(self):
+        self.last_pump = multiprocessing.Value('d', 0.0)
+        self.last_pickup = multiprocessing.Value('d', 0.0)
+        self.command_started = multiprocessing.Value('d', 0.0)
+        self.command = multiprocessing.Array('c', max_command_length)
+        self.handled = multiprocessing.Value('Q', 0)
+        # Bumped whenever the scene may have changed, the server only answers from a scene snapshot taken at the current version
+        self.scene_version = multiprocessing.Value('Q', 0)
+
+# Set in blender while the server is running. Left as None when commands run without a server, eg. in the benchmark task
+shared = None
+
+def mark_pump():
+    if shared:
+        shared.last_pump.value = time.time()
+
+def mark_pickup():
+    if shared:
+        shared.last_pickup.value = time.time()
+        shared.handled.value += 1
+
+def start_command(command):
+    if shared:
+        shared.command.value = command.encode('utf-8', 'replace')[:max_command_length]
+        shared.command_started.value = time.time()
+
+def finish_command():
+    if shared:
+        shared.command.value = b''
+        shared.command_started.value = 0.0
+
+def bump_scene_version():
+    """Returns the new scene version, or None without a server"""
+    if shared:
+        shared.scene_version.value += 1
+        return shared.scene_version.value
+    return None
+
+def get_scene_version():
+    return shared.scene_version.value if shared else None
+
+def get_age(timestamp, now):
+    return round(now - timestamp, 3) if timestamp else None
+
+def get_main_thread_status(health, now=None):
+    """Status of blender's main thread as a json compatible dictionary, read in the server process"""
+    now = now or time.time()
+
+    command = health.command.value.decode('utf-8', 'replace')
+    command_started = health.command_started.value
+    last_pump = health.last_pump.value
+
+    if command:
+        state = 'running'
+    elif not last_pump or now - last_pump > blocked_after:
+        state = 'blocked'
+    else:
+        state = 'idle'
+
+    return {
+        'state': state,
+        'command': command or None,
+        'command_age_s': get_age(command_started, now) if command else None,
+        'last_pump_age_s': get_age(last_pump, now),
+        'last_pickup_age_s': get_age(health.last_pickup.value, now),
+        'handled': health.handled.value,
+    }
@@ -0,0 +1,146 @@
+# Long running commands can be started as jobs, so they don't hold up the connection which sent them.
+# The client gets a job id straight away, and can poll the job with get_job, or wait for it with await_job.
+#
+# Jobs are updated by the message pump on blender's main thread. A job function can be a plain command, which runs in one go,
+# or a generator, which yields while it waits on something outside blender (eg: a background blender process)
+
+import itertools
+import json
+import types
+import time
+
+from . import log, command_arguments
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Finished jobs are forgotten once there are more than this many
+max_finished_jobs = 100
+
+jobs = {}
+job_ids = itertools.count(1)
+
+class Job:
+    def __init__(self, job_id, command, function, parameters):
+        self.job_id = job_id
+        self.command = command
+        self.function = function
+        self.parameters = parameters
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.generator = None
+        self.finish_time = None
+        self.callbacks = []
+
+    def is_finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def to_dict(self):
+        job_dict = {'job_id': self.job_id, 'command': self.command, 'status': self.status}
+        if self.status == JOB_DONE:
+            # Sent as the text the command would have answered with
+            job_dict['result'] = command_arguments.serialize_result(self.result)
+        elif self.status == JOB_FAILED:
+            job_dict['error'] = self.error
+        return job_dict
+
+class DeferredResponse:
+    """Returned by a command which can't answer yet. The message pump sends the response once ready() is called"""
+    def __init__(self):
+        self.callbacks = []
+        self.response = None
+        self.is_ready = False
+
+    def on_ready(self, callback):
+        if self.is_ready:
+            callback(self.response)
+        else:
+            self.callbacks.append(callback)
+
+    def ready(self, response):
+        self.response = response
+        self.is_ready = True
+        for callback in self.callbacks:
+            callback(response)
+        self.callbacks.clear()
+
+def start_job(command, function, parameters):
+    """Queues a job, it starts on the next update so the job id can be sent to the client first"""
+    job = Job(next(job_ids), command, function, parameters)
+    jobs[job.job_id] = job
+    return job
+
+def get_job(job_id):
+    return jobs.get(job_id)
+
+def await_job(job):
+    """Returns a DeferredResponse, answered with the job's state once it is finished"""
+    deferred = DeferredResponse()
+
+    if job.is_finished():
+        deferred.ready(json.dumps(job.to_dict()))
+    else:
+        job.callbacks.append(lambda finished_job: deferred.ready(json.dumps(finished_job.to_dict())))
+
+    return deferred
+
+def finish_job(job, status, result=None, error=None):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.generator = None
+    job.finish_time = time.monotonic()
+
+    if error:
+        log.error("Job %s (%s) failed: %s", job.job_id, job.command, error)
+
+    for callback in job.callbacks:
+        callback(job)
+    job.callbacks.clear()
+
+def update_job(job):
+    try:
+        if job.status == JOB_QUEUED:
+            job.status = JOB_RUNNING
+            result = job.function(job.parameters)
+
+            if not isinstance(result, types.GeneratorType):
+                finish_job(job, JOB_DONE, result=result)
+                return
+
+            job.generator = result
+
+        next(job.generator)
+
+    except StopIteration as e:
+        finish_job(job, JOB_DONE, result=e.value)
+    except Exception as e:
+        finish_job(job, JOB_FAILED, error=str(e))
+
+def forget_finished_jobs():
+    finished = [job for job in jobs.values() if job.is_finished()]
+    if len(finished) <= max_finished_jobs:
+        return
+
+    finished.sort(key=lambda job: job.finish_time)
+    for job in finished[:len(finished) - max_finished_jobs]:
+        del jobs[job.job_id]
+
+def update_jobs():
+    """Advances every unfinished job by one step, returns the number of jobs still running"""
+    running = 0
+
+    for job in list(jobs.values()):
+        if job.is_finished():
+            continue
+
+        update_job(job)
+
+        if not job.is_finished():
+            running += 1
+
+    forget_finished_jobs()
+    return running
@@ -0,0 +1,109 @@
+# Latency statistics for commands, kept by the server process and returned by the get_stats command.
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# Every request carries a trace: a dictionary of time.time() timestamps, one for each hop the request makes.
+# Timestamps are taken in both processes, so wall clock time is used rather than a monotonic clock.
+
+import time
+from collections import deque
+
+# (stage name, start timestamp, end timestamp)
+STAGES = (
+    ("receive", "received", "queued"),        # server process: message received, until it is put on message_queue
+    ("queue_wait", "queued", "picked_up"),    # waiting in message_queue for the message pump
+    ("parse", "picked_up", "started"),        # blender: decoding and parsing the message
+    ("execute", "started", "finished"),       # blender: running the command functions
+    ("encode", "finished", "encoded"),        # blender: encoding the response, and moving large responses to shared memory
+    ("return", "encoded", "responded"),       # response going back through response_queue
+    ("serialize", "responded", "sent"),       # server process: encoding, compressing and queueing the response on the socket
+)
+
+# Upper bounds of the histogram buckets, in milliseconds
+histogram_bounds_ms = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+# Requests slower than this are kept in slow_requests, with their full trace
+slow_request_threshold_ms = 100.0
+max_slow_requests = 50
+
+start_time = time.time()
+command_stats = {}
+slow_requests = deque(maxlen=max_slow_requests)
+
+class CommandStats:
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(histogram_bounds_ms) + 1)
+        self.stage_total_ms = {stage: 0.0 for stage, _, _ in STAGES}
+
+    def add(self, duration_ms, stage_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+        bucket = 0
+        while bucket < len(histogram_bounds_ms) and duration_ms > histogram_bounds_ms[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+        for stage, duration in stage_ms.items():
+            self.stage_total_ms[stage] += duration
+
+    def to_dict(self):
+        count = max(self.count, 1)
+
+        labels = ["<=" + str(bound) + "ms" for bound in histogram_bounds_ms] + [">" + str(histogram_bounds_ms[-1]) + "ms"]
+        histogram = {label: bucket_count for label, bucket_count in zip(labels, self.histogram) if bucket_count}
+
+        return {
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "mean_ms": self.total_ms / count,
+            "max_ms": self.max_ms,
+            "histogram": histogram,
+            "stage_mean_ms": {stage: total / count for stage, total in self.stage_total_ms.items()},
+        }
+
+def get_command_stats(command):
+    if command not in command_stats:
+        command_stats[command] = CommandStats()
+    return command_stats[command]
+
+def get_stage_durations(trace):
+    """Milliseconds spent in each stage, stages missing a timestamp are left out"""
+    durations = {}
+    for stage, start, end in STAGES:
+        if start in trace and end in trace:
+            durations[stage] = max(0.0, (trace[end] - trace[start]) * 1000.0)
+    return durations
+
+def record(command, trace):
+    if "received" not in trace or "sent" not in trace:
+        return
+
+    duration_ms = (trace["sent"] - trace["received"]) * 1000.0
+    stage_ms = get_stage_durations(trace)
+
+    get_command_stats(command).add(duration_ms, stage_ms)
+
+    if duration_ms >= slow_request_threshold_ms:
+        slow_requests.append({"command": command, "duration_ms": duration_ms, "stage_ms": stage_ms, "trace": dict(trace)})
+
+def record_timeout(command):
+    get_command_stats(command).timeouts += 1
+
+def reset():
+    global start_time
+
+    start_time = time.time()
+    command_stats.clear()
+    slow_requests.clear()
+
+def get_stats():
+    return {
+        "since": start_time,
+        "commands": {command: stats.to_dict() for command, stats in command_stats.items()},
+        "slow_requests": list(slow_requests),
+    }
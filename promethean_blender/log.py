@@ -0,0 +1,129 @@
+# Leveled logging for the add-on, the server process and the background tasks.
+# Note: This file is imported by the server subprocess and by the background tasks, so it must not import bpy or use relative imports
+#
+# Messages use logging's lazy % formatting: log.debug("Command %s %s", command, truncate(parameters_str)) does no formatting
+# at all unless debug messages are enabled. Large payloads should be wrapped in truncate(), which only shortens them when the message is formatted.
+# The most recent messages are kept in a ring buffer, returned by the get_logs command.
+
+import logging
+import os
+import sys
+from collections import deque
+
+LOGGER_NAME = 'PrometheanAI'
+
+# Default level, can be overridden with the PROMETHEAN_LOG_LEVEL environment variable or the set_log_level command
+default_level = os.environ.get('PROMETHEAN_LOG_LEVEL', 'INFO').upper()
+
+# Longest payload written to a log message, longer ones are cut with a note of their full length
+max_payload_length = 500
+
+max_buffered_records = 1000
+
+class Truncated:
+    """Wraps a payload so it is only converted to a string, and shortened, when a message is actually formatted"""
+    __slots__ = ('payload', 'length')
+
+    def __init__(self, payload, length):
+        self.payload = payload
+        self.length = length
+
+    def __str__(self):
+        payload = self.payload
+
+        # Slice before converting, so a huge payload isn't copied
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            text = bytes(payload[:self.length]).decode('utf-8', 'replace')
+            full_length = len(payload)
+        elif isinstance(payload, str):
+            text = payload[:self.length]
+            full_length = len(payload)
+        else:
+            text = str(payload)
+            full_length = len(text)
+            text = text[:self.length]
+
+        if full_length > self.length:
+            return text + '... (' + str(full_length) + ' total)'
+        return text
+
+def truncate(payload, length=None):
+    return Truncated(payload, length or max_payload_length)
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last records in memory, so they can be queried over the socket"""
+    def __init__(self, capacity):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self.records.append({
+                'time': record.created,
+                'level': record.levelname,
+                'process': record.processName,
+                'message': record.getMessage(),
+            })
+        except Exception:
+            self.handleError(record)
+
+    def get_records(self, level=logging.NOTSET, since=0.0, limit=None):
+        records = [record for record in self.records if logging.getLevelName(record['level']) >= level and record['time'] > since]
+        if limit:
+            records = records[-limit:]
+        return records
+
+logger = logging.getLogger(LOGGER_NAME)
+ring_buffer = RingBufferHandler(max_buffered_records)
+
+def setup():
+    # The module can be reloaded when the add-on is, and the logger keeps the handlers added by the old module.
+    # The console handler is kept, the old ring buffer is replaced by this module's, so get_logs still sees new records
+    for handler in list(logger.handlers):
+        if handler is not ring_buffer and type(handler).__name__ == 'RingBufferHandler':
+            ring_buffer.records.extend(getattr(handler, 'records', ()))
+            logger.removeHandler(handler)
+
+    if ring_buffer not in logger.handlers:
+        logger.addHandler(ring_buffer)
+
+    if any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('PrometheanAI: %(message)s'))
+
+    logger.addHandler(console)
+    logger.setLevel(default_level)
+    logger.propagate = False
+
+def set_level(level):
+    """Sets the level by name (eg: 'DEBUG'), returns the name of the new level"""
+    logger.setLevel(get_level_number(level))
+    return logging.getLevelName(logger.level)
+
+def get_level_number(level):
+    """The number of a level name, raises ValueError for names logging doesn't know"""
+    number = logging.getLevelName(str(level).upper())
+    if not isinstance(number, int):
+        raise ValueError("Unknown log level: " + str(level))
+    return number
+
+def get_logs(level='NOTSET', since=0.0, limit=None):
+    """Raises ValueError for an unknown level, or a since or limit which isn't a number"""
+    try:
+        since = float(since)
+        limit = int(limit) if limit else None
+    except (TypeError, ValueError):
+        raise ValueError("since and limit must be numbers")
+
+    return ring_buffer.get_records(get_level_number(level), since, limit)
+
+setup()
+
+debug = logger.debug
+info = logger.info
+warning = logger.warning
+error = logger.error
+exception = logger.exception
+is_enabled = logger.isEnabledFor
@@ -0,0 +1,197 @@
+# Index of which objects are meshes, selected and visible, so the queries in utils.py don't call select_get() and visible_get()
+# on every object in the scene each time.
+#
+# The index is brought up to date when it is queried:
+# objects the depsgraph reported as changed are read again, selection and visibility of every object are read again when the
+# depsgraph reports anything else (selecting and hiding tag the scene, not the objects) or after a command which can change them,
+# and the whole index is rebuilt when objects were added, removed or renamed, or a file was loaded.
+# Until register() is called, in background tasks for example, the queries fall back to scanning bpy.data.objects
+
+import bpy
+import time
+
+from bpy.app.handlers import persistent
+
+from . import log
+
+active = False
+
+# The objects in bpy.data.objects order, and name -> position in it, so results keep the order of bpy.data.objects
+objects = []
+order = {}
+meshes = set()
+selected = set()
+visible = set()
+# (mesh, is_selected, is_visible) -> result of find, until selection or visibility change
+results = {}
+
+changed_names = set()
+check_all = False
+rebuild = True
+
+def reset():
+    global rebuild
+    global check_all
+
+    rebuild = True
+    check_all = False
+    changed_names.clear()
+
+def mark_changed(rebuild_all=False, check=False, names=()):
+    global rebuild
+    global check_all
+
+    rebuild |= rebuild_all
+    check_all |= check
+    changed_names.update(names)
+
+def update_flag(names, name, value):
+    if value == (name in names):
+        return False
+    if value:
+        names.add(name)
+    else:
+        names.discard(name)
+    return True
+
+def update_object(object, name):
+    changed = update_flag(selected, name, object.select_get())
+    changed |= update_flag(visible, name, object.visible_get())
+    if changed:
+        results.clear()
+
+def rebuild_index():
+    start = time.perf_counter()
+
+    objects[:] = bpy.data.objects
+    order.clear()
+    meshes.clear()
+    selected.clear()
+    visible.clear()
+    results.clear()
+
+    for index, object in enumerate(objects):
+        name = object.name
+        order[name] = index
+        if object.type == 'MESH':
+            meshes.add(name)
+        update_object(object, name)
+
+    log.debug("Rebuilt object index of %s objects in %.1f ms", len(order), (time.perf_counter() - start) * 1000.0)
+
+def check_objects():
+    """Reads selection and visibility of every object again. Returns False if objects were added, removed, renamed or reordered"""
+    if len(bpy.data.objects) != len(order):
+        return False
+
+    for index, object in enumerate(bpy.data.objects):
+        name = object.name
+        if order.get(name) != index:
+            return False
+        update_object(object, name)
+
+    return True
+
+def update_changed_objects():
+    """Reads the objects the depsgraph reported again. Returns False if one of them is new or gone"""
+    for name in changed_names:
+        object = bpy.data.objects.get(name)
+        if object is None or name not in order:
+            return False
+        update_object(object, name)
+
+    return True
+
+def refresh():
+    """Brings the index up to date, returns False if the index isn't active"""
+    global rebuild
+    global check_all
+
+    if not active:
+        return False
+
+    if not rebuild:
+        # Adding or removing objects in the middle of a command doesn't reach the depsgraph until the command is done
+        rebuild = len(bpy.data.objects) != len(order) or not update_changed_objects() or (check_all and not check_objects())
+
+    if rebuild:
+        rebuild_index()
+
+    rebuild = False
+    check_all = False
+    changed_names.clear()
+    return True
+
+def get_objects(names):
+    return [objects[index] for index in sorted(order[name] for name in names)]
+
+def find(mesh=False, is_selected=None, is_visible=None):
+    """Objects in bpy.data.objects order. mesh=True only returns meshes, is_selected and is_visible only return objects
+    with that selection or visibility, None accepts either"""
+    if not refresh():
+        return [object for object in bpy.data.objects if (not mesh or object.type == 'MESH')
+                and (is_selected is None or object.select_get() == is_selected)
+                and (is_visible is None or object.visible_get() == is_visible)]
+
+    key = (mesh, is_selected, is_visible)
+    if key not in results:
+        names = meshes if mesh else order.keys()
+        if is_selected is not None:
+            names = names & selected if is_selected else names - selected
+        if is_visible is not None:
+            names = names & visible if is_visible else names - visible
+        results[key] = get_objects(names)
+
+    # A copy, callers are free to change the list
+    return list(results[key])
+
+def get_positions(objects):
+    """Positions of the objects in bpy.data.objects, to pick them out of arrays read with bpy.data.objects.foreach_get"""
+    if refresh():
+        return [order[object.name] for object in objects]
+
+    positions = {object.name: index for index, object in enumerate(bpy.data.objects)}
+    return [positions[object.name] for object in objects]
+
+@persistent
+def depsgraph_update_handler(scene, depsgraph):
+    names = []
+    check = False
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object):
+            names.append(update.id.name)
+        else:
+            check = True
+
+    mark_changed(check=check, names=names)
+
+@persistent
+def rebuild_handler(*args):
+    # Loading a file, undo and redo replace every object
+    mark_changed(rebuild_all=True)
+
+# bpy.app.handlers list name -> handler
+handlers = {
+    "depsgraph_update_post": depsgraph_update_handler,
+    "load_post": rebuild_handler,
+    "load_factory_startup_post": rebuild_handler,
+    "undo_post": rebuild_handler,
+    "redo_post": rebuild_handler,
+}
+
+def register():
+    global active
+
+    reset()
+    for handler_list, handler in handlers.items():
+        getattr(bpy.app.handlers, handler_list).append(handler)
+    active = True
+
+def unregister():
+    global active
+
+    active = False
+    for handler_list, handler in handlers.items():
+        handler_list = getattr(bpy.app.handlers, handler_list)
+        if handler in handler_list:
+            handler_list.remove(handler)
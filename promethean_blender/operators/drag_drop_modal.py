@@ -1,9 +1,6 @@
 import bpy
 from bpy_extras import view3d_utils
 
-import gpu
-from gpu_extras.batch import batch_for_shader
-
 from ..constants import *
 from .. import utils
 
@@ -69,6 +66,7 @@ class DragDropModalOperator(bpy.types.Operator):
 
         transformed = [transform @ pt for pt in bounds]
 
+        from gpu_extras.batch import batch_for_shader
         batch = batch_for_shader(self.shader, 'LINES', {"pos": transformed}, indices=self.indices)
         batch.draw(self.shader)
 
@@ -128,6 +126,8 @@ class DragDropModalOperator(bpy.types.Operator):
         self._timer = wm.event_timer_add(0.01, window=bpy.context.window)
         wm.modal_handler_add(self)
 
+        # gpu is only needed once a drag starts, importing it here keeps it out of the add-on's import time
+        import gpu
         self.shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
         self.draw_handler = bpy.types.SpaceView3D.draw_handler_add(self.draw_overlay, (), 'WINDOW', 'POST_VIEW')
 
@@ -1,19 +1,17 @@
 # Note: This file contains only code to manage the server subprocess. Not the actual server code, which can be found in 'server_process.py' 
 
-from os import kill
 import bpy
 
 #Blender does not play nicely with threads, so we will use multiprocessing
 import multiprocessing
 import queue
 
-import threading
-
-from numpy import block
+import time
+from collections import deque
 
 from bpy.app.handlers import persistent
 
-from .. import command_manager, server_process
+from .. import command_manager, server_entry, shared_memory_channel, snapshot_publisher, object_index, spatial_index, raycast, jobs, log, health
 from ..constants import *
 
 import atexit
@@ -21,22 +19,154 @@ import atexit
 process = None
 message_queue = None
 response_queue = None
+release_queue = None
+
+# Message pump tuning. Each timer tick handles messages until the time budget is used up, so the UI stays responsive.
+# While messages are arriving the timer runs at the fastest interval, after being idle for a while it slows down.
+pump_time_budget = 0.008
+min_timer_interval = 0.001
+max_timer_interval = 0.05
+idle_slowdown_delay = 1.0
+
+# Queue limits. Once max_queued_messages are waiting the server stops reading from clients, or replies busy, see server_process.py
+max_queued_messages = 256
+max_queued_responses = 256
+
+# Responses which didn't fit in response_queue, sent first on the next pump so the order is kept
+unsent_responses = deque()
 
 
 def append_response(response):
     response_queue.put(response)
 
+def put_response(item):
+    # Never block blender's main thread on a full queue, keep the response until the server has caught up
+    if not unsent_responses:
+        try:
+            response_queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+    unsent_responses.append(item)
+
+def flush_unsent_responses():
+    while unsent_responses:
+        try:
+            response_queue.put_nowait(unsent_responses[0])
+        except queue.Full:
+            break
+        unsent_responses.popleft()
+
+def send_response(request_id, response, trace):
+    # Large responses are passed through shared memory
+    response = shared_memory_channel.share_response(response)
+    trace['encoded'] = time.time()
+    put_response((request_id, response, trace))
+
+def handle_queued_message():
+    """Handles a single message from the server, returns False if the queue was empty"""
+    request_id = None
+    trace = {}
+    try:
+        # Each message is tagged with an id, so the server knows which connection to send the response to
+        request_id, data, options, trace = message_queue.get(block=False)
+        trace['picked_up'] = time.time()
+        health.mark_pickup()
+
+        # Large messages are passed through shared memory
+        with shared_memory_channel.open_message(data) as message:
+            response = command_manager.handle_message(message, options, trace)
+
+        # Commands like await_job answer later, other requests keep being handled meanwhile
+        if isinstance(response, jobs.DeferredResponse):
+            response.on_ready(lambda ready_response, request_id=request_id, trace=trace: send_response(request_id, ready_response, trace))
+        else:
+            send_response(request_id, response, trace)
+
+    except queue.Empty:
+        return False
+    except Exception as e:
+        log.exception("Error handling message: %s", e)
+        put_response((request_id, "ERROR", trace))
+
+    return True
+
+def release_shared_memory():
+    # The server process has read these responses, close our handles so the memory can be freed
+    while True:
+        try:
+            name = release_queue.get(block=False)
+        except queue.Empty:
+            break
+        shared_memory_channel.release_outgoing(name)
+
+    shared_memory_channel.close_lingering_blocks()
+
+def publish_snapshot():
+    # Goes through response_queue, so the server applies it before any response sent after it
+    update = snapshot_publisher.get_update()
+    if update:
+        put_response((None, update, {}))
+
+def pump_messages(time_budget):
+    """Handles queued messages until the queue is empty or the time budget is used up. Returns the number of messages handled"""
+    start = time.perf_counter()
+    handled = 0
+
+    # Lets the server process tell an idle blender from one that has stopped pumping messages
+    health.mark_pump()
+    release_shared_memory()
+    flush_unsent_responses()
+    # Blender has evaluated the depsgraph since the last pump, so the snapshot has what the last commands changed
+    publish_snapshot()
+
+    while handle_queued_message():
+        handled += 1
+
+        # The queue might still have messages, let blender redraw and pick up the rest next tick
+        if time.perf_counter() - start >= time_budget:
+            break
+
+    jobs.update_jobs()
+
+    return handled
+
 class ServerMessageModalOperator(bpy.types.Operator):
     """Operator which runs in a timer, to check for messages from the server subprocess"""
     bl_idname = SERVER_MESSAGE_MODAL_ID
     bl_label = SERVER_MESSAGE_MODAL_NAME
     _timer = None
+    _timer_interval = 0.0
+    _window = None
+    _last_message_time = 0.0
 
     def cancel(self, context):
         wm = context.window_manager
         wm.event_timer_remove(self._timer)
         return {FINISHED}
 
+    def set_timer_interval(self, context, interval):
+        if interval == self._timer_interval:
+            return
+
+        wm = context.window_manager
+        if self._timer:
+            wm.event_timer_remove(self._timer)
+
+        self._timer = wm.event_timer_add(interval, window=self._window)
+        self._timer_interval = interval
+
+    def update_timer(self, context, handled):
+        now = time.perf_counter()
+
+        if handled:
+            self._last_message_time = now
+            self.set_timer_interval(context, min_timer_interval)
+        elif now - self._last_message_time > idle_slowdown_delay:
+            # Back off gradually, so a client sending commands every now and then doesn't wait for the slowest timer
+            self.set_timer_interval(context, min(self._timer_interval * 2, max_timer_interval))
+
     def modal(self, context, event):
         global message_queue
         global response_queue
@@ -44,25 +174,21 @@ class ServerMessageModalOperator(bpy.types.Operator):
 
         if process == None or message_queue == None:
             return self.cancel(context)
-        else:
-            try:
-                data = message_queue.get(block=False)
-                response = command_manager.handle_message(data)
-                response_queue.put(response)
 
-            except queue.Empty:
-                pass
-            except Exception as e:
-                print(e)
-                response_queue.put("ERROR")
-                pass
+        # Only pumped on the timer, so mouse moves and key presses while the user works don't run commands on top of
+        # the time budget
+        if event.type == EVENT_TIMER:
+            handled = pump_messages(pump_time_budget)
+            self.update_timer(context, handled)
 
-            return {PASS_THROUGH}
+        return {PASS_THROUGH}
 
     def execute(self, context):
         wm = context.window_manager
 
-        self._timer = wm.event_timer_add(0.01, window=context.window)
+        self._window = context.window
+        self._last_message_time = time.perf_counter()
+        self.set_timer_interval(context, min_timer_interval)
         wm.modal_handler_add(self)
         print("PrometheanAI: Checking for messages")
         return {RUNNING_MODAL}
@@ -71,6 +197,7 @@ def kill_server_process():
     global process
     global message_queue
     global response_queue
+    global release_queue
     
     bpy.context.window_manager.promethean_server_status = PROMETHEAN_SERVER_STATUS_DISCONNECTED
 
@@ -79,10 +206,14 @@ def kill_server_process():
         process.join()
         print ('PrometheanAI: Killing server, exit code:', process.exitcode)
 
+    shared_memory_channel.close_outgoing()
+    unsent_responses.clear()
+    health.shared = None
     process = None
 
     message_queue = None
     response_queue = None
+    release_queue = None
 
 class KillServer(bpy.types.Operator):
     """Kills the Promethean TCP Server"""
@@ -108,41 +239,27 @@ class StartServer(bpy.types.Operator):
     def poll(cls, context):
         return True
 
-    def try_vacate_socket(self, timeout = 1.0):
-        from ..server_process import port
-        import socket
-
-        ip = "127.0.0.1"
-
-        try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.settimeout(timeout)
-
-            client_socket.connect((ip, port))
-            client_socket.send(VACATE_MESSAGE.encode())
-            data = client_socket.recv(131072)
-            print(data.decode())
-            client_socket.close()
-        except:
-            pass
-    
     def execute(self, context):
         global process
         global message_queue
         global response_queue
-
-
-        self.try_vacate_socket(0.5)
+        global release_queue
 
 
         print("PrometheanAI: Starting Server Process")
+        start_time = time.time()
+
+        message_queue = multiprocessing.Queue(max_queued_messages)
+        response_queue = multiprocessing.Queue(max_queued_responses)
+        release_queue = multiprocessing.Queue()
+        health.shared = health.SharedHealth()
+        snapshot_publisher.reset()
 
-        message_queue = multiprocessing.Queue()
-        response_queue = multiprocessing.Queue()
-        process = multiprocessing.Process(target=server_process.main, args=(message_queue,response_queue))
+        # The server binds the port itself, asking a server left over from another session to vacate it only if it is taken
+        process = multiprocessing.Process(target=server_entry.main, args=(start_time,message_queue,response_queue,release_queue,max_queued_messages,health.shared))
         process.start()
 
-        print("PrometheanAI: Server process created - process ID: " + str(process.pid))
+        log.info("Server process created in %.1f ms - process ID: %s", (time.time() - start_time) * 1000.0, process.pid)
 
 
         bpy.context.window_manager.promethean_server_status = PROMETHEAN_SERVER_STATUS_CONNECTED
@@ -189,9 +306,13 @@ def register():
     # If blender opens a new file, the promethean_check_for_messages operator will be stopped, so we have to restart it
     bpy.app.handlers.load_post.append(load_handler)
     bpy.app.handlers.load_factory_startup_post.append(load_handler)
+    snapshot_publisher.register()
+    object_index.register()
+    spatial_index.register()
+    raycast.register()
 
-    # Register a timer, after 5 seconds the server will launch
-    bpy.app.timers.register(startup_timer, first_interval=5)
+    # Operators can't run while the add-on is registering, the timer launches the server as soon as blender's event loop starts
+    bpy.app.timers.register(startup_timer)
 
     
 
@@ -199,6 +320,10 @@ def unregister():
 
     #kill_server_process()
     bpy.app.handlers.load_post.remove(load_handler)
+    snapshot_publisher.unregister()
+    object_index.unregister()
+    spatial_index.unregister()
+    raycast.unregister()
     atexit.unregister(kill_server_process)
 
     bpy.utils.unregister_class(KillServer)
@@ -0,0 +1,142 @@
+# Opt-in profiling of commands with cProfile and tracemalloc, so slow commands can be looked at inside a running blender session.
+#
+# profile_command runs one command under the profiler, and returns its result together with the profile summary.
+# profile_next profiles the next N commands as they arrive from the client. Their summaries are kept, and returned by get_profiles.
+# Each profile is also written to the output folder: a .prof file (open with pstats or snakeviz) and a tracemalloc .snapshot file
+
+import itertools
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+from . import log
+
+default_output_folder = os.path.join(tempfile.gettempdir(), 'promethean_profiles')
+default_top = 20
+max_kept_profiles = 20
+
+output_folder = default_output_folder
+top = default_top
+
+# Number of upcoming commands to profile, and which commands count towards it. An empty set means any command
+remaining = 0
+profiled_commands = set()
+
+profiles = deque(maxlen=max_kept_profiles)
+profile_ids = itertools.count(1)
+
+def configure(parameters):
+    global output_folder
+    global top
+
+    output_folder = parameters.get('folder') or default_output_folder
+    top = int(parameters.get('top', default_top))
+
+def profile_next(count, commands=None):
+    global remaining
+
+    remaining = count
+    profiled_commands.clear()
+    profiled_commands.update(commands or [])
+
+def should_profile(command):
+    """True if the next command should be profiled, counts down the commands left to profile"""
+    global remaining
+
+    if remaining <= 0:
+        return False
+    if profiled_commands and command not in profiled_commands:
+        return False
+
+    remaining -= 1
+    return True
+
+def get_function_stats(profile):
+    import pstats
+
+    stats = pstats.Stats(profile)
+    entries = []
+
+    for (filename, line, function_name), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+        entries.append({
+            'function': function_name,
+            'location': os.path.basename(filename) + ':' + str(line),
+            'calls': calls,
+            'total_ms': total_time * 1000.0,
+            'cumulative_ms': cumulative_time * 1000.0,
+        })
+
+    entries.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return entries[:top]
+
+def get_memory_stats(snapshot):
+    import cProfile
+
+    # Leave out allocations made by the profilers themselves
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ))
+
+    entries = []
+    for statistic in snapshot.statistics('lineno')[:top]:
+        frame = statistic.traceback[0]
+        entries.append({
+            'location': os.path.basename(frame.filename) + ':' + str(frame.lineno),
+            'size_kb': statistic.size / 1024.0,
+            'count': statistic.count,
+        })
+
+    return entries
+
+def run_profiled(command, function, parameters):
+    """Runs function(parameters) under cProfile and tracemalloc, returns (response, profile summary)"""
+    # The profilers are only imported once something is profiled, so they don't add to the add-on's import time
+    import cProfile
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        response = profile.runcall(function, parameters)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        _, peak_memory = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+
+        if started_tracing:
+            tracemalloc.stop()
+
+    os.makedirs(output_folder, exist_ok=True)
+    file_name = time.strftime('%Y%m%d_%H%M%S') + '_' + str(next(profile_ids)) + '_' + command
+    profile_path = os.path.join(output_folder, file_name + '.prof')
+    snapshot_path = os.path.join(output_folder, file_name + '.snapshot')
+
+    profile.dump_stats(profile_path)
+    snapshot.dump(snapshot_path)
+
+    summary = {
+        'command': command,
+        'duration_ms': duration_ms,
+        'peak_memory_kb': peak_memory / 1024.0,
+        'profile_path': profile_path,
+        'snapshot_path': snapshot_path,
+        'functions': get_function_stats(profile),
+        'memory': get_memory_stats(snapshot),
+    }
+    profiles.append(summary)
+
+    log.info("Profiled %s in %.2f ms, saved to %s", command, duration_ms, profile_path)
+    return response, summary
+
+def get_profiles(clear=False):
+    kept = list(profiles)
+    if clear:
+        profiles.clear()
+    return kept
@@ -0,0 +1,190 @@
+# Message framing used between Promethean clients and the server process.
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# Framed messages start with a fixed size header: FRAME_MAGIC, a flags byte, and the size of the body in bytes.
+# Connections which do not start with FRAME_MAGIC are treated as legacy connections, where commands are newline delimited.
+
+import struct
+import zlib
+
+FRAME_MAGIC = b'PRMF'
+FRAME_HEADER = struct.Struct('<4sBQ')
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+# Frame flags
+# The body starts with a client chosen request id, which the server copies into the response.
+# Requests with an id can be answered out of order, requests without one are answered in the order they were sent
+FLAG_REQUEST_ID = 0x01
+# The body (after the request id, if there is one) is zlib compressed, see compress_message
+FLAG_COMPRESSED = 0x02
+
+REQUEST_ID = struct.Struct('<Q')
+
+MODE_FRAMED = 'framed'
+MODE_LEGACY = 'legacy'
+
+recv_size = 131072
+# Largest message accepted from a client. The body buffer is allocated from the size in the frame header before the body arrives,
+# so this is also the most memory a single bogus header can make the server allocate
+max_message_size = 256 << 20
+
+class ProtocolError(Exception):
+    pass
+
+def frame_header(body_size, flags=0):
+    return FRAME_HEADER.pack(FRAME_MAGIC, flags, body_size)
+
+def encode_frame(body, flags=0):
+    return frame_header(len(body), flags) + body
+
+def encode_request(body, request_id=None):
+    if request_id is None:
+        return encode_frame(body)
+    return encode_frame(REQUEST_ID.pack(request_id) + body, FLAG_REQUEST_ID)
+
+def compress_message(compressor, body):
+    """Compresses one message with a connection's zlib.compressobj.
+    Every message is flushed on its own, but keeps the compression history of the messages before it, so similar messages compress well"""
+    return compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+def decompress_message(decompressor, body):
+    """Decompresses one message from compress_message. Raises ProtocolError if it would be larger than max_message_size,
+    without decompressing the rest, so a small frame can't make the server allocate more than an uncompressed one"""
+    output = decompressor.decompress(body, max_message_size)
+    if decompressor.unconsumed_tail:
+        raise ProtocolError("Decompressed message too large")
+    return output
+
+def split_request_id(flags, body):
+    """Returns (request id, body without the id). The request id is None if the frame doesn't have one"""
+    if not flags & FLAG_REQUEST_ID:
+        return None, body
+
+    if len(body) < REQUEST_ID.size:
+        raise ProtocolError("Frame is too short for a request id")
+
+    request_id, = REQUEST_ID.unpack_from(body)
+    return request_id, memoryview(body)[REQUEST_ID.size:]
+
+class MessageReader:
+    """Splits the byte stream of a single connection into complete messages"""
+    def __init__(self):
+        self.mode = None
+        self.buffer = bytearray()
+
+        # Large bodies are received straight into a buffer of the right size, instead of growing self.buffer
+        self.body = None
+        self.body_view = None
+        self.body_received = 0
+        self.body_flags = 0
+
+    def read(self, connection):
+        """Reads what is available on the connection. Returns a list of (flags, body) tuples, or None if the connection closed"""
+        if self.body is not None:
+            received = connection.recv_into(self.body_view[self.body_received:])
+            if not received:
+                return None
+
+            self.body_received += received
+            if self.body_received < len(self.body):
+                return []
+
+            return [self.finish_body()]
+
+        data = connection.recv(recv_size)
+        if not data:
+            return None
+
+        self.buffer += data
+        return self.parse(short_read=len(data) < recv_size)
+
+    def finish_body(self):
+        message = (self.body_flags, self.body)
+        self.body = None
+        self.body_view = None
+        self.body_received = 0
+        return message
+
+    def parse(self, short_read=True):
+        if self.mode is None:
+            # Wait until there are enough bytes to tell a framed connection from a legacy one
+            if len(self.buffer) < len(FRAME_MAGIC) and FRAME_MAGIC.startswith(self.buffer):
+                return []
+            self.mode = MODE_FRAMED if self.buffer.startswith(FRAME_MAGIC) else MODE_LEGACY
+
+        if self.mode == MODE_FRAMED:
+            return self.parse_framed()
+        return self.parse_legacy(short_read)
+
+    def parse_framed(self):
+        messages = []
+        offset = 0
+
+        while len(self.buffer) - offset >= FRAME_HEADER_SIZE:
+            magic, flags, body_size = FRAME_HEADER.unpack_from(self.buffer, offset)
+            if magic != FRAME_MAGIC:
+                raise ProtocolError("Invalid frame header")
+            if body_size > max_message_size:
+                raise ProtocolError("Message too large: " + str(body_size))
+
+            body_start = offset + FRAME_HEADER_SIZE
+            available = len(self.buffer) - body_start
+
+            if available >= body_size:
+                messages.append((flags, bytes(self.buffer[body_start:body_start + body_size])))
+                offset = body_start + body_size
+                continue
+
+            # Incomplete body, keep what we have and receive the rest directly into the body buffer
+            self.body = bytearray(body_size)
+            self.body_view = memoryview(self.body)
+            self.body_view[:available] = self.buffer[body_start:]
+            self.body_received = available
+            self.body_flags = flags
+            offset = len(self.buffer)
+            break
+
+        del self.buffer[:offset]
+        return messages
+
+    def parse_legacy(self, short_read):
+        # Legacy clients send newline delimited commands. Every complete line received so far is one message.
+        # Old clients don't always terminate their last command, so a short read also ends the message.
+        end = self.buffer.rfind(b'\n') + 1
+        if short_read:
+            end = len(self.buffer)
+
+        if not end:
+            if len(self.buffer) > max_message_size:
+                raise ProtocolError("Message too large: " + str(len(self.buffer)))
+            return []
+
+        message = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return [(0, message)]
+
+def recv_exactly(connection, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return buffer
+
+def read_frame(connection):
+    """Blocking read of a single framed message, for use by clients. Returns (flags, body), or None if the connection closed"""
+    header = recv_exactly(connection, FRAME_HEADER_SIZE)
+    if header is None:
+        return None
+
+    magic, flags, body_size = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC:
+        raise ProtocolError("Invalid frame header")
+
+    body = recv_exactly(connection, body_size)
+    if body is None:
+        return None
+    return flags, bytes(body)
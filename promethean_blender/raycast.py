@@ -0,0 +1,132 @@
+# Ray casts against the visible meshes, for raytrace, translate_and_raytrace and translate_and_snap.
+#
+# All rays of a command are first tested against the bounds in spatial_index together, then against a BVHTree of each object
+# they reach, nearest first, stopping once a hit is nearer than the next object's bounds.
+# Trees are built in object space the first time a ray reaches an object, and kept until its geometry changes, so moving
+# objects doesn't throw them away. Objects are left out of a ray by skipping them, instead of hiding them and evaluating
+# the depsgraph again.
+
+import bpy
+
+from bpy.app.handlers import persistent
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+
+from . import spatial_index
+
+# Object name -> (mesh name, vertex count, polygon count, BVHTree), the mesh details tell when the tree is out of date
+trees = {}
+
+def clear():
+    trees.clear()
+
+def mark_changed(clear_all=False, names=()):
+    if clear_all:
+        trees.clear()
+        return
+
+    for name in names:
+        trees.pop(name, None)
+
+def get_tree(object, depsgraph):
+    mesh = object.data
+    key = (mesh.name, len(mesh.vertices), len(mesh.polygons))
+
+    cached = trees.get(object.name)
+    if cached and cached[:3] == key:
+        return cached[3]
+
+    tree = BVHTree.FromObject(object, depsgraph)
+    trees[object.name] = key + (tree,)
+    return tree
+
+def cast_at_object(object, depsgraph, origin, direction, distance):
+    """Casts a world space ray at the object, returns (distance, location, normal) or None if it misses"""
+    matrix = object.matrix_world
+    try:
+        inverse = matrix.inverted()
+    except ValueError:
+        # Scaled to nothing, there is nothing to hit
+        return None
+
+    location, normal, index, local_distance = get_tree(object, depsgraph).ray_cast(inverse @ origin, inverse.to_3x3() @ direction)
+    if location is None:
+        return None
+
+    location = matrix @ location
+    hit_distance = (location - origin).length
+    if hit_distance > distance:
+        return None
+
+    return hit_distance, location, (inverse.transposed().to_3x3() @ normal).normalized()
+
+def cast_rays(origins, directions, distance=1.70141e+38, exclude=None):
+    """Casts rays against the visible meshes, like scene.ray_cast. exclude is a set of object names for each ray, which the ray
+    passes through. Returns (result, location, normal, object name) for each ray"""
+    import numpy
+
+    origins = numpy.asarray(origins, dtype=numpy.float64).reshape(-1, 3)
+    directions = numpy.asarray(directions, dtype=numpy.float64).reshape(-1, 3)
+    directions = directions / numpy.linalg.norm(directions, axis=1)[:, None]
+    distances = numpy.full(len(origins), distance, dtype=numpy.float64)
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    results = []
+
+    for ray, (names, enters) in enumerate(spatial_index.find_along_rays(origins, directions, distances)):
+        origin = Vector(origins[ray].tolist())
+        direction = Vector(directions[ray].tolist())
+        ray_exclude = exclude[ray] if exclude else ()
+
+        best = None
+        for name, enter in zip(names, enters):
+            if best is not None and enter > best[0]:
+                break
+            if name in ray_exclude:
+                continue
+
+            object = bpy.data.objects.get(name)
+            if object is None or not object.visible_get():
+                continue
+
+            hit = cast_at_object(object, depsgraph, origin, direction, distance)
+            if hit and (best is None or hit[0] < best[0]):
+                best = hit + (name,)
+
+        if best is None:
+            results.append((False, Vector((0.0, 0.0, 0.0)), Vector((0.0, 0.0, 0.0)), None))
+        else:
+            results.append((True, best[1], best[2], best[3]))
+
+    return results
+
+@persistent
+def depsgraph_update_handler(scene, depsgraph):
+    mark_changed(names=[update.id.name for update in depsgraph.updates
+                        if isinstance(update.id, bpy.types.Object) and update.is_updated_geometry])
+
+@persistent
+def clear_handler(*args):
+    # Loading a file, undo and redo replace every mesh
+    clear()
+
+# bpy.app.handlers list name -> handler
+handlers = {
+    "depsgraph_update_post": depsgraph_update_handler,
+    "load_post": clear_handler,
+    "load_factory_startup_post": clear_handler,
+    "undo_post": clear_handler,
+    "redo_post": clear_handler,
+}
+
+def register():
+    clear()
+    for handler_list, handler in handlers.items():
+        getattr(bpy.app.handlers, handler_list).append(handler)
+
+def unregister():
+    clear()
+    for handler_list, handler in handlers.items():
+        handler_list = getattr(bpy.app.handlers, handler_list)
+        if handler in handler_list:
+            handler_list.remove(handler)
@@ -0,0 +1,122 @@
+# Snapshot of the scene kept by the server process, so read only queries are answered without waiting for blender's main thread.
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# Blender publishes the snapshot after the depsgraph reports changes, see snapshot_publisher.py. Updates go through response_queue,
+# so a snapshot is always applied before the responses blender sent after it.
+# Every update carries the scene version it was taken at (see health.py). A snapshot is current while that version is still
+# blender's scene version, clients which can live with an older snapshot negotiate "snapshot_max_age".
+
+import json
+import time
+
+# Commands which can be answered from the snapshot, the responses are the same as the commands running in blender
+snapshot_commands = ("get_scene_name", "get_selection", "get_location_data", "get_transform_data")
+
+# Positions in an entry, blender sends name -> [is mesh, selected, visible, location, transform data]
+# Transform data is what get_transform_data returns for the object, None when it can only be answered by blender,
+# or blender hasn't read it yet
+ENTRY_IS_MESH = 0
+ENTRY_SELECTED = 1
+ENTRY_VISIBLE = 2
+ENTRY_LOCATION = 3
+ENTRY_TRANSFORM = 4
+
+class SnapshotUpdate:
+    """Changes to the snapshot since the last update, or the whole snapshot if full is True"""
+    def __init__(self, version, full, entries, selection, scene_name, removed=()):
+        self.version = version
+        self.full = full
+        self.entries = entries
+        # Names of the objects removed or renamed since the last update
+        self.removed = removed
+        # Names of the selected meshes in bpy.data.objects order, None if the selection hasn't changed
+        self.selection = selection
+        self.scene_name = scene_name
+        self.published = time.time()
+
+# The snapshot as last published by blender, version is None until the first update arrives
+version = None
+published = 0.0
+entries = {}
+selection = []
+scene_name = ''
+
+def apply(update):
+    global version
+    global published
+    global selection
+    global scene_name
+
+    if update.full:
+        entries.clear()
+    for name in update.removed:
+        entries.pop(name, None)
+    entries.update(update.entries)
+
+    if update.selection is not None:
+        selection = update.selection
+
+    scene_name = update.scene_name
+    version = update.version
+    published = update.published
+
+def clear():
+    global version
+
+    version = None
+    entries.clear()
+    selection.clear()
+
+def get_age(now=None):
+    return (now or time.time()) - published
+
+def is_current(scene_version):
+    return version is not None and version == scene_version
+
+def is_fresh(scene_version, max_age=0.0):
+    """True if the snapshot is current, or was published less than max_age seconds ago"""
+    if version is None:
+        return False
+    return is_current(scene_version) or (max_age > 0.0 and get_age() <= max_age)
+
+def get_transform_data(names):
+    """Returns None if one of the objects can only be answered by blender"""
+    data_dict = {}
+    for name in names:
+        entry = entries.get(name)
+        if entry:
+            if entry[ENTRY_TRANSFORM] is None:
+                return None
+            data_dict[name] = entry[ENTRY_TRANSFORM]
+    return data_dict
+
+def answer(command, parameters_str):
+    """Returns the response to a snapshot command, or None if it has to go to blender"""
+    if command == "get_scene_name":
+        return scene_name or 'None'
+
+    if command == "get_selection":
+        return str(selection)
+
+    if command == "get_location_data":
+        data_dict = {name: entries[name][ENTRY_LOCATION] for name in parameters_str.split(',') if name in entries}
+        return json.dumps(data_dict)
+
+    if command == "get_transform_data":
+        data_dict = get_transform_data(parameters_str.split(','))
+        return json.dumps(data_dict) if data_dict is not None else None
+
+    return None
+
+def get_status(scene_version):
+    if version is None:
+        return {'version': None, 'scene_version': scene_version, 'current': False}
+
+    return {
+        'version': version,
+        'scene_version': scene_version,
+        'current': is_current(scene_version),
+        'age_s': round(get_age(), 3),
+        'objects': len(entries),
+        'selected': len(selection),
+    }
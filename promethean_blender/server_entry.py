@@ -0,0 +1,13 @@
+# Entry point of the server subprocess, see StartServer in operators/server_manager.py
+# Note: When the process is spawned, multiprocessing imports the module holding the target in the new process.
+# Keep this module, and everything server_process imports, free of bpy, numpy and the commands so the server starts quickly
+
+import time
+
+def main(start_time, message_queue, response_queue, release_queue, max_queue_depth=None, health=None):
+    """start_time is the time.time() blender started the process at, to measure how long startup took"""
+    import_start = time.time()
+    from . import server_process
+    import_time = time.time() - import_start
+
+    server_process.main(message_queue, response_queue, release_queue, max_queue_depth, health, start_time=start_time, import_time=import_time)
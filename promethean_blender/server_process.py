@@ -1,97 +1,872 @@
 import socket
+import selectors
+import itertools
+import threading
+import heapq
+import time
+import json
+import zlib
 import queue
+import pickle
+from collections import deque
 
-from numpy import block
+from . import protocol, shared_memory_channel, latency_stats, log, health, scene_snapshot, command_arguments
 
 #Multiprocessing Vars
 message_queue = None
 response_queue = None
+release_queue = None
 
 #Server Vars
 server_socket = None
+selector = None
 host = "127.0.0.1"
 port = 1317
 vacate_socket_command = 'promethean_vacate_socket'
+# eg: promethean_negotiate {"encoding": "binary"}, answered by the server with the options now in use
+negotiate_command = 'promethean_negotiate'
+# get_stats, or get_stats {"reset": true}. Answered by the server process, see latency_stats.py
+stats_command = 'get_stats'
+# get_server_logs {"level": "warning", "since": 1700000000.0, "limit": 100}. Answered by the server process with its own log messages
+logs_command = 'get_server_logs'
+# ping and status are answered by the server process without waiting for blender, so health checks work while blender is busy.
+# Probes should use their own connection, or negotiate "when_busy": "reject", so they are still read while the queue is full
+ping_command = 'ping'
+status_command = 'status'
+# Commands the server process answers itself, these are answered even while reading is paused
+server_commands = (negotiate_command, stats_command, logs_command, ping_command, status_command)
 enable_command_queue = True
 ignore_vacate_socket = False
+# How long to wait for a server already holding the port to vacate it, see bind_server_socket
+vacate_timeout = 1.0
 
-def start_server():
+# Seconds to wait for blender to answer a command before a timeout error is sent back to the client. None waits forever
+default_command_timeout = 120.0
+command_timeouts = {
+    "open_scene": 600.0,
+    "learn_file": 600.0,
+    "create_assets_from_selection": 600.0,
+    "start_dragging_asset": None,
+    "await_job": None,
+}
+
+# Per connection options a client can negotiate, and the values (or type of value) the server accepts for each
+# Compression is only available to framed connections. Responses smaller than compression_threshold bytes are sent uncompressed,
+# and so is the reply to the negotiate command itself, compression starts with the frames after it
+# With "snapshot": "on" the read only commands in scene_snapshot.snapshot_commands are answered from the scene snapshot while it is current.
+# snapshot_max_age also accepts a snapshot blender published up to that many seconds ago, even if the scene has changed since
+negotiable_options = {
+    "encoding": ("json", "binary"),
+    "compression": ("none", "zlib"),
+    "compression_threshold": int,
+    "compression_level": (1, 2, 3, 4, 5, 6, 7, 8, 9),
+    "when_busy": ("wait", "reject"),
+    "snapshot": ("on", "off"),
+    "snapshot_max_age": float,
+}
+default_options = {
+    "encoding": "json",
+    "compression": "none",
+    "compression_threshold": 4096,
+    "compression_level": 6,
+    "when_busy": "wait",
+    "snapshot": "on",
+    "snapshot_max_age": 0.0,
+}
+
+# Most messages blender can have waiting or running at once, set by main() to the size of message_queue.
+# When the limit is reached the server stops reading from clients until blender is back down to resume_queue_depth,
+# so a client sending commands faster than blender runs them is slowed down by the socket instead of filling up memory.
+# Clients which negotiate "when_busy": "reject" are read from anyway, and get a busy reply with the queue depth instead.
+max_queue_depth = 256
+resume_queue_depth = 192
+# Ids of the requests blender hasn't answered yet
+queued_requests = set()
+# Written by blender's main thread, see health.py. Set by main()
+shared_health = None
+server_start_time = time.time()
+reading_paused = False
+
+# request id -> Request, used to route responses back to the connection which sent the request
+pending_requests = {}
+request_ids = itertools.count(1)
+# heap of (deadline, request id) for requests which can time out
+request_deadlines = []
+# request id -> shared memory block holding a large request, unlinked once blender has answered the request
+shared_requests = {}
+
+clients = set()
+
+# Responses are collected by a thread blocking on response_queue, which wakes the selector through a socket pair
+responses = deque()
+wake_reader = None
+wake_writer = None
+
+# How long the process took to start, in milliseconds, returned by get_stats. See server_entry.py
+startup_times = {}
+
+class Client:
+    """A single persistent connection to a Promethean client"""
+    def __init__(self, connection, address):
+        self.connection = connection
+        self.address = address
+        self.outgoing = deque()
+        self.closed = False
+        self.reader = protocol.MessageReader()
+        self.options = dict(default_options)
+
+        # Selector events the connection is registered for, 0 when it isn't registered
+        self.events = selectors.EVENT_READ
+        # Messages read from the socket while the queue was full, as (data, client request id, received time)
+        self.backlog = deque()
+
+        # Requests sent without a request id are answered in order, responses which finish early wait in completed
+        self.response_order = deque()
+        self.completed = {}
+        # Requests sent to blender which it hasn't answered yet. Only a client with none is answered from the scene snapshot,
+        # so it always sees the changes its own commands made
+        self.in_flight = 0
+
+        # Compression streams for each direction, they live as long as the connection once zlib is negotiated
+        self.compressor = None
+        self.decompressor = None
+
+class Request:
+    """A message sent to blender which hasn't been answered yet"""
+    def __init__(self, client, command, client_request_id=None, trace=None):
+        self.client = client
+        self.command = command
+        self.client_request_id = client_request_id
+        # Timestamps of each hop the request makes, see latency_stats.py
+        self.trace = trace or {}
+
+def start_server(start_time=None, import_time=None):
     global server_socket
+    global selector
+    global wake_reader
+    global wake_writer
 
-    server_socket = socket.socket()
-    server_socket.bind((host, port))
+    bind_start = time.time()
+    server_socket = bind_server_socket()
     server_socket.listen(5)
+    server_socket.setblocking(False)
+    startup_times['bind_ms'] = (time.time() - bind_start) * 1000.0
+
+    wake_reader, wake_writer = socket.socketpair()
+    wake_reader.setblocking(False)
+    wake_writer.setblocking(False)
+
+    selector = selectors.DefaultSelector()
+    # The listening and wake sockets are registered without data, so they can be told apart from clients
+    selector.register(server_socket, selectors.EVENT_READ, None)
+    selector.register(wake_reader, selectors.EVENT_READ, None)
+
+    threading.Thread(target=response_loop, daemon=True).start()
+
+    if start_time:
+        record_startup_times(start_time, import_time)
 
     server_loop()
 
+def create_server_socket():
+    new_socket = socket.socket()
+
+    if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+        # Windows: SO_REUSEADDR would let two servers listen on the same port, and closed connections don't hold the port anyway
+        new_socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+    else:
+        # Connections of a previous server left in TIME_WAIT would otherwise keep the port for up to a minute
+        new_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    return new_socket
+
+def vacate_port():
+    """Asks the server holding the port to close. It closes its listening socket before the connection, so the port is free once this returns"""
+    try:
+        connection = socket.create_connection((host, port), timeout=vacate_timeout)
+    except OSError:
+        return False
+
+    try:
+        connection.sendall(protocol.encode_frame(vacate_socket_command.encode()))
+        while connection.recv(4096):
+            pass
+    except OSError:
+        pass
+    finally:
+        connection.close()
+
+    return True
+
+def bind_server_socket():
+    """Binds the port straight away, only when another server holds it is that server asked to vacate it"""
+    new_socket = create_server_socket()
+    try:
+        new_socket.bind((host, port))
+        return new_socket
+    except OSError:
+        new_socket.close()
+        if not vacate_port():
+            raise
+        log.info("Port %s was in use, asked the previous server to vacate it", port)
+
+    # The previous server has closed its socket, a few retries cover the old process still tearing down
+    for attempt in range(10):
+        new_socket = create_server_socket()
+        try:
+            new_socket.bind((host, port))
+            return new_socket
+        except OSError:
+            new_socket.close()
+            if attempt == 9:
+                raise
+            time.sleep(0.01)
+
 def close_server():
     global server_socket
+    global selector
+    global wake_reader
 
+    # The listening socket goes first, a new server waiting on vacate_port() binds as soon as its connection closes
     if server_socket:
         server_socket.close()
         server_socket = None
 
-def handle_response(connection_):
-    #wait for response from blender
+    if selector:
+        # Paused clients aren't registered with the selector, so close every known client
+        for client in list(clients):
+            close_client(client)
+        selector.close()
+        selector = None
+
+    for block in shared_requests.values():
+        shared_memory_channel.close_shared(block, unlink=True)
+    shared_requests.clear()
+
+    # The writer is left open, the response thread may still be using it
+    if wake_reader:
+        wake_reader.close()
+        wake_reader = None
+
+def response_loop():
+    # Blocks until blender sends a response, so waiting for a long command doesn't use any cpu
     while True:
+        response = response_queue.get()
+        responses.append(response)
+
         try:
-            response = response_queue.get(block=False)
-            if response == "ERROR":
-                print("PrometheanAI: Received Error from DCC")
-                break
-            print("Response: " + str(response))
-            connection_.sendall(response.encode())
+            wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            # The wake socket is already full, so the selector is going to wake up anyway
             pass
+
+def get_command_name(data):
+    # Only look at the start of the message, the parameters can be very large
+    return bytes(data[:256]).partition(b'\n')[0].partition(b' ')[0].decode(errors='replace').strip()
+
+def get_command_timeout(command):
+    return command_timeouts.get(command, default_command_timeout)
+
+def get_select_timeout():
+    # Sleep until the next request times out, or forever if nothing can time out
+    while request_deadlines and request_deadlines[0][1] not in pending_requests:
+        heapq.heappop(request_deadlines)
+
+    if not request_deadlines:
+        return None
+    return max(0.0, request_deadlines[0][0] - time.monotonic())
+
+def expire_requests():
+    now = time.monotonic()
+
+    while request_deadlines and request_deadlines[0][0] <= now:
+        deadline, request_id = heapq.heappop(request_deadlines)
+
+        request = pending_requests.pop(request_id, None)
+        if request is None:
+            continue
+        request.client.in_flight -= 1
+
+        timeout = get_command_timeout(request.command)
+        log.warning("Command timed out after %s seconds: %s", timeout, request.command)
+
+        error = {'error': 'timeout', 'command': request.command, 'timeout': timeout}
+        respond(request_id, request, json.dumps(error).encode())
+        latency_stats.record_timeout(request.command)
+
+def accept_client():
+    try:
+        connection, address = server_socket.accept()
+    except BlockingIOError:
+        return
+
+    connection.setblocking(False)
+    # Frame headers and bodies are sent separately, without this the body waits for the client's delayed ack of the header (~40ms)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    client = Client(connection, address)
+    selector.register(connection, selectors.EVENT_READ, client)
+    clients.add(client)
+    log.debug("Got connection from %s", address)
+
+def close_client(client):
+    if client.closed:
+        return
+
+    client.closed = True
+    client.outgoing.clear()
+    client.backlog.clear()
+    clients.discard(client)
+
+    try:
+        selector.unregister(client.connection)
+    except (KeyError, ValueError):
+        pass
+    client.connection.close()
+
+def is_waiting(client):
+    """True if the client has to wait for blender to catch up before more of its messages are read"""
+    return client.backlog or (reading_paused and client.options["when_busy"] == "wait")
+
+def update_client_events(client):
+    events = 0
+    if not is_waiting(client):
+        events |= selectors.EVENT_READ
+    if client.outgoing:
+        events |= selectors.EVENT_WRITE
+
+    if events == client.events:
+        return
+
+    # A selector can't watch a socket for no events, so a waiting client with nothing to send is unregistered
+    if not events:
+        selector.unregister(client.connection)
+    elif not client.events:
+        selector.register(client.connection, events, client)
+    else:
+        selector.modify(client.connection, events, client)
+
+    client.events = events
+
+def update_reading_paused():
+    global reading_paused
+
+    if not reading_paused and len(queued_requests) >= max_queue_depth:
+        reading_paused = True
+        log.debug("Message queue is full (%s), pausing reads", len(queued_requests))
+    elif reading_paused and len(queued_requests) <= resume_queue_depth:
+        reading_paused = False
+        log.debug("Message queue is down to %s, resuming reads", len(queued_requests))
+
+        for client in list(clients):
+            handle_backlog(client)
+            if not client.closed:
+                update_client_events(client)
+
+def send_to_client(client, data, client_request_id=None, compress=True):
+    if client.closed:
+        return
+
+    # Framed clients get framed responses, legacy clients get the raw response like before
+    if client.reader.mode == protocol.MODE_FRAMED:
+        flags = 0
+
+        # Small interactive replies aren't worth compressing
+        if compress and client.compressor and len(data) >= client.options["compression_threshold"]:
+            data = protocol.compress_message(client.compressor, data)
+            flags |= protocol.FLAG_COMPRESSED
+
+        if client_request_id is None:
+            client.outgoing.append(protocol.frame_header(len(data), flags))
+        else:
+            flags |= protocol.FLAG_REQUEST_ID
+            client.outgoing.append(protocol.frame_header(protocol.REQUEST_ID.size + len(data), flags))
+            client.outgoing.append(protocol.REQUEST_ID.pack(client_request_id))
+
+    client.outgoing.append(memoryview(data))
+    flush_client(client)
+
+def respond(request_id, request, data):
+    """Sends the response to a request, None sends nothing but lets the requests after it be answered"""
+    client = request.client
+
+    if request.client_request_id is not None:
+        if data is not None:
+            send_to_client(client, data, request.client_request_id)
+        return
+
+    client.completed[request_id] = data
+
+    while client.response_order and client.response_order[0] in client.completed:
+        data = client.completed.pop(client.response_order.popleft())
+        if data is not None:
+            send_to_client(client, data)
+
+def flush_client(client):
+    # Send as much as the socket will take without blocking, the rest is sent when the socket becomes writable
+    while client.outgoing:
+        chunk = client.outgoing[0]
+        try:
+            sent = client.connection.send(chunk)
+        except BlockingIOError:
             break
-        except queue.Empty:
-            pass
+        except OSError as e:
+            log.error("Error sending to client: %s", e)
+            close_client(client)
+            return
+
+        if sent < len(chunk):
+            client.outgoing[0] = chunk[sent:]
+            break
+
+        client.outgoing.popleft()
+
+    update_client_events(client)
+
+def handle_responses():
+    try:
+        wake_reader.recv(4096)
+    except (BlockingIOError, OSError):
+        pass
+
+    # Route every response blender has finished back to the connection which sent the request
+    while responses:
+        request_id, response, trace = responses.popleft()
+        responded_time = time.time()
+
+        if isinstance(response, scene_snapshot.SnapshotUpdate):
+            scene_snapshot.apply(response)
+            continue
+
+        request = pending_requests.pop(request_id, None)
+        queued_requests.discard(request_id)
+
+        # Blender is done with the request, so its shared memory can be freed even if the request timed out
+        block = shared_requests.pop(request_id, None)
+        if block:
+            shared_memory_channel.close_shared(block, unlink=True)
+
+        if isinstance(response, shared_memory_channel.SharedPayload):
+            name = response.name
+            response = shared_memory_channel.read_shared(response)
+            # Let blender close its handle to the block
+            release_queue.put(name)
+
+        error = None
+        if response == "ERROR":
+            log.error("Received Error from DCC")
+            error = "Blender could not run the command, see its log"
+
+        # The request has already timed out, or was sent by the server itself
+        if request is None:
+            continue
+        request.client.in_flight -= 1
+
+        request.trace.update(trace)
+        request.trace['responded'] = responded_time
+
+        # Commands return plain values, they are turned into json here instead of on blender's main thread
+        if error is None:
+            try:
+                response = command_arguments.serialize_result(response)
+            except Exception as e:
+                log.error("Could not serialize the response to %s: %s", request.command, e)
+                error = "Could not serialize the response: " + str(e)
+
+        # Every request gets an answer, failures get an error with the request's id like any other response
+        if error is not None:
+            response = get_error_response(request.command, error)
+
+        try:
+            log.debug("Response to %s: %s", request.command, log.truncate(response))
+            if isinstance(response, str):
+                response = response.encode()
+            respond(request_id, request, response)
         except Exception as e:
-            print("Promethean AI: Error handling response: " + str(e))
+            log.error("Error handling response: %s", e)
 
-def handle_incoming_message(connection_):
-    global message_queue
+        request.trace['sent'] = time.time()
+        latency_stats.record(request.command, request.trace)
 
-    while True:
+    update_reading_paused()
+
+def negotiate(client, data, client_request_id=None):
+    try:
+        requested = parse_options(data)
+    except ValueError as e:
+        # Nothing is changed, the client keeps the options it had
+        log.warning("Invalid negotiate command: %s", e)
+        send_invalid_parameters(client, negotiate_command, str(e), client_request_id)
+        return
+
+    for option, value in requested.items():
+        accepted = negotiable_options.get(option, ())
+        if accepted is float and isinstance(value, int) and not isinstance(value, bool):
+            client.options[option] = float(value)
+        elif isinstance(accepted, type):
+            if isinstance(value, accepted):
+                client.options[option] = value
+        elif value in accepted:
+            client.options[option] = value
+
+    if client.reader.mode != protocol.MODE_FRAMED:
+        client.options["compression"] = "none"
+
+    if client.options["compression"] == "zlib":
+        if not client.compressor:
+            client.compressor = zlib.compressobj(client.options["compression_level"])
+            client.decompressor = zlib.decompressobj()
+    else:
+        client.compressor = None
+
+    # Answered straight away, clients should negotiate before sending commands.
+    # Never compressed, so the client can read which options it got before it knows whether compression is on
+    send_to_client(client, json.dumps(client.options).encode(), client_request_id, compress=False)
+
+def parse_options(data):
+    """The json object after a server command, {} if there are no parameters. Raises ValueError if it isn't an object"""
+    parameters = bytes(data).partition(b' ')[2].strip()
+    options = json.loads(parameters) if parameters else {}
+    if not isinstance(options, dict):
+        raise ValueError("Expected a json object, got " + type(options).__name__)
+    return options
+
+def send_invalid_parameters(client, command, message, client_request_id=None):
+    send_to_client(client, get_error_response(command, message, 'invalid_parameters'), client_request_id)
+
+def send_stats(client, data, client_request_id=None):
+    try:
+        options = parse_options(data)
+    except ValueError as e:
+        send_invalid_parameters(client, stats_command, str(e), client_request_id)
+        return
+
+    stats = latency_stats.get_stats()
+    stats['startup'] = startup_times
+    if options.get('reset', False):
+        latency_stats.reset()
+
+    send_to_client(client, json.dumps(stats).encode(), client_request_id)
+
+def send_server_logs(client, data, client_request_id=None):
+    try:
+        options = parse_options(data)
+        records = log.get_logs(options.get('level', 'NOTSET'), options.get('since', 0.0), options.get('limit'))
+    except ValueError as e:
+        send_invalid_parameters(client, logs_command, str(e), client_request_id)
+        return
+
+    send_to_client(client, json.dumps(records).encode(), client_request_id)
+
+def send_pong(client, data, client_request_id=None):
+    send_to_client(client, b'pong', client_request_id)
+
+def get_status():
+    status = {
+        'uptime_s': round(time.time() - server_start_time, 3),
+        'clients': len(clients),
+        # Messages sent to blender which it hasn't answered yet, whether they are still queued or running
+        'queue_depth': len(queued_requests),
+        'max_queue_depth': max_queue_depth,
+        'reading_paused': reading_paused,
+        # Responses from blender waiting to be sent, and messages read while the queue was full
+        'responses_waiting': len(responses),
+        'backlog': sum(len(client.backlog) for client in clients),
+    }
+
+    if shared_health:
+        status['main_thread'] = health.get_main_thread_status(shared_health)
+    status['snapshot'] = scene_snapshot.get_status(get_scene_version())
+
+    return status
+
+def send_status(client, data, client_request_id=None):
+    send_to_client(client, json.dumps(get_status()).encode(), client_request_id)
+
+def get_scene_version():
+    return shared_health.scene_version.value if shared_health else None
+
+def can_use_snapshot(client, command):
+    if command not in scene_snapshot.snapshot_commands or client.options["snapshot"] != "on" or client.in_flight:
+        return False
+    return scene_snapshot.is_fresh(get_scene_version(), client.options["snapshot_max_age"])
+
+def answer_from_snapshot(client, command, data, client_request_id=None, received_time=None):
+    """Answers a read only command from the scene snapshot, returns False if it has to go to blender"""
+    if not can_use_snapshot(client, command):
+        return False
+
+    # Only a single command with text parameters, batches and binary parameters are left to blender
+    try:
+        lines = [line for line in str(bytes(data), 'utf-8').split('\n') if line]
+    except UnicodeDecodeError:
+        return False
+    if len(lines) != 1 or lines[0].partition(' ')[0] != command:
+        return False
+
+    response = scene_snapshot.answer(command, lines[0].partition(' ')[2])
+    if response is None:
+        return False
+
+    send_to_client(client, response.encode(), client_request_id)
+    # Kept apart from the same commands answered by blender, so get_stats shows both
+    latency_stats.record(command + ' (snapshot)', {'received': received_time or time.time(), 'sent': time.time()})
+    return True
+
+def read_client(client):
+    try:
+        messages = client.reader.read(client.connection)
+    except BlockingIOError:
+        return
+    except (OSError, protocol.ProtocolError) as e:
+        log.error("Internal server error: %s", e)
+        close_client(client)
+        return
+
+    if messages is None:
+        close_client(client)
+        return
+
+    for flags, data in messages:
+        received_time = time.time()
+
+        try:
+            client_request_id, data = protocol.split_request_id(flags, data)
+
+            if flags & protocol.FLAG_COMPRESSED:
+                if not client.decompressor:
+                    raise protocol.ProtocolError("Compressed message sent before compression was negotiated")
+                data = protocol.decompress_message(client.decompressor, data)
+        except (protocol.ProtocolError, zlib.error) as e:
+            log.error("Internal server error: %s", e)
+            close_client(client)
+            return
+
+        client.backlog.append((data, client_request_id, received_time))
+
+    handle_backlog(client)
+
+    if not client.closed:
+        update_client_events(client)
+
+def handle_backlog(client):
+    """Handles the messages read from a client, until they run out or the client has to wait for the queue"""
+    while client.backlog and not client.closed:
+        # Commands the server answers itself don't go to blender, so they don't have to wait for the queue
+        if reading_paused and client.options["when_busy"] == "wait":
+            command = get_command_name(client.backlog[0][0])
+            if command not in server_commands and not can_use_snapshot(client, command):
+                return
+
+        data, client_request_id, received_time = client.backlog.popleft()
         try:
-            data = connection_.recv(131072)
-            if data:
-                if data.decode() == vacate_socket_command:
-                    if not ignore_vacate_socket:
-                        print("PrometheanAI: Received a Vacate Socket Command. Disconnecting")
-                        close_server()
-                        return
-                else:
-                    message_queue.put(data)
-                    handle_response(connection_)
-            else:
-                break
+            handle_incoming_message(client, data, client_request_id, received_time)
         except Exception as e:
-            print("PrometheanAI: Internal server error: " + str(e))
-            pass
+            # The client gets an error for this message and its later messages are still handled
+            log.exception("Error handling message: %s", e)
+            send_error(client, get_command_name(data), str(e), client_request_id)
+
+        # A vacate command closes the server
+        if not server_socket:
+            return
+
+def get_busy_response(command):
+    busy = {'error': 'busy', 'command': command, 'queue_depth': len(queued_requests), 'max_queue_depth': max_queue_depth}
+    return json.dumps(busy).encode()
+
+def get_error_response(command, message, error='error'):
+    return json.dumps({'error': error, 'command': command, 'message': message}).encode()
+
+def send_error(client, command, message, client_request_id=None):
+    # Goes through respond() like send_busy, so the error keeps its place among the client's responses
+    request_id = next(request_ids)
+    request = Request(client, command, client_request_id)
+
+    if client_request_id is None:
+        client.response_order.append(request_id)
+
+    respond(request_id, request, get_error_response(command, message))
+
+def send_busy(client, command, client_request_id=None):
+    # Goes through respond(), so a client without request ids still gets its responses in order
+    request_id = next(request_ids)
+    request = Request(client, command, client_request_id)
+
+    if client_request_id is None:
+        client.response_order.append(request_id)
+
+    respond(request_id, request, get_busy_response(command))
+
+def handle_incoming_message(client, data, client_request_id=None, received_time=None):
+    if data == vacate_socket_command.encode():
+        if not ignore_vacate_socket:
+            log.info("Received a Vacate Socket Command. Disconnecting")
+            close_server()
+        return
+
+    if not enable_command_queue:
+        return
+
+    command = get_command_name(data)
+
+    if command == negotiate_command:
+        negotiate(client, data, client_request_id)
+        return
+
+    if command == stats_command:
+        send_stats(client, data, client_request_id)
+        return
+
+    if command == logs_command:
+        send_server_logs(client, data, client_request_id)
+        return
+
+    if command == ping_command:
+        send_pong(client, data, client_request_id)
+        return
+
+    if command == status_command:
+        send_status(client, data, client_request_id)
+        return
+
+    if answer_from_snapshot(client, command, data, client_request_id, received_time):
+        return
+
+    if reading_paused:
+        send_busy(client, command, client_request_id)
+        return
+
+    # Parsed here, so blender's main thread doesn't parse the parameters. See command_arguments.py
+    message = command_arguments.parse_message(data)
+
+    # Large messages go through shared memory, so they aren't pickled and copied through the queue's pipe
+    block = None
+    if shared_memory_channel.should_share(data):
+        if message is not None:
+            block, data = shared_memory_channel.write_shared(pickle.dumps(message, pickle.HIGHEST_PROTOCOL), pickled=True)
+        else:
+            block, data = shared_memory_channel.write_shared(data)
+    elif message is not None:
+        data = message
+    elif isinstance(data, memoryview):
+        data = bytes(data)
+
+    # The request is only registered once the message is ready, so a message which fails above leaves nothing waiting
+    request_id = next(request_ids)
+    request = Request(client, command, client_request_id, {'received': received_time or time.time()})
+    pending_requests[request_id] = request
+    client.in_flight += 1
+    if block:
+        shared_requests[request_id] = block
+
+    if client_request_id is None:
+        client.response_order.append(request_id)
+
+    timeout = get_command_timeout(command)
+    if timeout is not None:
+        heapq.heappush(request_deadlines, (time.monotonic() + timeout, request_id))
+
+    # Blender gets the client's options along with the message, so it knows how to encode the response
+    request.trace['queued'] = time.time()
+    try:
+        message_queue.put_nowait((request_id, data, dict(client.options), {'received': request.trace['received']}))
+    except queue.Full:
+        # Only happens if the queue is smaller than max_queue_depth
+        drop_request(request_id)
+        respond(request_id, request, get_busy_response(command))
+        return
+    except Exception as e:
+        log.exception("Could not queue %s: %s", command, e)
+        drop_request(request_id)
+        respond(request_id, request, get_error_response(command, str(e)))
+        return
+
+    queued_requests.add(request_id)
+    update_reading_paused()
+
+def drop_request(request_id):
+    """Forgets a request which never reached blender"""
+    request = pending_requests.pop(request_id)
+    request.client.in_flight -= 1
+    block = shared_requests.pop(request_id, None)
+    if block:
+        shared_memory_channel.close_shared(block, unlink=True)
 
 def server_loop():
-    global server_socket
-    
-    print("PrometheanAI: Server Running")
+    if 'total_ms' in startup_times:
+        log.info("Server Running, started in %.1f ms", startup_times['total_ms'])
+    else:
+        log.info("Server Running")
 
     while server_socket:
         try:
-            connection, addr = server_socket.accept()
-            if enable_command_queue:
-                #print("PrometheanAI: Got connection from " + str(addr))
-                handle_incoming_message(connection)
-        except:
-            server_socket = None
-
-def main(queue_, response_queue_):
+            ready = selector.select(timeout=get_select_timeout())
+        except Exception as e:
+            log.exception("Internal server error: %s", e)
+            close_server()
+            return
+
+        for key, events in ready:
+            client = key.data
+
+            # Errors only affect the client they happened on, the server keeps serving everyone else
+            try:
+                if key.fileobj is wake_reader:
+                    handle_responses()
+                    continue
+
+                if client is None:
+                    accept_client()
+                    continue
+
+                if events & selectors.EVENT_READ:
+                    read_client(client)
+
+                # Reading may have closed the client, or the whole server
+                if not server_socket:
+                    break
+
+                if events & selectors.EVENT_WRITE and not client.closed:
+                    flush_client(client)
+            except Exception as e:
+                log.exception("Internal server error: %s", e)
+                if client is not None:
+                    close_client(client)
+
+        if server_socket:
+            try:
+                expire_requests()
+            except Exception as e:
+                log.exception("Internal server error: %s", e)
+
+def record_startup_times(start_time, import_time):
+    now = time.time()
+    startup_times['total_ms'] = (now - start_time) * 1000.0
+    if import_time is not None:
+        startup_times['import_ms'] = import_time * 1000.0
+    # Starting the interpreter and unpickling the process arguments, before server_entry.main ran
+    startup_times['process_ms'] = startup_times['total_ms'] - startup_times.get('import_ms', 0.0) - startup_times['bind_ms']
+
+def main(queue_, response_queue_, release_queue_, max_queue_depth_=None, health_=None, start_time=None, import_time=None):
     global message_queue
     global response_queue
+    global release_queue
+    global max_queue_depth
+    global resume_queue_depth
+    global shared_health
+    global server_start_time
 
     message_queue = queue_
     response_queue = response_queue_
+    release_queue = release_queue_
+    shared_health = health_
+    server_start_time = start_time or time.time()
+
+    if max_queue_depth_:
+        max_queue_depth = max_queue_depth_
+        resume_queue_depth = max_queue_depth * 3 // 4
 
     try:
-        start_server()
+        start_server(start_time, import_time)
     except Exception as e:
         error_message = "internal_server_error " + str(e)
-        message_queue.put(error_message.encode())
+        message_queue.put((None, error_message.encode(), {}, {}))
@@ -0,0 +1,130 @@
+# Passes large payloads between the server process and blender through shared memory, instead of pickling them through a multiprocessing.Queue
+# Note: This file is imported by the server subprocess, so it must not import bpy
+#
+# The server process owns every block: it unlinks request blocks once blender has answered the request,
+# and unlinks response blocks once it has read them, then tells blender to close its handle through the release queue.
+
+import os
+import pickle
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+# Payloads smaller than this are cheaper to send through the queue
+shared_memory_threshold = 1 << 20
+
+# Blocks blender could not close yet because something still holds a view of the buffer
+lingering_blocks = []
+
+# Response blocks created by blender, kept open until the server process has read them
+outgoing_blocks = {}
+
+class SharedPayload:
+    """Small, picklable reference to a payload stored in a shared memory block"""
+    def __init__(self, name, size, pickled=False):
+        self.name = name
+        self.size = size
+        # The block holds a pickled object instead of the message bytes, eg. a message the server has parsed
+        self.pickled = pickled
+
+def should_share(data):
+    return isinstance(data, (bytes, bytearray, memoryview)) and len(data) >= shared_memory_threshold
+
+def untrack(block):
+    # Only the server process unlinks blocks. Stop this process's resource tracker from unlinking them when it exits
+    if os.name != 'nt':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, 'shared_memory')
+
+def write_shared(data, track=True, pickled=False):
+    """Copies data into a new shared memory block, returns (block, SharedPayload)"""
+    size = len(data)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    block.buf[:size] = data
+
+    if not track:
+        untrack(block)
+
+    return block, SharedPayload(block.name, size, pickled)
+
+def open_shared(payload, track=True):
+    """Attaches to the block of a SharedPayload, returns (block, memoryview of the payload)"""
+    block = shared_memory.SharedMemory(name=payload.name)
+
+    if not track:
+        untrack(block)
+
+    return block, block.buf[:payload.size]
+
+def close_shared(block, view=None, unlink=False):
+    if view is not None:
+        try:
+            view.release()
+        except BufferError:
+            pass
+
+    try:
+        block.close()
+    except BufferError:
+        # A numpy array or memoryview made from the payload is still alive, try again later
+        lingering_blocks.append(block)
+
+    if unlink:
+        block.unlink()
+
+def close_lingering_blocks():
+    blocks = list(lingering_blocks)
+    lingering_blocks.clear()
+
+    for block in blocks:
+        close_shared(block)
+
+def read_shared(payload):
+    """Copies a SharedPayload out of shared memory and unlinks the block, used by the server process"""
+    block, view = open_shared(payload)
+    data = bytes(view)
+    close_shared(block, view, unlink=True)
+    return data
+
+@contextmanager
+def open_message(data):
+    """Yields the message contents as a buffer, attaching to shared memory if the message was shared. Used by blender"""
+    if not isinstance(data, SharedPayload):
+        yield data
+        return
+
+    block, view = open_shared(data, track=False)
+    try:
+        yield pickle.loads(view) if data.pickled else view
+    finally:
+        close_shared(block, view)
+
+def share_response(response):
+    """Moves a large response into shared memory, used by blender. Returns a SharedPayload, or the response unchanged"""
+    if isinstance(response, str):
+        if len(response) < shared_memory_threshold:
+            return response
+        response = response.encode()
+
+    if not should_share(response):
+        return response
+
+    block, payload = write_shared(response, track=False)
+    outgoing_blocks[payload.name] = block
+    return payload
+
+def release_outgoing(name):
+    block = outgoing_blocks.pop(name, None)
+    if block:
+        close_shared(block)
+
+def close_outgoing():
+    # The server process is gone, so nothing else is going to unlink these
+    for block in outgoing_blocks.values():
+        close_shared(block, unlink=True)
+    outgoing_blocks.clear()
+
+def as_array(buffer, dtype, offset=0, count=-1):
+    """Zero copy numpy view of a payload buffer"""
+    import numpy
+
+    return numpy.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
@@ -1,5 +1,3 @@
-from cgitb import text
-from http import server
 import bpy
 import textwrap
 
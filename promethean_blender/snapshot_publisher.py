@@ -0,0 +1,290 @@
+# Publishes the scene snapshot the server process answers read only queries from, see scene_snapshot.py
+#
+# depsgraph_update_post tells which objects changed, only those are read again. Selection and visibility are refreshed for every object
+# when anything other than an object changed (selecting tags the scene). When objects were added, removed or renamed only the new
+# objects are read, and the names of the others are sent as removed. The whole snapshot is only read again when a file was loaded,
+# or on undo and redo.
+# Transform data (see get_transform_data) is much slower to read than the rest of an entry, so it is read after the entry, a few
+# objects per update within transform_time_budget. Until then the entry has no transform data and get_transform_data goes to blender.
+# Updates are published at the start of a pump, after blender has evaluated the depsgraph for the commands run on the last pump.
+
+import bpy
+import os
+import time
+
+from bpy.app.handlers import persistent
+
+from . import scene_snapshot, health, log
+from .utils import convert_out
+
+# Shortest time between two updates, changes made meanwhile go out together
+publish_interval = 0.05
+# Longest time an update spends reading transform data, the rest is read by the next updates
+transform_time_budget = 0.005
+
+# Object name -> entry, as last published. See scene_snapshot.py for what an entry holds
+entries = {}
+# Object name -> position in bpy.data.objects, the selection is published in that order
+order = {}
+# Objects whose entries are still missing their transform data
+pending_transforms = set()
+# Objects the depsgraph reported as changed since the last update
+changed_names = set()
+check_all = False
+rebuild = True
+# Frames were changed, animated objects move without a depsgraph update
+frame_changed = False
+# The scene version the next update is published at. The depsgraph handler and commands (see command_manager.do_command)
+# advance it with mark_changed, so a command which changes nothing the depsgraph reports still gets the snapshot published again
+evaluated_version = 0
+published_version = None
+last_publish = 0.0
+
+def reset():
+    """Starts over with a full snapshot, called when the server starts"""
+    global rebuild
+    global published_version
+    global evaluated_version
+
+    rebuild = True
+    published_version = None
+    evaluated_version = health.get_scene_version() or 0
+    changed_names.clear()
+    entries.clear()
+    order.clear()
+    pending_transforms.clear()
+
+def get_transform_list(object):
+    # Imported here, so enabling the add-on doesn't import the object commands
+    from .commands import object_commands
+
+    try:
+        return object_commands.get_transform_list(object)
+    except Exception:
+        # Answered by blender instead, which reports the error the same way it always has
+        return None
+
+def read_entry(object, name, changed):
+    """Reads an object's entry, its transform data is read later by read_transforms"""
+    entries[name] = [object.type == 'MESH', object.select_get(), object.visible_get(), list(convert_out(object.location)), None]
+    pending_transforms.add(name)
+    changed.add(name)
+
+def read_transforms(changed):
+    """Reads the transform data of pending objects until transform_time_budget runs out"""
+    objects = bpy.data.objects
+    end = time.perf_counter() + transform_time_budget
+
+    while pending_transforms and time.perf_counter() < end:
+        name = pending_transforms.pop()
+        object = objects.get(name)
+        entry = entries.get(name)
+        if object is not None and entry is not None:
+            # A new list, the one already published may still be waiting to be pickled by the queue
+            entries[name] = entry[:scene_snapshot.ENTRY_TRANSFORM] + [get_transform_list(object)]
+            changed.add(name)
+
+def sync_objects(changed, removed):
+    """Brings the entries in line with bpy.data.objects after objects were added, removed, renamed or reordered.
+    Only the new objects are read, the names which are gone are added to removed"""
+    objects = bpy.data.objects
+    order.clear()
+    order.update((name, index) for index, name in enumerate(objects.keys()))
+
+    for name in [name for name in entries if name not in order]:
+        del entries[name]
+        pending_transforms.discard(name)
+        changed.discard(name)
+        removed.append(name)
+
+    for name in order:
+        if name not in entries:
+            read_entry(objects[name], name, changed)
+
+def needs_sync():
+    """True if objects were added, removed or renamed since the entries were last brought in line"""
+    objects = bpy.data.objects
+    if len(objects) != len(entries):
+        return True
+    # A renamed object is reported under its new name
+    return any(name not in entries and name in objects for name in changed_names)
+
+def check_entries(changed):
+    """Refreshes selection and visibility of every object. Returns (False, ...) if objects were added, removed, renamed or reordered,
+    otherwise (True, whether the selection changed)"""
+    selection_changed = False
+    for index, object in enumerate(bpy.data.objects):
+        name = object.name
+        entry = entries.get(name)
+        if entry is None or order.get(name) != index:
+            return False, True
+
+        selected = object.select_get()
+        visible = object.visible_get()
+        if entry[scene_snapshot.ENTRY_SELECTED] != selected or entry[scene_snapshot.ENTRY_VISIBLE] != visible:
+            selection_changed |= entry[scene_snapshot.ENTRY_SELECTED] != selected
+            entry[scene_snapshot.ENTRY_SELECTED] = selected
+            entry[scene_snapshot.ENTRY_VISIBLE] = visible
+            changed.add(name)
+
+    return True, selection_changed
+
+def update_changed_entries(changed):
+    """Reads the objects the depsgraph reported again. Returns whether the selection changed"""
+    objects = bpy.data.objects
+    selection_changed = False
+    for name in changed_names:
+        object = objects.get(name)
+        entry = entries.get(name)
+        if object is None or entry is None:
+            continue
+
+        read_entry(object, name, changed)
+        selection_changed |= entries[name][scene_snapshot.ENTRY_SELECTED] != entry[scene_snapshot.ENTRY_SELECTED]
+
+    return selection_changed
+
+def get_moving_names():
+    """Objects which can move when the frame changes"""
+    return [object.name for object in bpy.data.objects if object.animation_data or object.parent or object.constraints]
+
+def get_selection():
+    selection = [name for name, entry in entries.items() if entry[scene_snapshot.ENTRY_IS_MESH] and entry[scene_snapshot.ENTRY_SELECTED]]
+    return sorted(selection, key=order.__getitem__)
+
+def get_update():
+    """Returns the changes since the last update as a scene_snapshot.SnapshotUpdate, None if there is nothing to publish yet"""
+    global rebuild
+    global check_all
+    global frame_changed
+    global published_version
+    global last_publish
+
+    if not health.shared:
+        return None
+    if not (rebuild or check_all or changed_names or pending_transforms) and published_version == evaluated_version:
+        return None
+    if time.time() - last_publish < publish_interval:
+        return None
+
+    start = time.perf_counter()
+    changed = set()
+    removed = []
+    selection_changed = True
+
+    if rebuild:
+        entries.clear()
+        pending_transforms.clear()
+        sync_objects(changed, removed)
+        removed = []
+        # Everything but the transform data was just read, so the snapshot is up to date with the scene as it is now
+        version = health.get_scene_version()
+    else:
+        if frame_changed:
+            changed_names.update(get_moving_names())
+
+        synced = needs_sync()
+        if synced:
+            sync_objects(changed, removed)
+
+        selection_changed = synced | update_changed_entries(changed)
+        if check_all:
+            found, checked_selection_changed = check_entries(changed)
+            if not found:
+                # Reordered, so the objects are in line after syncing. The check stopped part way, so it runs again
+                sync_objects(changed, removed)
+                checked_selection_changed = True
+                check_entries(changed)
+            selection_changed |= checked_selection_changed
+
+        version = evaluated_version
+
+    read_transforms(changed)
+
+    update = scene_snapshot.SnapshotUpdate(
+        version,
+        rebuild,
+        dict(entries) if rebuild else {name: entries[name] for name in changed},
+        get_selection() if selection_changed else None,
+        os.path.basename(bpy.data.filepath),
+        removed,
+    )
+
+    if rebuild:
+        log.debug("Published scene snapshot of %s objects in %.1f ms, %s transforms left to read", len(entries),
+                  (time.perf_counter() - start) * 1000.0, len(pending_transforms))
+
+    rebuild = False
+    check_all = False
+    frame_changed = False
+    changed_names.clear()
+    published_version = version
+    last_publish = time.time()
+    return update
+
+def mark_changed(rebuild_all=False, check=False, names=(), frame=False):
+    global evaluated_version
+    global rebuild
+    global check_all
+    global frame_changed
+
+    version = health.bump_scene_version()
+    if version is None:
+        return
+
+    evaluated_version = version
+    rebuild |= rebuild_all
+    check_all |= check
+    frame_changed |= frame
+    changed_names.update(names)
+
+@persistent
+def depsgraph_update_handler(scene, depsgraph):
+    if not health.shared:
+        return
+
+    names = []
+    check = False
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object):
+            names.append(update.id.name)
+        else:
+            # Selecting, hiding, linking and unlinking objects tag the scene or a collection, not the objects
+            check = True
+
+    mark_changed(check=check, names=names)
+
+@persistent
+def rebuild_handler(*args):
+    # Loading a file, undo and redo replace the whole scene
+    mark_changed(rebuild_all=True)
+
+@persistent
+def frame_change_handler(*args):
+    # Called on every frame of playback, the moving objects are only looked for when the next update is published
+    mark_changed(frame=True)
+
+@persistent
+def save_handler(*args):
+    # Only the scene name changes, it is sent with every update
+    mark_changed()
+
+# bpy.app.handlers list name -> handler
+handlers = {
+    "depsgraph_update_post": depsgraph_update_handler,
+    "load_post": rebuild_handler,
+    "undo_post": rebuild_handler,
+    "redo_post": rebuild_handler,
+    "frame_change_post": frame_change_handler,
+    "save_post": save_handler,
+}
+
+def register():
+    for handler_list, handler in handlers.items():
+        getattr(bpy.app.handlers, handler_list).append(handler)
+
+def unregister():
+    for handler_list, handler in handlers.items():
+        handler_list = getattr(bpy.app.handlers, handler_list)
+        if handler in handler_list:
+            handler_list.remove(handler)
@@ -0,0 +1,406 @@
+# Grid over the world space bounding boxes of the mesh objects, for the neighbourhood queries in object_commands:
+# get_objects_in_box, get_overlapping_objects and get_nearest_objects, and for the ray casts in raycast.py.
+#
+# Every object is put in the grid cells its bounds overlap, so a query only tests the objects in the cells it touches.
+# The bounds an object is filed under include its origin, so nearest queries by position also find objects whose mesh is
+# away from their origin. Objects spanning more than max_object_cells cells, like a floor, are tested by every query instead.
+#
+# The index is built on the first query and brought up to date when it is queried:
+# objects the depsgraph reported as changed are read again, and after a command which can change the scene, or when objects
+# were added, removed or renamed, the bounds of every mesh are read with foreach_get and only the objects that moved are refiled.
+# Loading a file, undo and redo start over.
+# Coordinates are blender units here, the commands convert from promethean units.
+
+import bpy
+import math
+import time
+
+from bpy.app.handlers import persistent
+
+from . import log
+from .utils import get_all_mesh_objects, get_bounding_box, get_world_bounding_boxes, read_objects_attribute
+
+# Objects covering more cells than this aren't put in the grid
+max_object_cells = 64
+# Below this many objects, changed objects are read one by one instead of with foreach_get
+few_objects = 32
+# Most ray and bounds pairs tested together by find_along_rays, more take more memory
+max_ray_tests = 1 << 20
+
+built = False
+cell_size = 1.0
+# Row -> object name, None for a free row. bounds, index_bounds, positions and live are numpy arrays with a row per object
+row_names = []
+rows = {}
+free_rows = []
+bounds = None
+index_bounds = None
+positions = None
+live = None
+# Row -> (first cell, last cell) the object is filed under, None for the objects in large_rows
+cell_ranges = []
+# (x, y, z) -> rows of the objects overlapping the cell
+cells = {}
+large_rows = set()
+
+changed_names = set()
+check_all = False
+
+def reset():
+    global built
+    global check_all
+    global bounds
+    global index_bounds
+    global positions
+    global live
+
+    built = False
+    check_all = False
+    bounds = index_bounds = positions = live = None
+    changed_names.clear()
+    row_names.clear()
+    rows.clear()
+    free_rows.clear()
+    cell_ranges.clear()
+    cells.clear()
+    large_rows.clear()
+
+def mark_changed(check=False, object_names=()):
+    global check_all
+
+    # Nothing to keep up to date until the first query
+    if not built:
+        return
+
+    check_all |= check
+    changed_names.update(object_names)
+
+def read_bounds(objects):
+    """World space bounds of the objects as a (n, 6) array of min and max corners, and their world positions as a (n, 3) array"""
+    import numpy
+
+    if len(objects) < few_objects:
+        corners = numpy.array([[list(corner) for corner in get_bounding_box(object)] for object in objects], dtype=numpy.float64).reshape(-1, 8, 3)
+        object_positions = numpy.array([list(object.matrix_world.translation) for object in objects], dtype=numpy.float64).reshape(-1, 3)
+    else:
+        matrices = read_objects_attribute(objects, 'matrix_world', 16)
+        corners = get_world_bounding_boxes(objects, matrices)
+        # The translation of a matrix read with foreach_get, which gives it column by column
+        object_positions = matrices[:, 12:15]
+
+    return numpy.concatenate((corners.min(axis=1), corners.max(axis=1)), axis=1), object_positions
+
+def get_cell_range(low, high):
+    return (tuple(int(math.floor(value / cell_size)) for value in low), tuple(int(math.floor(value / cell_size)) for value in high))
+
+def get_cell_count(cell_range):
+    first, last = cell_range
+    return (last[0] - first[0] + 1) * (last[1] - first[1] + 1) * (last[2] - first[2] + 1)
+
+def iterate_cells(cell_range):
+    first, last = cell_range
+    for x in range(first[0], last[0] + 1):
+        for y in range(first[1], last[1] + 1):
+            for z in range(first[2], last[2] + 1):
+                yield (x, y, z)
+
+def file_row(row):
+    """Puts the row in the cells its index bounds overlap"""
+    cell_range = get_cell_range(index_bounds[row, :3], index_bounds[row, 3:])
+    if get_cell_count(cell_range) > max_object_cells:
+        large_rows.add(row)
+        cell_ranges[row] = None
+        return
+
+    for cell in iterate_cells(cell_range):
+        cells.setdefault(cell, set()).add(row)
+    cell_ranges[row] = cell_range
+
+def unfile_row(row):
+    cell_range = cell_ranges[row]
+    if cell_range is None:
+        large_rows.discard(row)
+        return
+
+    for cell in iterate_cells(cell_range):
+        cell_rows = cells[cell]
+        cell_rows.discard(row)
+        if not cell_rows:
+            del cells[cell]
+    cell_ranges[row] = None
+
+def ensure_capacity(count):
+    global bounds
+    global index_bounds
+    global positions
+    global live
+    import numpy
+
+    if bounds is not None and len(bounds) >= count:
+        return
+
+    capacity = max(count, 2 * (len(bounds) if bounds is not None else 0), 64)
+    new_bounds = numpy.zeros((capacity, 6))
+    new_index_bounds = numpy.zeros((capacity, 6))
+    new_positions = numpy.zeros((capacity, 3))
+    new_live = numpy.zeros(capacity, dtype=bool)
+
+    if bounds is not None:
+        new_bounds[:len(bounds)] = bounds
+        new_index_bounds[:len(bounds)] = index_bounds
+        new_positions[:len(bounds)] = positions
+        new_live[:len(bounds)] = live
+
+    bounds, index_bounds, positions, live = new_bounds, new_index_bounds, new_positions, new_live
+
+def set_object(name, object_bounds, position):
+    """Adds the object, or refiles it if its index bounds now overlap other cells"""
+    import numpy
+
+    row = rows.get(name)
+    is_new = row is None
+    if is_new:
+        if free_rows:
+            row = free_rows.pop()
+            row_names[row] = name
+        else:
+            row = len(row_names)
+            row_names.append(name)
+            cell_ranges.append(None)
+            ensure_capacity(len(row_names))
+        rows[name] = row
+        live[row] = True
+
+    bounds[row] = object_bounds
+    positions[row] = position
+    index_bounds[row, :3] = numpy.minimum(object_bounds[:3], position)
+    index_bounds[row, 3:] = numpy.maximum(object_bounds[3:], position)
+
+    if is_new:
+        file_row(row)
+    elif cell_ranges[row] != get_cell_range(index_bounds[row, :3], index_bounds[row, 3:]):
+        unfile_row(row)
+        file_row(row)
+
+def remove_object(name):
+    row = rows.pop(name)
+    unfile_row(row)
+    row_names[row] = None
+    live[row] = False
+    free_rows.append(row)
+
+def build():
+    global built
+    global cell_size
+    import numpy
+
+    start = time.perf_counter()
+    reset()
+
+    objects = get_all_mesh_objects()
+    if objects:
+        object_bounds, object_positions = read_bounds(objects)
+        # Cells about twice the size of a typical object, so most objects sit in a few cells and cells hold a few objects
+        sizes = (object_bounds[:, 3:] - object_bounds[:, :3]).max(axis=1)
+        cell_size = max(float(numpy.median(sizes)) * 2.0, 1e-3)
+
+        for index, object in enumerate(objects):
+            set_object(object.name, object_bounds[index], object_positions[index])
+
+    built = True
+    log.debug("Built spatial index of %s objects in %.1f ms, %s cells of %.3f", len(rows), (time.perf_counter() - start) * 1000.0, len(cells), cell_size)
+
+def update_all(objects):
+    """Refiles the objects which moved, and adds and removes objects so the index holds exactly these"""
+    import numpy
+
+    object_names = [object.name for object in objects]
+    if objects:
+        object_bounds, object_positions = read_bounds(objects)
+        object_rows = numpy.array([rows.get(name, -1) for name in object_names], dtype=numpy.int64)
+
+        changed = object_rows < 0
+        known = numpy.flatnonzero(~changed)
+        changed[known] = ((bounds[object_rows[known]] != object_bounds[known]).any(axis=1)
+                          | (positions[object_rows[known]] != object_positions[known]).any(axis=1))
+
+        for index in numpy.flatnonzero(changed):
+            set_object(object_names[index], object_bounds[index], object_positions[index])
+
+    for name in rows.keys() - set(object_names):
+        remove_object(name)
+
+def update_changed():
+    """Reads the objects the depsgraph reported again. Returns False if one of them is a new mesh, or was renamed"""
+    objects = []
+    for name in changed_names:
+        object = bpy.data.objects.get(name)
+        if object is None:
+            if name in rows:
+                return False
+        elif object.type == 'MESH':
+            if name not in rows:
+                return False
+            objects.append(object)
+
+    if objects:
+        object_bounds, object_positions = read_bounds(objects)
+        for index, object in enumerate(objects):
+            set_object(object.name, object_bounds[index], object_positions[index])
+    return True
+
+def refresh():
+    global check_all
+
+    if not built:
+        build()
+        return
+
+    objects = get_all_mesh_objects()
+    if check_all or len(objects) != len(rows) or not update_changed():
+        update_all(objects)
+
+    check_all = False
+    changed_names.clear()
+
+def get_candidates(low, high):
+    """Rows of the objects filed in the cells the box touches, a superset of the objects whose index bounds overlap it"""
+    import numpy
+
+    cell_range = get_cell_range(low, high)
+    candidates = set(large_rows)
+
+    if get_cell_count(cell_range) > len(cells):
+        # Looking at every filled cell is quicker than walking a box this large
+        first, last = cell_range
+        for cell, cell_rows in cells.items():
+            if first[0] <= cell[0] <= last[0] and first[1] <= cell[1] <= last[1] and first[2] <= cell[2] <= last[2]:
+                candidates.update(cell_rows)
+    else:
+        for cell in iterate_cells(cell_range):
+            cell_rows = cells.get(cell)
+            if cell_rows:
+                candidates.update(cell_rows)
+
+    return numpy.fromiter(candidates, dtype=numpy.int64, count=len(candidates))
+
+def overlapping_rows(low, high):
+    candidates = get_candidates(low, high)
+    candidate_bounds = bounds[candidates]
+    overlapping = (candidate_bounds[:, :3] <= high).all(axis=1) & (candidate_bounds[:, 3:] >= low).all(axis=1)
+    return candidates[overlapping]
+
+def find_in_box(low, high):
+    """Names of the objects whose bounds overlap the box, touching counts"""
+    import numpy
+
+    refresh()
+    low = numpy.asarray(low, dtype=numpy.float64)
+    high = numpy.asarray(high, dtype=numpy.float64)
+    return sorted(row_names[row] for row in overlapping_rows(low, high))
+
+def find_overlapping(name):
+    """Names of the objects whose bounds overlap the object's bounds, None if the object isn't an indexed mesh"""
+    refresh()
+    row = rows.get(name)
+    if row is None:
+        return None
+    return sorted(row_names[other] for other in overlapping_rows(bounds[row, :3], bounds[row, 3:]) if other != row)
+
+def find_nearest(location, count, exclude=None):
+    """Names of the count objects whose position is nearest to location, nearest first"""
+    import numpy
+
+    refresh()
+    location = numpy.asarray(location, dtype=numpy.float64)
+    exclude_row = rows.get(exclude, -1)
+    total = len(rows) - (exclude_row >= 0)
+    count = min(count, total)
+    if count <= 0:
+        return []
+
+    radius = cell_size
+    while True:
+        candidates = get_candidates(location - radius, location + radius)
+        candidates = candidates[candidates != exclude_row]
+        distances = numpy.linalg.norm(positions[candidates] - location, axis=1)
+
+        # Every object within the radius of location is among the candidates, so once there are count of them they are the nearest
+        within = distances <= radius
+        if within.sum() >= count or len(candidates) >= total:
+            break
+        radius *= 2.0
+
+    if len(candidates) < total:
+        candidates, distances = candidates[within], distances[within]
+    nearest = sorted(zip(distances.tolist(), (row_names[row] for row in candidates)))[:count]
+    return [name for distance, name in nearest]
+
+def find_along_rays(origins, directions, distances):
+    """For each ray, the names of the objects whose bounds it passes through within its distance, and the distances it
+    enters them at, nearest first. origins and directions are (n, 3) arrays with normalized directions"""
+    import numpy
+
+    refresh()
+    live_rows = numpy.flatnonzero(live[:len(row_names)]) if row_names else numpy.zeros(0, dtype=numpy.int64)
+    low = bounds[live_rows, :3]
+    high = bounds[live_rows, 3:]
+
+    results = []
+    chunk = max(1, max_ray_tests // max(1, len(live_rows)))
+    for start in range(0, len(origins), chunk):
+        chunk_origins = origins[start:start + chunk, None, :]
+        chunk_directions = directions[start:start + chunk, None, :]
+
+        # Slab test of every ray against every box. Rays parallel to a slab are inside it everywhere, or nowhere
+        parallel = chunk_directions == 0.0
+        inside = (chunk_origins >= low) & (chunk_origins <= high)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            inverse = 1.0 / numpy.where(parallel, 1.0, chunk_directions)
+            t0 = (low - chunk_origins) * inverse
+            t1 = (high - chunk_origins) * inverse
+        t_near = numpy.where(parallel, numpy.where(inside, -numpy.inf, numpy.inf), numpy.minimum(t0, t1))
+        t_far = numpy.where(parallel, numpy.where(inside, numpy.inf, -numpy.inf), numpy.maximum(t0, t1))
+
+        enter = numpy.maximum(t_near.max(axis=2), 0.0)
+        leave = t_far.min(axis=2)
+        hits = (enter <= leave) & (enter <= distances[start:start + chunk, None])
+
+        for ray_hits, ray_enter in zip(hits, enter):
+            hit_rows = numpy.flatnonzero(ray_hits)
+            order = numpy.argsort(ray_enter[hit_rows], kind='stable')
+            results.append(([row_names[row] for row in live_rows[hit_rows[order]]], ray_enter[hit_rows[order]]))
+
+    return results
+
+@persistent
+def depsgraph_update_handler(scene, depsgraph):
+    if not built:
+        return
+    mark_changed(object_names=[update.id.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Object)])
+
+@persistent
+def reset_handler(*args):
+    # Loading a file, undo and redo replace every object, the index is built again on the next query
+    reset()
+
+# bpy.app.handlers list name -> handler
+handlers = {
+    "depsgraph_update_post": depsgraph_update_handler,
+    "load_post": reset_handler,
+    "load_factory_startup_post": reset_handler,
+    "undo_post": reset_handler,
+    "redo_post": reset_handler,
+}
+
+def register():
+    reset()
+    for handler_list, handler in handlers.items():
+        getattr(bpy.app.handlers, handler_list).append(handler)
+
+def unregister():
+    reset()
+    for handler_list, handler in handlers.items():
+        handler_list = getattr(bpy.app.handlers, handler_list)
+        if handler in handler_list:
+            handler_list.remove(handler)
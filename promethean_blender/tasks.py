@@ -1,16 +1,17 @@
-from sys import stdout
 import bpy
 import os
 import subprocess
 
-from .background_tasks import create_blend_from_asset_task, create_asset_from_blend_task
+# The task scripts run in a new blender process, importing them here would run their setup in this one
+background_tasks_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'background_tasks')
+
+def get_task_script(name):
+    return os.path.join(background_tasks_folder, name + '.py')
 
 def get_blender_executable():
     return bpy.app.binary_path
 
-def run_process(args, blocking=True):
-    process = subprocess.Popen(args)
-
+def run_process(args, blocking=True, stdout=None):
     #Hide the cmd window on windows
     startupinfo = None
     if os.name == 'nt':
@@ -23,10 +24,10 @@ def run_process(args, blocking=True):
         #return stdout
         return data[0]
     else:
-        process=subprocess.Popen(args, startupinfo=startupinfo)
+        return subprocess.Popen(args, startupinfo=startupinfo, stdout=stdout, encoding='utf-8')
 
 def create_blend_from_asset(asset_path, blend_file, blocking=True):
-    py_file = os.path.abspath(create_blend_from_asset_task.__file__)
+    py_file = get_task_script('create_blend_from_asset_task')
 
     return run_process(
         [get_blender_executable(), 
@@ -42,8 +43,8 @@ def create_blend_from_asset(asset_path, blend_file, blocking=True):
         blocking=blocking
         )
 
-def create_asset_from_blend(asset_path, blend_file, objects, blocking=True):
-    py_file = os.path.abspath(create_asset_from_blend_task.__file__)
+def create_asset_from_blend(asset_path, blend_file, objects, blocking=True, stdout=None):
+    py_file = get_task_script('create_asset_from_blend_task')
     mesh_data_names = set()
 
     for object in objects:
@@ -65,5 +66,6 @@ def create_asset_from_blend(asset_path, blend_file, objects, blocking=True):
         "--asset_names",
         names_list
         ],
-        blocking=blocking
+        blocking=blocking,
+        stdout=stdout
         )
\ No newline at end of file
@@ -0,0 +1,274 @@
+# Load tests the server, the message pump and the commands in a plain python interpreter, using the bpy stand-in in tools/standin.
+# The server subprocess is started like the add-on starts it, and this process plays blender: it pumps the queue on its main thread
+# while client threads send commands over sockets.
+#
+# Example usage:
+# python load_test.py --objects 5000 --clients 8 --requests 500
+# python load_test.py --objects 20000 --commands get_selection,get_transform_data --profile "D:\profiles\pump.prof" --json "D:\profiles\load.json"
+#
+# Timings only say how the add-on's own python code scales. Blender's data access is much faster than the stand-in's,
+# so commands that spend their time in bpy look slower here than they are, see tools/standin/readme.txt
+
+import sys
+import json
+import random
+import socket
+import threading
+import time
+import multiprocessing
+from os.path import dirname, abspath, join
+
+#Put the stand-in modules and the directory holding the add-on package on the path
+tools_folder = dirname(abspath(__file__))
+addon_folder = dirname(tools_folder)
+sys.path.insert(0, join(tools_folder, 'standin'))
+sys.path.insert(0, dirname(addon_folder))
+
+import importlib
+
+addon_name = addon_folder.replace('\\', '/').rstrip('/').split('/')[-1]
+protocol = importlib.import_module(addon_name + '.protocol')
+server_process = importlib.import_module(addon_name + '.server_process')
+server_entry = importlib.import_module(addon_name + '.server_entry')
+health = importlib.import_module(addon_name + '.health')
+
+default_commands = ['get_selection', 'get_location_data', 'get_transform_data', 'translate', 'get_visible_static_mesh_actors', 'raytrace']
+
+def run_server(port, start_time, message_queue, response_queue, release_queue, max_queued_messages, shared_health):
+    # Module globals aren't carried over when the process is spawned instead of forked
+    server_process.port = port
+    server_entry.main(start_time, message_queue, response_queue, release_queue, max_queued_messages, shared_health)
+
+def get_message(command, names, batch, rng):
+    """Message for one command, acting on a batch of the object names picked with rng, a client's random.Random"""
+    picked = rng.sample(names, min(batch, len(names)))
+
+    if command in ('get_location_data', 'get_transform_data'):
+        return command + ' ' + ','.join(picked)
+    if command == 'translate':
+        location = [rng.uniform(-1000.0, 1000.0), rng.uniform(-1000.0, 1000.0), 0.0]
+        return command + ' ' + json.dumps([location, picked])
+    if command == 'raytrace':
+        return command + ' ' + json.dumps([[0.0, 0.0, -1.0], 100000.0, picked])
+    return command
+
+class Client(threading.Thread):
+    """Sends requests one after the other and times each round trip"""
+    def __init__(self, port, commands, names, requests, batch, seed, options=None):
+        super().__init__(daemon=True)
+        self.port = port
+        self.options = options
+        self.commands = commands
+        self.names = names
+        self.requests = requests
+        self.batch = batch
+        self.random = random.Random(seed)
+        self.latencies = {}
+        self.errors = 0
+        self.busy = 0
+
+    def run(self):
+        connection = socket.create_connection(('127.0.0.1', self.port))
+        try:
+            if self.options:
+                connection.sendall(protocol.encode_frame((server_process.negotiate_command + ' ' + json.dumps(self.options)).encode()))
+                protocol.read_frame(connection)
+
+            for i in range(self.requests):
+                command = self.random.choice(self.commands)
+                message = get_message(command, self.names, self.batch, self.random)
+
+                start = time.perf_counter()
+                connection.sendall(protocol.encode_frame(message.encode()))
+                frame = protocol.read_frame(connection)
+                latency_ms = (time.perf_counter() - start) * 1000.0
+
+                if frame is None:
+                    self.errors += 1
+                    break
+
+                body = bytes(frame[1])
+                if body.startswith(b'{"error": "busy"'):
+                    self.busy += 1
+                elif body == b'ERROR' or body.startswith(b'{"error": "error"'):
+                    self.errors += 1
+
+                self.latencies.setdefault(command, []).append(latency_ms)
+        finally:
+            connection.close()
+
+def wait_for_server(port, timeout=10.0):
+    """Returns the server's startup times from get_stats once it takes connections, or None if it never does"""
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        try:
+            connection = socket.create_connection(('127.0.0.1', port), timeout=0.5)
+        except OSError:
+            time.sleep(0.002)
+            continue
+
+        connection.sendall(protocol.encode_frame(server_process.stats_command.encode()))
+        frame = protocol.read_frame(connection)
+        connection.close()
+        return json.loads(bytes(frame[1]))['startup']
+    return None
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+def pump_until_done(server_manager, clients, budget, interval):
+    """Plays blender's event loop: pumps the queue and evaluates the depsgraph, sleeping for the timer interval whenever the queue was empty"""
+    import standin_scene
+
+    ticks = 0
+    handled = 0
+    while any(client.is_alive() for client in clients):
+        count = server_manager.pump_messages(budget)
+        standin_scene.evaluate_depsgraph()
+        handled += count
+        ticks += 1
+        if not count:
+            time.sleep(interval)
+    return ticks, handled
+
+def run_load_test(args):
+    import standin_scene
+    server_manager = importlib.import_module(addon_name + '.operators.server_manager')
+    snapshot_publisher = importlib.import_module(addon_name + '.snapshot_publisher')
+    snapshot_publisher.register()
+    object_index = importlib.import_module(addon_name + '.object_index')
+    object_index.register()
+    spatial_index = importlib.import_module(addon_name + '.spatial_index')
+    spatial_index.register()
+    raycast = importlib.import_module(addon_name + '.raycast')
+    raycast.register()
+
+    build_start = time.perf_counter()
+    objects = standin_scene.build_scene(args.objects, seed=args.seed)
+    build_time = time.perf_counter() - build_start
+    names = [object.name for object in objects]
+
+    commands = args.commands.split(',') if args.commands else default_commands
+
+    server_manager.message_queue = multiprocessing.Queue(server_manager.max_queued_messages)
+    server_manager.response_queue = multiprocessing.Queue(server_manager.max_queued_responses)
+    server_manager.release_queue = multiprocessing.Queue()
+    health.shared = health.SharedHealth()
+    snapshot_publisher.reset()
+    start_time = time.time()
+    server_manager.process = multiprocessing.Process(
+        target=run_server,
+        args=(args.port, start_time, server_manager.message_queue, server_manager.response_queue, server_manager.release_queue,
+              server_manager.max_queued_messages, health.shared),
+    )
+    server_manager.process.start()
+
+    try:
+        startup = wait_for_server(args.port)
+        if startup is None:
+            raise RuntimeError("Server did not start on port " + str(args.port))
+        startup['connected_ms'] = (time.time() - start_time) * 1000.0
+
+        options = {'snapshot': 'off'} if args.no_snapshot else None
+        clients = [Client(args.port, commands, names, args.requests, args.batch, args.seed + i, options) for i in range(args.clients)]
+
+        profiler = None
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        ticks, handled = pump_until_done(server_manager, clients, server_manager.pump_time_budget, server_manager.min_timer_interval)
+        elapsed = time.perf_counter() - start
+
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+    finally:
+        server_manager.process.terminate()
+        server_manager.process.join()
+
+    latencies = {}
+    for client in clients:
+        for command, values in client.latencies.items():
+            latencies.setdefault(command, []).extend(values)
+
+    report_commands = {}
+    for command, values in sorted(latencies.items()):
+        values.sort()
+        report_commands[command] = {
+            'count': len(values),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': percentile(values, 0.5),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+            'max_ms': values[-1],
+        }
+
+    responses = sum(len(values) for values in latencies.values())
+    return {
+        'objects': args.objects,
+        'clients': args.clients,
+        'batch': args.batch,
+        'build_scene_s': build_time,
+        'startup': startup,
+        'elapsed_s': elapsed,
+        'responses': responses,
+        'throughput_per_s': responses / elapsed if elapsed > 0 else 0.0,
+        'pump_ticks': ticks,
+        'messages_pumped': handled,
+        'busy': sum(client.busy for client in clients),
+        'errors': sum(client.errors for client in clients),
+        'snapshot': not args.no_snapshot,
+        'commands': report_commands,
+    }
+
+def print_report(report):
+    print("Built " + str(report['objects']) + " objects in " + str(round(report['build_scene_s'], 3)) + "s")
+    print("Server took connections " + str(round(report['startup']['connected_ms'], 1)) + "ms after starting the process, "
+          + ", ".join(name + " " + str(round(value, 1)) for name, value in sorted(report['startup'].items()) if name != 'connected_ms'))
+    print(str(report['responses']) + " responses from " + str(report['clients']) + " clients in " + str(round(report['elapsed_s'], 3)) + "s, "
+          + str(round(report['throughput_per_s'], 1)) + " messages/s, " + str(report['pump_ticks']) + " pump ticks")
+
+    if report['busy']:
+        print(str(report['busy']) + " busy replies")
+    if report['errors']:
+        print(str(report['errors']) + " errors")
+
+    print("")
+    print("{:<45} {:>7} {:>10} {:>10} {:>10} {:>10}".format("command", "count", "mean ms", "p50 ms", "p95 ms", "max ms"))
+    for command, stats in report['commands'].items():
+        print("{:<45} {:>7} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            command, stats['count'], stats['mean_ms'], stats['p50_ms'], stats['p95_ms'], stats['max_ms']))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load tests the Promethean server and commands outside blender")
+
+    parser.add_argument("--objects", type=int, default=1000, help="Number of objects in the scene")
+    parser.add_argument("--clients", type=int, default=4, help="Number of clients sending commands at the same time")
+    parser.add_argument("--requests", type=int, default=200, help="Requests sent by each client")
+    parser.add_argument("--batch", type=int, default=10, help="Objects named in each command that takes object names")
+    parser.add_argument("--commands", type=str, default=None, help="Comma separated commands to send, defaults to " + ','.join(default_commands))
+    parser.add_argument("--port", type=int, default=1318, help="Port for the server, the add-on's default port is left alone")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-snapshot", action="store_true", help="Send every read only command to blender instead of answering it from the scene snapshot")
+    parser.add_argument("--profile", type=str, default=None, help="Write a cProfile of the process playing blender to this file")
+    parser.add_argument("--json", dest="json_path", type=str, default=None, help="Also write the report to this file")
+
+    args = parser.parse_args()
+
+    report = run_load_test(args)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(report, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# Replays a trace recorded with the start_recording command against a running Promethean server, and reports throughput and latency.
+# Runs with a plain python interpreter, blender doesn't need to be the one sending the commands.
+#
+# Example usage:
+# python replay_trace.py "D:\traces\session.jsonl.gz" --speed original
+# python replay_trace.py "D:\traces\session.jsonl.gz" --speed max --window 64 --json "D:\traces\replay.json"
+#
+# --speed original sends each message at the time it was recorded, a number like 2 sends at twice that speed,
+# max sends as fast as the server takes them, with at most --window messages waiting for a response.
+
+import sys
+import json
+import socket
+import threading
+import time
+import zlib
+from os.path import dirname, abspath
+
+#Get the PrometheanAI directory and add to path
+sys.path.append(dirname(dirname(abspath(__file__))))
+
+import protocol
+import trace_recorder
+
+BUSY_PREFIX = b'{"error": "busy"'
+
+class Connection:
+    """One framed connection to the server, with a thread reading the responses"""
+    def __init__(self, host, port, encoding, replay):
+        self.socket = socket.create_connection((host, port))
+        self.lock = threading.Lock()
+        self.replay = replay
+
+        # Negotiated before any command is sent, so the response is read here instead of by the thread
+        if encoding != 'json':
+            self.socket.sendall(protocol.encode_frame(b'promethean_negotiate ' + json.dumps({'encoding': encoding}).encode()))
+            protocol.read_frame(self.socket)
+
+        self.thread = threading.Thread(target=self.read_responses, daemon=True)
+        self.thread.start()
+
+    def send(self, request_id, message):
+        with self.lock:
+            self.socket.sendall(protocol.encode_request(message, request_id))
+
+    def read_responses(self):
+        while True:
+            try:
+                frame = protocol.read_frame(self.socket)
+            except OSError:
+                return
+            if frame is None:
+                return
+
+            flags, body = frame
+            request_id, body = protocol.split_request_id(flags, body)
+            self.replay.on_response(request_id, bytes(body))
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+class Replay:
+    def __init__(self, entries, window):
+        self.entries = entries
+        self.send_times = {}
+        self.latencies = {}
+        self.responses = 0
+        self.busy = 0
+        self.mismatches = []
+        self.done = threading.Condition()
+        self.window = threading.BoundedSemaphore(window) if window else None
+
+    def on_response(self, request_id, body):
+        latency_ms = (time.perf_counter() - self.send_times[request_id]) * 1000.0
+        entry = self.entries[request_id - 1]
+
+        if body.startswith(BUSY_PREFIX):
+            self.busy += 1
+        elif 'response_crc' in entry and zlib.crc32(body) != entry['response_crc']:
+            self.mismatches.append({'index': request_id - 1, 'command': entry['command'], 't': entry['t']})
+
+        with self.done:
+            self.latencies[request_id] = latency_ms
+            self.responses += 1
+            self.done.notify_all()
+
+        if self.window:
+            self.window.release()
+
+    def wait(self, timeout):
+        with self.done:
+            return self.done.wait_for(lambda: self.responses >= len(self.entries), timeout)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+def get_command_report(entries, latencies):
+    commands = {}
+    for index, entry in enumerate(entries):
+        latency = latencies.get(index + 1)
+        if latency is None:
+            continue
+        command = commands.setdefault(entry['command'], {'latencies': [], 'recorded_ms': []})
+        command['latencies'].append(latency)
+        command['recorded_ms'].append(entry.get('duration_ms', 0.0))
+
+    report = {}
+    for command, data in sorted(commands.items()):
+        values = sorted(data['latencies'])
+        report[command] = {
+            'count': len(values),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': percentile(values, 0.5),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+            'max_ms': values[-1],
+            # How long blender took to run the command in the recorded session, for comparison
+            'recorded_execute_mean_ms': sum(data['recorded_ms']) / len(data['recorded_ms']),
+        }
+    return report
+
+def replay_trace(path, host, port, speed, window, timeout):
+    header, entries = trace_recorder.read_trace(path)
+    if not entries:
+        return {'path': path, 'messages': 0}
+
+    replay = Replay(entries, window if speed == 'max' else 0)
+    connections = {}
+
+    # Responses are matched to their message by request id, so they can arrive in any order
+    start = time.perf_counter()
+    first_t = entries[0]['t']
+
+    for index, entry in enumerate(entries):
+        if speed != 'max':
+            delay = (entry['t'] - first_t) / float(speed) - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        if replay.window:
+            replay.window.acquire()
+
+        encoding = entry.get('encoding', 'json')
+        if encoding not in connections:
+            connections[encoding] = Connection(host, port, encoding, replay)
+
+        request_id = index + 1
+        replay.send_times[request_id] = time.perf_counter()
+        connections[encoding].send(request_id, entry['message'])
+
+    finished = replay.wait(timeout)
+    elapsed = time.perf_counter() - start
+
+    for connection in connections.values():
+        connection.close()
+
+    recorded_duration = entries[-1]['t'] - first_t
+    return {
+        'path': path,
+        'speed': speed,
+        'messages': len(entries),
+        'responses': replay.responses,
+        'timed_out': not finished,
+        'busy': replay.busy,
+        'elapsed_s': elapsed,
+        'recorded_duration_s': recorded_duration,
+        'throughput_per_s': replay.responses / elapsed if elapsed > 0 else 0.0,
+        'response_mismatches': replay.mismatches,
+        'commands': get_command_report(entries, replay.latencies),
+    }
+
+def print_report(report):
+    print("Replayed " + str(report['responses']) + "/" + str(report['messages']) + " messages in " + str(round(report['elapsed_s'], 3)) + "s"
+          + " (recorded over " + str(round(report['recorded_duration_s'], 3)) + "s), " + str(round(report['throughput_per_s'], 1)) + " messages/s")
+
+    if report['timed_out']:
+        print("Timed out waiting for responses")
+    if report['busy']:
+        print(str(report['busy']) + " busy replies")
+    if report['response_mismatches']:
+        print(str(len(report['response_mismatches'])) + " responses differ from the recording")
+
+    print("")
+    print("{:<45} {:>7} {:>10} {:>10} {:>10} {:>10} {:>10}".format("command", "count", "mean ms", "p50 ms", "p95 ms", "max ms", "rec. ms"))
+    for command, stats in report['commands'].items():
+        print("{:<45} {:>7} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            command, stats['count'], stats['mean_ms'], stats['p50_ms'], stats['p95_ms'], stats['max_ms'], stats['recorded_execute_mean_ms']))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replays a Promethean trace file against a running server")
+
+    parser.add_argument("trace", type=str, help="Trace file written by the start_recording command")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1317)
+    parser.add_argument(
+        "--speed", type=str, default="original",
+        help="'original' to keep the recorded timing, a number to scale it (2 is twice as fast), or 'max'",
+    )
+    parser.add_argument("--window", type=int, default=64, help="Most messages waiting for a response when replaying at max speed")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for the last responses")
+    parser.add_argument("--json", dest="json_path", type=str, default=None, help="Also write the report to this file")
+
+    args = parser.parse_args()
+
+    speed = args.speed
+    if speed == 'original':
+        speed = 1.0
+    elif speed != 'max':
+        speed = float(speed)
+
+    report = replay_trace(args.trace, args.host, args.port, speed, args.window, args.timeout)
+    if not report['messages']:
+        print("The trace has no messages")
+        return
+
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(report, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Stand-in for blender's bmesh module. Only round trips the mesh, commands editing bmesh geometry aren't supported
+
+class BMesh:
+    def __init__(self):
+        self.mesh = None
+
+    def from_mesh(self, mesh):
+        self.mesh = mesh
+
+    def to_mesh(self, mesh):
+        pass
+
+    def free(self):
+        self.mesh = None
+
+def new():
+    return BMesh()
+
+def from_edit_mesh(mesh):
+    bm = BMesh()
+    bm.from_mesh(mesh)
+    return bm
+
+def update_edit_mesh(mesh, loop_triangles=True, destructive=True):
+    pass
@@ -0,0 +1,7 @@
+# Stand-in for blender's bpy module, so the server and the commands can run in a plain python interpreter.
+# See tools/standin/readme.txt
+
+from . import types, app, ops, props, utils, path
+
+data = types.BlendData()
+context = types.Context(data)
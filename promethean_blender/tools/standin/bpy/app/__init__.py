@@ -0,0 +1,10 @@
+# Stand-in for bpy.app
+
+import sys
+
+from . import handlers, timers
+
+version = (4, 0, 0)
+version_string = '4.0.0 (stand-in)'
+binary_path = sys.executable
+background = True
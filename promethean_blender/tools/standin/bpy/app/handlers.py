@@ -0,0 +1,15 @@
+# Stand-in for bpy.app.handlers, nothing calls these unless a script does. See standin_scene.evaluate_depsgraph
+
+def persistent(function):
+    return function
+
+depsgraph_update_pre = []
+depsgraph_update_post = []
+load_pre = []
+load_post = []
+load_factory_startup_post = []
+save_pre = []
+save_post = []
+undo_post = []
+redo_post = []
+frame_change_post = []
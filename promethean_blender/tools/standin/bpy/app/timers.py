@@ -0,0 +1,29 @@
+# Stand-in for bpy.app.timers. There is no blender event loop, so run_due() has to be called by the script driving the stand-in
+
+import time
+
+registered = {}
+
+def register(function, first_interval=0, persistent=False):
+    registered[function] = time.perf_counter() + first_interval
+
+def unregister(function):
+    if function not in registered:
+        raise ValueError("Error: function is not registered")
+    del registered[function]
+
+def is_registered(function):
+    return function in registered
+
+def run_due():
+    """Calls the timers that are due, a timer returning a number runs again after that many seconds"""
+    now = time.perf_counter()
+    for function, due in list(registered.items()):
+        if due > now or function not in registered:
+            continue
+
+        interval = function()
+        if interval is None:
+            registered.pop(function, None)
+        else:
+            registered[function] = now + interval
@@ -0,0 +1,75 @@
+# Stand-in for bpy.ops. Operators the commands rely on for their results are modelled, the rest do nothing and return {'FINISHED'}
+
+import bpy
+from mathutils import Vector
+
+class OperatorModule:
+    def __init__(self, name, operators=None):
+        self.name = name
+        self.operators = operators or {}
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self.operators.get(name, finished)
+
+def finished(*args, **kwargs):
+    return {'FINISHED'}
+
+def select_all(action='TOGGLE'):
+    objects = list(bpy.context.view_layer.objects)
+    if action == 'TOGGLE':
+        action = 'DESELECT' if any(object.select_get() for object in objects) else 'SELECT'
+
+    for object in objects:
+        if action == 'SELECT':
+            object.select_set(object.visible_get())
+        elif action == 'DESELECT':
+            object.select_set(False)
+        elif action == 'INVERT':
+            object.select_set(not object.select_get())
+    return {'FINISHED'}
+
+def delete(use_global=False, confirm=True):
+    for object in bpy.context.selected_objects:
+        if bpy.context.active_object is object:
+            bpy.context.active_object = None
+        bpy.data.objects.remove(object)
+    return {'FINISHED'}
+
+def add_mesh_object(name, vertices, faces, size, location):
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([[x * size for x in vertex] for vertex in vertices], [], faces)
+
+    object = bpy.data.objects.new(name, mesh)
+    object.location = Vector(location)
+    bpy.context.collection.objects.link(object)
+
+    for selected in bpy.context.selected_objects:
+        selected.select_set(False)
+    object.select_set(True)
+    bpy.context.active_object = object
+    return {'FINISHED'}
+
+cube_vertices = [(-1, -1, -1), (-1, -1, 1), (-1, 1, -1), (-1, 1, 1), (1, -1, -1), (1, -1, 1), (1, 1, -1), (1, 1, 1)]
+cube_faces = [(0, 1, 3, 2), (2, 3, 7, 6), (6, 7, 5, 4), (4, 5, 1, 0), (2, 6, 4, 0), (7, 3, 1, 5)]
+
+def primitive_cube_add(size=2.0, location=(0.0, 0.0, 0.0), **kwargs):
+    return add_mesh_object('Cube', cube_vertices, cube_faces, size / 2.0, location)
+
+# An octahedron is close enough to an ico sphere for the bounds and ray casts the stand-in does
+octahedron_vertices = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+octahedron_faces = [(0, 2, 4), (2, 1, 4), (1, 3, 4), (3, 0, 4), (2, 0, 5), (1, 2, 5), (3, 1, 5), (0, 3, 5)]
+
+def primitive_ico_sphere_add(subdivisions=2, radius=1.0, location=(0.0, 0.0, 0.0), **kwargs):
+    return add_mesh_object('Icosphere', octahedron_vertices, octahedron_faces, radius, location)
+
+object = OperatorModule('object', {'select_all': select_all, 'delete': delete})
+mesh = OperatorModule('mesh', {'primitive_cube_add': primitive_cube_add, 'primitive_ico_sphere_add': primitive_ico_sphere_add})
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    module = OperatorModule(name)
+    globals()[name] = module
+    return module
@@ -0,0 +1,16 @@
+# Stand-in for bpy.props, a property is just its default value
+
+def property_default(default):
+    def make_property(name='', description='', default=default, **kwargs):
+        return default
+    return make_property
+
+StringProperty = property_default('')
+BoolProperty = property_default(False)
+IntProperty = property_default(0)
+FloatProperty = property_default(0.0)
+EnumProperty = property_default('')
+FloatVectorProperty = property_default((0.0, 0.0, 0.0))
+IntVectorProperty = property_default((0, 0, 0))
+PointerProperty = property_default(None)
+CollectionProperty = property_default(None)
@@ -0,0 +1,747 @@
+# Stand-in for bpy.types: the blend data model (objects, meshes, collections, scenes) and the base classes the add-on registers
+# Only what the add-on uses is modelled, see tools/standin/readme.txt
+
+from mathutils import Vector, Matrix, Euler
+
+# Base classes of things the add-on registers with blender
+
+class bpy_struct:
+    pass
+
+class Operator(bpy_struct):
+    bl_idname = ''
+    bl_label = ''
+
+    def report(self, type, message):
+        print(message)
+
+class Panel(bpy_struct):
+    pass
+
+class Menu(bpy_struct):
+    pass
+
+class PropertyGroup(bpy_struct):
+    pass
+
+class SpaceView3D(bpy_struct):
+    draw_handlers = []
+
+    @classmethod
+    def draw_handler_add(cls, callback, args, region_type, draw_type):
+        handle = (callback, args)
+        cls.draw_handlers.append(handle)
+        return handle
+
+    @classmethod
+    def draw_handler_remove(cls, handle, region_type):
+        if handle in cls.draw_handlers:
+            cls.draw_handlers.remove(handle)
+
+class Timer(bpy_struct):
+    def __init__(self, time_step):
+        self.time_step = time_step
+
+class WindowManager(bpy_struct):
+    def __init__(self):
+        self.timers = []
+        self.modal_handlers = []
+
+    def event_timer_add(self, time_step, window=None):
+        timer = Timer(time_step)
+        self.timers.append(timer)
+        return timer
+
+    def event_timer_remove(self, timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+
+    def modal_handler_add(self, operator):
+        self.modal_handlers.append(operator)
+        return True
+
+class Event(bpy_struct):
+    def __init__(self, type='TIMER', value='NOTHING', mouse_x=0, mouse_y=0):
+        self.type = type
+        self.value = value
+        self.mouse_x = mouse_x
+        self.mouse_y = mouse_y
+
+class Settings(bpy_struct):
+    """Plain holder for the render, tool and engine settings of a scene"""
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+# Blend data
+
+# IDs changed since the depsgraph was last evaluated, in the order they changed. See standin_scene.evaluate_depsgraph
+updated_ids = {}
+
+class ID(bpy_struct):
+    def __init__(self, name):
+        self._name = name
+        self.library = None
+        self.users = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return "bpy.data." + type(self).__name__.lower() + "s['" + self._name + "']"
+
+    def update_tag(self, refresh=set()):
+        updated_ids[self] = None
+
+class MeshElements(bpy_struct):
+    """Vertices, loops or polygons of a mesh. Attributes are stored as flat lists, like blender stores them in arrays"""
+    def __init__(self, attributes):
+        # attribute name -> number of values per element
+        self.attributes = attributes
+        self.values = {attribute: [] for attribute in attributes}
+        self.count = 0
+        self.on_change = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("bpy_prop_collection[index]: index out of range")
+        return MeshElement(self, index)
+
+    def add(self, count):
+        for attribute, size in self.attributes.items():
+            self.values[attribute].extend([0] * (count * size))
+        self.count += count
+        self.changed()
+
+    def clear(self):
+        for attribute in self.attributes:
+            self.values[attribute] = []
+        self.count = 0
+        self.changed()
+
+    def changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def foreach_get(self, attribute, sequence):
+        values = self.values[attribute]
+        if len(sequence) != len(values):
+            raise RuntimeError("internal error setting the array")
+        sequence[:] = values
+
+    def foreach_set(self, attribute, sequence):
+        size = self.attributes[attribute]
+        if len(sequence) != self.count * size:
+            raise RuntimeError("internal error setting the array")
+        self.values[attribute] = [value.item() if hasattr(value, 'item') else value for value in sequence]
+        self.changed()
+
+class MeshElement(bpy_struct):
+    """A view of one vertex, loop or polygon, reads and writes go to the mesh's arrays"""
+    __slots__ = ('elements', 'index')
+
+    def __init__(self, elements, index):
+        object.__setattr__(self, 'elements', elements)
+        object.__setattr__(self, 'index', index)
+
+    def __getattr__(self, attribute):
+        elements = self.elements
+        if attribute not in elements.attributes:
+            raise AttributeError(attribute)
+
+        size = elements.attributes[attribute]
+        values = elements.values[attribute]
+        if size == 1:
+            return values[self.index]
+        return Vector(values[self.index * size:(self.index + 1) * size])
+
+    def __setattr__(self, attribute, value):
+        elements = self.elements
+        size = elements.attributes[attribute]
+        values = elements.values[attribute]
+        if size == 1:
+            values[self.index] = value
+        else:
+            values[self.index * size:(self.index + 1) * size] = [float(x) for x in value]
+        elements.changed()
+
+    def select_set(self, select):
+        pass
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = MeshElements({'co': 3, 'normal': 3, 'select': 1})
+        self.loops = MeshElements({'vertex_index': 1})
+        self.polygons = MeshElements({'loop_start': 1, 'loop_total': 1, 'select': 1})
+        self.vertices.on_change = self.clear_bounds
+        self.materials = []
+        self._bounds = None
+
+    def clear_bounds(self):
+        self._bounds = None
+
+    def from_pydata(self, vertices, edges, faces):
+        vertices = [list(vertex) for vertex in vertices]
+        self.vertices.clear()
+        self.vertices.add(len(vertices))
+        self.vertices.values['co'] = [float(x) for vertex in vertices for x in vertex]
+
+        self.loops.clear()
+        self.polygons.clear()
+        self.loops.add(sum(len(face) for face in faces))
+        self.polygons.add(len(faces))
+
+        loop_start = 0
+        for index, face in enumerate(faces):
+            self.polygons.values['loop_start'][index] = loop_start
+            self.polygons.values['loop_total'][index] = len(face)
+            self.loops.values['vertex_index'][loop_start:loop_start + len(face)] = list(face)
+            loop_start += len(face)
+
+        self.clear_bounds()
+
+    def update(self, calc_edges=False, calc_edges_loose=False):
+        pass
+
+    def validate(self, verbose=False, clean_customdata=True):
+        return False
+
+    def transform(self, matrix):
+        co = self.vertices.values['co']
+        for i in range(0, len(co), 3):
+            co[i:i + 3] = list(matrix @ Vector(co[i:i + 3]))
+        self.clear_bounds()
+
+    def get_bounds(self):
+        """(min corner, max corner) of the vertices, cached until they change"""
+        if self._bounds is None:
+            co = self.vertices.values['co']
+            if not co:
+                self._bounds = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+            else:
+                xs, ys, zs = co[0::3], co[1::3], co[2::3]
+                self._bounds = ((min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs)))
+        return self._bounds
+
+class Camera(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.lens = 50.0
+        self.sensor_width = 36.0
+        self.clip_start = 0.1
+        self.clip_end = 1000.0
+
+class Light(ID):
+    def __init__(self, name, type='POINT'):
+        super().__init__(name)
+        self.type = type
+
+class Library(ID):
+    def __init__(self, name, filepath=''):
+        super().__init__(name)
+        self.filepath = filepath
+        self.users_id = []
+
+OBJECT_TYPES = ((Mesh, 'MESH'), (Camera, 'CAMERA'), (Light, 'LIGHT'))
+
+class Object(ID):
+    def __init__(self, name, data, blend_data):
+        super().__init__(name)
+        self.data = data
+        self.type = 'EMPTY'
+        for data_type, type_name in OBJECT_TYPES:
+            if isinstance(data, data_type):
+                self.type = type_name
+
+        self.blend_data = blend_data
+        self._location = Vector((0.0, 0.0, 0.0))
+        self._rotation_euler = Euler((0.0, 0.0, 0.0))
+        self._scale = Vector((1.0, 1.0, 1.0))
+        self.matrix_parent_inverse = Matrix.Identity(4)
+        self._parent = None
+        self.hide = False
+        self.hide_viewport = False
+        self.select = False
+        self.mode = 'OBJECT'
+        self.empty_display_size = 1.0
+        self.empty_display_type = 'PLAIN_AXES'
+        self.rigid_body = None
+        self.animation_data = None
+        self.constraints = []
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        # Names are unique, like in blender a clash gets a .001 suffix
+        self.blend_data.objects.rename(self, name)
+        self.update_tag()
+
+    # Like RNA, setting a property tags the object for the depsgraph. Changing a vector in place doesn't
+    def _get_location(self):
+        return self._location
+
+    def _set_location(self, value):
+        self._location = Vector(value)
+        self.update_tag()
+
+    location = property(_get_location, _set_location)
+
+    def _get_rotation_euler(self):
+        return self._rotation_euler
+
+    def _set_rotation_euler(self, value):
+        self._rotation_euler = Euler(value)
+        self.update_tag()
+
+    rotation_euler = property(_get_rotation_euler, _set_rotation_euler)
+
+    def _get_scale(self):
+        return self._scale
+
+    def _set_scale(self, value):
+        self._scale = Vector(value)
+        self.update_tag()
+
+    scale = property(_get_scale, _set_scale)
+
+    def _get_parent(self):
+        return self._parent
+
+    def _set_parent(self, parent):
+        self._parent = parent
+        self.update_tag()
+
+    parent = property(_get_parent, _set_parent)
+
+    @property
+    def matrix_basis(self):
+        rotation = self._rotation_euler.to_matrix().to_4x4()
+        return Matrix.Translation(self._location) @ rotation @ Matrix.Diagonal(list(self._scale) + [1.0])
+
+    @property
+    def matrix_world(self):
+        if self.parent:
+            return self.parent.matrix_world @ self.matrix_parent_inverse @ self.matrix_basis
+        return self.matrix_basis
+
+    @matrix_world.setter
+    def matrix_world(self, matrix):
+        if self.parent:
+            matrix = (self.parent.matrix_world @ self.matrix_parent_inverse).inverted() @ matrix
+
+        location, rotation, scale = matrix.decompose()
+        self._location = location
+        self._rotation_euler = rotation.to_euler()
+        self._scale = scale
+        self.update_tag()
+
+    @property
+    def children(self):
+        return tuple(object for object in self.blend_data.objects if object.parent is self)
+
+    @property
+    def bound_box(self):
+        if self.type != 'MESH':
+            return [(0.0, 0.0, 0.0)] * 8
+
+        (x0, y0, z0), (x1, y1, z1) = self.data.get_bounds()
+        return [(x0, y0, z0), (x0, y0, z1), (x0, y1, z1), (x0, y1, z0), (x1, y0, z0), (x1, y0, z1), (x1, y1, z1), (x1, y1, z0)]
+
+    @property
+    def dimensions(self):
+        if self.type != 'MESH':
+            return Vector((0.0, 0.0, 0.0))
+
+        low, high = self.data.get_bounds()
+        return Vector([(b - a) * s for a, b, s in zip(low, high, self._scale)])
+
+    def hide_get(self, view_layer=None):
+        return self.hide
+
+    def hide_set(self, state, view_layer=None):
+        self.hide = bool(state)
+        if self.hide:
+            self.select = False
+        self.tag_scene()
+
+    def visible_get(self, view_layer=None, viewport=None):
+        return not self.hide and not self.hide_viewport
+
+    def select_get(self, view_layer=None):
+        return self.select
+
+    def select_set(self, state, view_layer=None):
+        self.select = bool(state)
+        self.tag_scene()
+
+    def tag_scene(self):
+        # Like blender, selection and visibility live in the view layer, so changing them tags the scene instead of the object
+        for scene in self.blend_data.scenes:
+            scene.update_tag()
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+class CollectionObjects(bpy_struct):
+    def __init__(self):
+        self.objects = []
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, object):
+        return object in self.objects
+
+    def link(self, object):
+        if object in self.objects:
+            raise RuntimeError("Object '" + object.name + "' already in collection")
+        self.objects.append(object)
+
+    def unlink(self, object):
+        self.objects.remove(object)
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = CollectionObjects()
+        self.children = []
+
+def flatten(value):
+    """A property value as foreach_get lays it out. Matrices come column by column, like blender keeps them in memory"""
+    if isinstance(value, Matrix):
+        return [row[column] for column in range(len(value)) for row in value]
+    if isinstance(value, (int, float, bool)):
+        return [value]
+    return [flat for item in value for flat in flatten(item)]
+
+class BlendDataCollection(bpy_struct):
+    """bpy.data.meshes, bpy.data.collections... looked up by name, in creation order"""
+    def __init__(self, id_type):
+        self.id_type = id_type
+        self.items = {}
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.items.values())[key]
+        return self.items[key]
+
+    def get(self, name, default=None):
+        return self.items.get(name, default)
+
+    def foreach_get(self, attribute, sequence):
+        values = []
+        for item in self.items.values():
+            values.extend(flatten(getattr(item, attribute)))
+        if len(sequence) != len(values):
+            raise RuntimeError("internal error setting the array")
+        sequence[:] = values
+
+    def keys(self):
+        return self.items.keys()
+
+    def values(self):
+        return list(self.items.values())
+
+    def unique_name(self, name):
+        if name not in self.items:
+            return name
+
+        base = name
+        if len(name) > 4 and name[-4] == '.' and name[-3:].isdigit():
+            base = name[:-4]
+
+        number = 1
+        while base + '.%03d' % number in self.items:
+            number += 1
+        return base + '.%03d' % number
+
+    def add(self, item):
+        item._name = self.unique_name(item._name)
+        self.items[item._name] = item
+        return item
+
+    def new(self, name, *args):
+        return self.add(self.id_type(name, *args))
+
+    def rename(self, item, name):
+        if name == item._name:
+            return
+        del self.items[item._name]
+        item._name = name
+        self.add(item)
+
+    def remove(self, item, do_unlink=True):
+        self.items.pop(item._name, None)
+
+class BlendDataObjects(BlendDataCollection):
+    def __init__(self, blend_data):
+        super().__init__(Object)
+        self.blend_data = blend_data
+
+    def new(self, name, object_data):
+        object = self.add(Object(name, object_data, self.blend_data))
+        object.update_tag()
+        return object
+
+    def remove(self, object, do_unlink=True):
+        super().remove(object)
+        object.update_tag()
+
+        for child in object.children:
+            child.parent = None
+
+        for collection in self.blend_data.all_collections():
+            if object in collection.objects:
+                collection.objects.unlink(object)
+
+class BlendData(bpy_struct):
+    def __init__(self):
+        self.filepath = ''
+        self.objects = BlendDataObjects(self)
+        self.meshes = BlendDataCollection(Mesh)
+        self.cameras = BlendDataCollection(Camera)
+        self.lights = BlendDataCollection(Light)
+        self.collections = BlendDataCollection(Collection)
+        self.libraries = BlendDataCollection(Library)
+        self.scenes = BlendDataCollection(Scene)
+        self.materials = BlendDataCollection(ID)
+        self.images = BlendDataCollection(ID)
+
+    def all_collections(self):
+        collections = list(self.collections)
+        for scene in self.scenes:
+            collections.append(scene.collection)
+        return collections
+
+class DepsgraphUpdate(bpy_struct):
+    def __init__(self, id):
+        self.id = id
+        self.is_updated_transform = True
+        self.is_updated_geometry = False
+        self.is_updated_shading = False
+
+class Depsgraph(bpy_struct):
+    def __init__(self, scene, view_layer, updates=()):
+        self.scene = scene
+        self.view_layer = view_layer
+        self.updates = [DepsgraphUpdate(id) for id in updates]
+
+    def update(self):
+        pass
+
+class LayerCollection(bpy_struct):
+    def __init__(self, collection):
+        self.collection = collection
+
+class ViewLayer(bpy_struct):
+    def __init__(self, scene):
+        self.name = 'ViewLayer'
+        self.scene = scene
+        self.active_layer_collection = LayerCollection(scene.collection)
+        self.objects = scene.collection.objects
+
+    def update(self):
+        pass
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.collection = Collection('Scene Collection')
+        self.view_layers = [ViewLayer(self)]
+        self.camera = None
+        self.rigidbody_world = None
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+        self.render = Settings(resolution_x=1920, resolution_y=1080, resolution_percentage=100, filepath='', engine='BLENDER_EEVEE')
+        self.tool_settings = Settings(use_snap=False)
+        self.eevee = Settings(taa_render_samples=64)
+        self.world = None
+
+    def ray_cast(self, depsgraph, origin, direction, distance=1.70141e+38):
+        """Mock ray cast against the world space bounding boxes of the visible meshes.
+        Returns (result, location, normal, index, object, matrix) like blender, with the hit face index always 0"""
+        origin = Vector(origin)
+        direction = Vector(direction).normalized()
+
+        best = None
+        for object in self.collection.objects:
+            if object.type != 'MESH' or not object.visible_get():
+                continue
+
+            hit = ray_box_intersection(origin, direction, distance, object)
+            if hit and (best is None or hit[0] < best[0]):
+                best = hit + (object,)
+
+        if best is None:
+            return False, Vector((0.0, 0.0, 0.0)), Vector((0.0, 0.0, 0.0)), -1, None, Matrix.Identity(4)
+
+        hit_distance, normal, object = best
+        return True, origin + direction * hit_distance, normal, 0, object, object.matrix_world
+
+def ray_box_intersection(origin, direction, distance, object):
+    """Slab test against the object's world space axis aligned bounding box, returns (distance, normal) or None"""
+    matrix = object.matrix_world
+    corners = [matrix @ Vector(corner) for corner in object.bound_box]
+    low = [min(corner[axis] for corner in corners) for axis in range(3)]
+    high = [max(corner[axis] for corner in corners) for axis in range(3)]
+
+    near = -1.0e30
+    far = 1.0e30
+    near_axis = 0
+    near_sign = 1.0
+
+    for axis in range(3):
+        if abs(direction[axis]) < 1e-12:
+            if origin[axis] < low[axis] or origin[axis] > high[axis]:
+                return None
+            continue
+
+        t0 = (low[axis] - origin[axis]) / direction[axis]
+        t1 = (high[axis] - origin[axis]) / direction[axis]
+        sign = -1.0
+        if t0 > t1:
+            t0, t1 = t1, t0
+            sign = 1.0
+
+        if t0 > near:
+            near = t0
+            near_axis = axis
+            near_sign = sign
+        far = min(far, t1)
+
+        if near > far:
+            return None
+
+    # Rays starting inside the box hit it on the way out
+    hit = near if near >= 0.0 else far
+    if hit < 0.0 or hit > distance:
+        return None
+
+    normal = Vector((0.0, 0.0, 0.0))
+    normal[near_axis] = near_sign if near >= 0.0 else -near_sign
+    return hit, normal
+
+# Screen layout, a single window with 3D viewports
+
+class RegionView3D(bpy_struct):
+    def __init__(self):
+        self.view_matrix = Matrix.Identity(4)
+        self.window_matrix = Matrix.Identity(4)
+        self.is_perspective = True
+        self.view_perspective = 'PERSP'
+        self.view_distance = 10.0
+
+    @property
+    def perspective_matrix(self):
+        return self.window_matrix @ self.view_matrix
+
+    @property
+    def view_rotation(self):
+        return self.view_matrix.inverted().to_quaternion()
+
+    @property
+    def view_location(self):
+        return self.view_matrix.inverted().translation
+
+class Region(bpy_struct):
+    def __init__(self, type='WINDOW', x=0, y=0, width=1920, height=1080):
+        self.type = type
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.data = RegionView3D() if type == 'WINDOW' else None
+
+class Space(bpy_struct):
+    def __init__(self, type):
+        self.type = type
+        self.region_3d = None
+
+class Area(bpy_struct):
+    def __init__(self, type='VIEW_3D', regions=None):
+        self.type = type
+        self.regions = regions or []
+        self.spaces = SpaceList(Space(type))
+        if type == 'VIEW_3D':
+            for region in self.regions:
+                if region.type == 'WINDOW':
+                    self.spaces.active.region_3d = region.data
+
+    def tag_redraw(self):
+        pass
+
+class SpaceList(list):
+    def __init__(self, active):
+        super().__init__([active])
+        self.active = active
+
+class Screen(bpy_struct):
+    def __init__(self, areas=None):
+        self.areas = areas or []
+
+class Window(bpy_struct):
+    def __init__(self, screen):
+        self.screen = screen
+
+class FilePaths(bpy_struct):
+    save_version = 1
+
+class Preferences(bpy_struct):
+    def __init__(self):
+        self.filepaths = FilePaths()
+        self.addons = {}
+
+class Context(bpy_struct):
+    def __init__(self, blend_data):
+        self.blend_data = blend_data
+        self.scene = blend_data.scenes.new('Scene')
+        self.view_layer = self.scene.view_layers[0]
+        self.collection = self.scene.collection
+        self.window_manager = WindowManager()
+        self.screen = Screen()
+        self.window = Window(self.screen)
+        self.area = None
+        self.region = None
+        self.preferences = Preferences()
+        self.mode = 'OBJECT'
+        self.active_object = None
+
+    @property
+    def object(self):
+        return self.active_object
+
+    @property
+    def selected_objects(self):
+        return [object for object in self.view_layer.objects if object.select_get()]
+
+    def evaluated_depsgraph_get(self):
+        return Depsgraph(self.scene, self.view_layer)
@@ -0,0 +1,10 @@
+# Stand-in for bpy.utils
+
+registered_classes = []
+
+def register_class(cls):
+    registered_classes.append(cls)
+
+def unregister_class(cls):
+    if cls in registered_classes:
+        registered_classes.remove(cls)
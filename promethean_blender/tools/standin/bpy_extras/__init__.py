@@ -0,0 +1 @@
+# Stand-in for blender's bpy_extras, see tools/standin/readme.txt
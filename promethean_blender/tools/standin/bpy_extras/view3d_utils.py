@@ -0,0 +1,30 @@
+# Stand-in for bpy_extras.view3d_utils, same math as blender's version for perspective views
+
+from mathutils import Vector
+
+def location_3d_to_region_2d(region, rv3d, coord, default=None):
+    projected = rv3d.perspective_matrix @ Vector((coord[0], coord[1], coord[2], 1.0))
+    if projected[3] <= 0.0:
+        return default
+
+    width_half = region.width / 2.0
+    height_half = region.height / 2.0
+    return Vector((width_half + width_half * (projected[0] / projected[3]),
+                   height_half + height_half * (projected[1] / projected[3])))
+
+def region_2d_to_vector_3d(region, rv3d, coord):
+    # Point on the far side of the near plane under the coordinate, relative to the eye
+    x = 2.0 * coord[0] / region.width - 1.0
+    y = 2.0 * coord[1] / region.height - 1.0
+    point = rv3d.perspective_matrix.inverted() @ Vector((x, y, -0.5, 1.0))
+    point = Vector((point[0] / point[3], point[1] / point[3], point[2] / point[3]))
+    return (point - rv3d.view_matrix.inverted().translation).normalized()
+
+def region_2d_to_origin_3d(region, rv3d, coord, clamp=None):
+    return rv3d.view_matrix.inverted().translation
+
+def region_2d_to_location_3d(region, rv3d, coord, depth_location):
+    origin = region_2d_to_origin_3d(region, rv3d, coord)
+    direction = region_2d_to_vector_3d(region, rv3d, coord)
+    distance = (Vector(depth_location) - origin).dot(direction)
+    return origin + direction * distance
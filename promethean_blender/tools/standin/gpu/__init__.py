@@ -0,0 +1,3 @@
+# Stand-in for blender's gpu module, there is nothing to draw to outside blender
+
+from . import shader, types, state
@@ -0,0 +1,11 @@
+# Stand-in for gpu.shader
+
+class Shader:
+    def bind(self):
+        pass
+
+    def uniform_float(self, name, value):
+        pass
+
+def from_builtin(name):
+    return Shader()
@@ -0,0 +1,7 @@
+# Stand-in for gpu.state
+
+def blend_set(mode):
+    pass
+
+def line_width_set(width):
+    pass
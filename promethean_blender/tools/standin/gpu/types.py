@@ -0,0 +1,5 @@
+# Stand-in for gpu.types
+
+class GPUOffScreen:
+    def __init__(self, width, height):
+        raise RuntimeError("GPUOffScreen is not available outside blender")
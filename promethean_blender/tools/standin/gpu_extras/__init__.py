@@ -0,0 +1 @@
+# Stand-in for blender's gpu_extras, see tools/standin/readme.txt
@@ -0,0 +1,381 @@
+# Pure python stand-in for blender's mathutils module, see tools/standin/readme.txt
+# Only the parts used by the add-on are implemented: Vector, Matrix, Euler and Quaternion, with euler order XYZ
+
+import math
+
+def to_floats(values):
+    return [float(value) for value in values]
+
+class Vector:
+    __slots__ = ('_values',)
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = to_floats(values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Vector(self._values[index])
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = float(value)
+
+    def __repr__(self):
+        return 'Vector((' + ', '.join('%.4f' % value for value in self._values) + '))'
+
+    def __eq__(self, other):
+        return isinstance(other, Vector) and self._values == other._values
+
+    def __hash__(self):
+        return hash(tuple(self._values))
+
+    def _get(index):
+        return property(lambda self: self._values[index], lambda self, value: self._values.__setitem__(index, float(value)))
+
+    x = _get(0)
+    y = _get(1)
+    z = _get(2)
+    w = _get(3)
+
+    # Like mathutils, adding or subtracting anything but another vector is a TypeError
+    def __add__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return Vector([a + b for a, b in zip(self._values, other)])
+
+    def __sub__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return Vector([a - b for a, b in zip(self._values, other)])
+
+    def __neg__(self):
+        return Vector([-a for a in self._values])
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector([a * other for a in self._values])
+        return Vector([a * b for a, b in zip(self._values, other)])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return Vector([a / other for a in self._values])
+
+    def __matmul__(self, other):
+        if isinstance(other, Vector):
+            return self.dot(other)
+        return NotImplemented
+
+    def copy(self):
+        return Vector(self._values)
+
+    def freeze(self):
+        return self
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self._values, other))
+
+    def cross(self, other):
+        ax, ay, az = self._values[:3]
+        bx, by, bz = list(other)[:3]
+        return Vector((ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx))
+
+    @property
+    def length(self):
+        return math.sqrt(self.dot(self))
+
+    def normalized(self):
+        length = self.length
+        return self / length if length else self.copy()
+
+    def normalize(self):
+        self._values = self.normalized()._values
+
+    def to_tuple(self, precision=-1):
+        if precision < 0:
+            return tuple(self._values)
+        return tuple(round(value, precision) for value in self._values)
+
+    def to_3d(self):
+        return Vector((self._values + [0.0, 0.0, 0.0])[:3])
+
+    def to_4d(self):
+        return Vector((self._values + [0.0, 0.0, 0.0])[:3] + [1.0])
+
+    def rotate(self, rotation):
+        if isinstance(rotation, (Euler, Quaternion)):
+            rotation = rotation.to_matrix()
+        self._values = (rotation @ self)._values
+
+    def to_track_quat(self, track='Z', up='Y'):
+        """Rotation which points the Z axis along the vector, only the track='Z', up='Y' case is supported"""
+        direction = self.normalized()
+        up_axis = Vector((0.0, 1.0, 0.0))
+        if abs(direction.dot(up_axis)) > 0.9999:
+            up_axis = Vector((1.0, 0.0, 0.0))
+
+        x_axis = up_axis.cross(direction).normalized()
+        y_axis = direction.cross(x_axis)
+
+        return Matrix([[x_axis.x, y_axis.x, direction.x], [x_axis.y, y_axis.y, direction.y], [x_axis.z, y_axis.z, direction.z]]).to_quaternion()
+
+class Matrix:
+    __slots__ = ('_rows',)
+
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self._rows = [to_floats(row) for row in rows]
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)])
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = cls.Identity(4)
+        matrix.translation = vector
+        return matrix
+
+    @classmethod
+    def Rotation(cls, angle, size, axis):
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
+
+        if axis == 'X':
+            rows = [[1, 0, 0], [0, cos_a, -sin_a], [0, sin_a, cos_a]]
+        elif axis == 'Y':
+            rows = [[cos_a, 0, sin_a], [0, 1, 0], [-sin_a, 0, cos_a]]
+        else:
+            rows = [[cos_a, -sin_a, 0], [sin_a, cos_a, 0], [0, 0, 1]]
+
+        matrix = cls(rows)
+        return matrix.to_4x4() if size == 4 else matrix
+
+    @classmethod
+    def Diagonal(cls, vector):
+        values = list(vector)
+        return cls([[values[i] if i == j else 0.0 for j in range(len(values))] for i in range(len(values))])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return (Vector(row) for row in self._rows)
+
+    def __getitem__(self, index):
+        return Vector(self._rows[index])
+
+    def __setitem__(self, index, row):
+        self._rows[index] = to_floats(row)
+
+    def __repr__(self):
+        return 'Matrix((' + ', '.join('(' + ', '.join('%.4f' % value for value in row) + ')' for row in self._rows) + '))'
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and self._rows == other._rows
+
+    def copy(self):
+        return Matrix(self._rows)
+
+    def __matmul__(self, other):
+        size = len(self._rows)
+
+        if isinstance(other, Matrix):
+            columns = list(zip(*other._rows))
+            return Matrix([[sum(a * b for a, b in zip(row, column)) for column in columns] for row in self._rows])
+
+        values = list(other)
+        if size == 4 and len(values) == 3:
+            # Points are transformed with an implied w of 1, like blender
+            x, y, z = values
+            return Vector([row[0] * x + row[1] * y + row[2] * z + row[3] for row in self._rows[:3]])
+
+        return Vector([sum(a * b for a, b in zip(row, values)) for row in self._rows])
+
+    @property
+    def translation(self):
+        return Vector([row[3] for row in self._rows[:3]])
+
+    @translation.setter
+    def translation(self, vector):
+        for row, value in zip(self._rows[:3], vector):
+            row[3] = float(value)
+
+    def transposed(self):
+        return Matrix([list(column) for column in zip(*self._rows)])
+
+    def to_3x3(self):
+        return Matrix([row[:3] for row in self._rows[:3]])
+
+    def to_4x4(self):
+        rows = [row[:3] + [0.0] for row in self._rows[:3]] + [[0.0, 0.0, 0.0, 1.0]]
+        if len(self._rows) == 4:
+            rows = [list(row) for row in self._rows]
+        return Matrix(rows)
+
+    def inverted(self, fallback=None):
+        size = len(self._rows)
+        rows = [row[:] + [1.0 if i == j else 0.0 for j in range(size)] for i, row in enumerate(self._rows)]
+
+        # Gauss-Jordan elimination with partial pivoting
+        for column in range(size):
+            pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+            if abs(rows[pivot][column]) < 1e-12:
+                if fallback is not None:
+                    return fallback
+                raise ValueError("Matrix.inverted(): matrix does not have an inverse")
+
+            rows[column], rows[pivot] = rows[pivot], rows[column]
+            scale = rows[column][column]
+            rows[column] = [value / scale for value in rows[column]]
+
+            for row in range(size):
+                if row != column and rows[row][column]:
+                    factor = rows[row][column]
+                    rows[row] = [a - factor * b for a, b in zip(rows[row], rows[column])]
+
+        return Matrix([row[size:] for row in rows])
+
+    def invert(self):
+        self._rows = self.inverted()._rows
+
+    def to_scale(self):
+        return Vector([Vector([self._rows[row][column] for row in range(3)]).length for column in range(3)])
+
+    def to_euler(self, order='XYZ'):
+        return self.to_3x3().normalized_columns().to_quaternion().to_euler()
+
+    def normalized_columns(self):
+        scale = self.to_scale()
+        return Matrix([[self._rows[row][column] / (scale[column] or 1.0) for column in range(3)] for row in range(3)])
+
+    def to_quaternion(self):
+        m = self.to_3x3()._rows
+        trace = m[0][0] + m[1][1] + m[2][2]
+
+        if trace > 0.0:
+            s = 0.5 / math.sqrt(trace + 1.0)
+            return Quaternion((0.25 / s, (m[2][1] - m[1][2]) * s, (m[0][2] - m[2][0]) * s, (m[1][0] - m[0][1]) * s))
+        if m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = 2.0 * math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2])
+            return Quaternion(((m[2][1] - m[1][2]) / s, 0.25 * s, (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s))
+        if m[1][1] > m[2][2]:
+            s = 2.0 * math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2])
+            return Quaternion(((m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s, 0.25 * s, (m[1][2] + m[2][1]) / s))
+        s = 2.0 * math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1])
+        return Quaternion(((m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s, 0.25 * s))
+
+    def decompose(self):
+        return self.translation, self.to_3x3().normalized_columns().to_quaternion(), self.to_scale()
+
+class Euler:
+    __slots__ = ('_values', 'order')
+
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        self._values = to_floats(angles)
+        self.order = order
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = float(value)
+
+    def __repr__(self):
+        return 'Euler((' + ', '.join('%.4f' % value for value in self._values) + "), '" + self.order + "')"
+
+    x = Vector._get(0)
+    y = Vector._get(1)
+    z = Vector._get(2)
+
+    def copy(self):
+        return Euler(self._values, self.order)
+
+    def to_matrix(self):
+        x, y, z = self._values
+        return Matrix.Rotation(z, 3, 'Z') @ Matrix.Rotation(y, 3, 'Y') @ Matrix.Rotation(x, 3, 'X')
+
+    def to_quaternion(self):
+        return self.to_matrix().to_quaternion()
+
+    def rotate_axis(self, axis, angle):
+        # Rotates around the object's own axis, like blender
+        matrix = self.to_matrix() @ Matrix.Rotation(angle, 3, axis)
+        self._values = list(matrix.to_quaternion().to_euler())
+
+    def rotate(self, other):
+        if isinstance(other, (Euler, Quaternion)):
+            other = other.to_matrix()
+        self._values = list((other.to_3x3() @ self.to_matrix()).to_quaternion().to_euler())
+
+class Quaternion:
+    __slots__ = ('_values',)
+
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0), angle=None):
+        if angle is not None:
+            axis = Vector(values).normalized()
+            half = angle / 2.0
+            values = [math.cos(half)] + list(axis * math.sin(half))
+        self._values = to_floats(values)
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __repr__(self):
+        return 'Quaternion((' + ', '.join('%.4f' % value for value in self._values) + '))'
+
+    w = Vector._get(0)
+    x = Vector._get(1)
+    y = Vector._get(2)
+    z = Vector._get(3)
+
+    def copy(self):
+        return Quaternion(self._values)
+
+    def to_matrix(self):
+        w, x, y, z = self._values
+        return Matrix([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ])
+
+    def to_euler(self, order='XYZ'):
+        m = self.to_matrix()._rows
+
+        # XYZ euler from a rotation matrix R = Rz @ Ry @ Rx
+        y = math.asin(max(-1.0, min(1.0, -m[2][0])))
+        if abs(m[2][0]) < 0.9999999:
+            x = math.atan2(m[2][1], m[2][2])
+            z = math.atan2(m[1][0], m[0][0])
+        else:
+            x = math.atan2(-m[1][2], m[1][1])
+            z = 0.0
+
+        return Euler((x, y, z), order)
+
+    def __matmul__(self, other):
+        if isinstance(other, Quaternion):
+            return (self.to_matrix() @ other.to_matrix()).to_quaternion()
+        return self.to_matrix() @ other
+
+del Vector._get
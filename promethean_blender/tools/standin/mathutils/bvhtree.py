@@ -0,0 +1,66 @@
+# Stand-in for mathutils.bvhtree. There is no tree, ray_cast tests every triangle, which is fine for the few objects a ray reaches
+
+from . import Vector
+
+class BVHTree:
+    def __init__(self, triangles):
+        # (a, b, c, polygon index) per triangle
+        self.triangles = triangles
+
+    @classmethod
+    def FromPolygons(cls, vertices, polygons, all_triangles=False, epsilon=0.0):
+        vertices = [Vector(vertex) for vertex in vertices]
+        triangles = []
+        for index, polygon in enumerate(polygons):
+            # Polygons are split into a fan of triangles
+            for i in range(1, len(polygon) - 1):
+                triangles.append((vertices[polygon[0]], vertices[polygon[i]], vertices[polygon[i + 1]], index))
+        return cls(triangles)
+
+    @classmethod
+    def FromObject(cls, object, depsgraph, deform=True, render=False, cage=False, epsilon=0.0):
+        """The object's mesh in object space, the stand-in has no modifiers to evaluate"""
+        mesh = object.data
+        co = mesh.vertices.values['co']
+        vertex_index = mesh.loops.values['vertex_index']
+        loop_start = mesh.polygons.values['loop_start']
+        loop_total = mesh.polygons.values['loop_total']
+
+        vertices = [co[i:i + 3] for i in range(0, len(co), 3)]
+        polygons = [vertex_index[start:start + total] for start, total in zip(loop_start, loop_total)]
+        return cls.FromPolygons(vertices, polygons)
+
+    def ray_cast(self, origin, direction, distance=1.70141e+38):
+        """Nearest hit along the ray, as (location, normal, index, distance), all None if nothing is hit"""
+        origin = Vector(origin)
+        direction = Vector(direction).normalized()
+
+        best = None
+        for a, b, c, index in self.triangles:
+            # Moller-Trumbore, both sides of the triangle are hit like in blender
+            edge1 = b - a
+            edge2 = c - a
+            p = direction.cross(edge2)
+            determinant = edge1.dot(p)
+            if abs(determinant) < 1e-12:
+                continue
+
+            t_vector = origin - a
+            u = t_vector.dot(p) / determinant
+            if u < 0.0 or u > 1.0:
+                continue
+
+            q = t_vector.cross(edge1)
+            v = direction.dot(q) / determinant
+            if v < 0.0 or u + v > 1.0:
+                continue
+
+            t = edge2.dot(q) / determinant
+            if 0.0 <= t <= distance and (best is None or t < best[0]):
+                best = (t, edge1.cross(edge2).normalized(), index)
+
+        if best is None:
+            return None, None, None, None
+
+        t, normal, index = best
+        return origin + direction * t, normal, index, t
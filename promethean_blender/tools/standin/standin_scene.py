@@ -0,0 +1,122 @@
+# Builds scenes in the bpy stand-in, for load testing and profiling outside blender. See tools/standin/readme.txt
+
+import math
+import random
+
+import bpy
+from mathutils import Vector, Matrix, Euler
+
+def look_at(eye, target, up=(0.0, 0.0, 1.0)):
+    """View matrix of a camera at eye looking at target, the camera looks down its -Z axis like in blender"""
+    eye = Vector(eye)
+    forward = (Vector(target) - eye).normalized()
+    side = forward.cross(Vector(up)).normalized()
+    camera_up = side.cross(forward)
+
+    rotation = Matrix([list(side) + [0.0], list(camera_up) + [0.0], list(-forward) + [0.0], [0.0, 0.0, 0.0, 1.0]])
+    return rotation @ Matrix.Translation(-eye)
+
+def perspective(fov, aspect, near, far):
+    f = 1.0 / math.tan(fov / 2.0)
+    return Matrix([
+        [f / aspect, 0.0, 0.0, 0.0],
+        [0.0, f, 0.0, 0.0],
+        [0.0, 0.0, (far + near) / (near - far), 2.0 * far * near / (near - far)],
+        [0.0, 0.0, -1.0, 0.0],
+    ])
+
+def setup_viewport(eye=(30.0, -30.0, 20.0), target=(0.0, 0.0, 0.0), width=1920, height=1080, fov=math.radians(50.0)):
+    """Gives the context a single 3D viewport looking at target"""
+    region = bpy.types.Region('WINDOW', width=width, height=height)
+    region.data.view_matrix = look_at(eye, target)
+    region.data.window_matrix = perspective(fov, width / float(height), 0.1, 1000.0)
+
+    area = bpy.types.Area('VIEW_3D', [bpy.types.Region('HEADER', height=26), region])
+    bpy.context.screen.areas = [area]
+    bpy.context.area = area
+    bpy.context.region = region
+    return area, region
+
+def add_cube(name, location, rotation=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0), collection=None):
+    bpy.ops.mesh.primitive_cube_add(size=1.0, location=location)
+    object = bpy.context.active_object
+    object.name = name
+    object.data.name = name
+    object.rotation_euler = Euler(rotation)
+    object.scale = Vector(scale)
+
+    if collection:
+        bpy.context.collection.objects.unlink(object)
+        collection.objects.link(object)
+
+    object.select_set(False)
+    return object
+
+def build_scene(count, spacing=3.0, selected_fraction=0.1, hidden_fraction=0.05, parented_fraction=0.1, seed=0):
+    """Fills the scene with count cubes on a grid, with some of them selected, hidden and parented to each other.
+    Returns the list of objects"""
+    random.seed(seed)
+    side = max(1, int(math.ceil(math.sqrt(count))))
+    offset = (side - 1) * spacing / 2.0
+
+    objects = []
+    for index in range(count):
+        location = ((index % side) * spacing - offset, (index // side) * spacing - offset, 0.0)
+        rotation = (0.0, 0.0, random.uniform(0.0, math.pi))
+        size = random.uniform(0.5, 1.5)
+        objects.append(add_cube('Cube_' + str(index), location, rotation, (size, size, size)))
+
+    # A floor under everything, so ray casts going down have something to hit
+    extent = side * spacing + spacing
+    add_cube('Floor', (0.0, 0.0, -1.5), scale=(extent, extent, 1.0))
+
+    for object in objects:
+        roll = random.random()
+        if roll < hidden_fraction:
+            object.hide_set(True)
+        elif roll < hidden_fraction + selected_fraction:
+            object.select_set(True)
+
+    for object in random.sample(objects[1:], int(len(objects[1:]) * parented_fraction)):
+        parent = objects[random.randrange(0, objects.index(object))]
+        object.parent = parent
+        object.matrix_parent_inverse = parent.matrix_world.inverted()
+
+    if objects:
+        bpy.context.active_object = objects[0]
+
+    setup_viewport(eye=(offset + 10.0, -offset - 10.0, offset + 10.0))
+    evaluate_depsgraph()
+    return objects
+
+def is_descendant(object, ancestors):
+    parent = object.parent
+    while parent:
+        if parent in ancestors:
+            return True
+        parent = parent.parent
+    return False
+
+def evaluate_depsgraph():
+    """Plays blender evaluating the depsgraph between event loop iterations:
+    calls the depsgraph_update_post handlers with the IDs changed since the last call. Returns the number of changes"""
+    updated = list(bpy.types.updated_ids)
+    bpy.types.updated_ids.clear()
+    if not updated:
+        return 0
+
+    # Moving an object moves its children too
+    moved = set(updated)
+    updated += [object for object in bpy.data.objects if object not in moved and is_descendant(object, moved)]
+
+    depsgraph = bpy.types.Depsgraph(bpy.context.scene, bpy.context.view_layer, updated)
+    for handler in list(bpy.app.handlers.depsgraph_update_post):
+        handler(bpy.context.scene, depsgraph)
+    return len(updated)
+
+def clear_scene():
+    for object in list(bpy.data.objects):
+        bpy.data.objects.remove(object)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+    bpy.context.active_object = None
@@ -0,0 +1,127 @@
+# Records the messages blender receives to a trace file, so a session can be replayed later with tools/replay_trace.py
+# Note: This file is also imported by tools/replay_trace.py, so it must not import bpy or use relative imports
+#
+# A trace is a gzip compressed json lines file. The first line is a header, every other line is one message:
+# {"t": seconds since recording started, "command": first command, "message": message text (or "message_b64" for binary messages),
+#  "encoding": response encoding (left out for json), "duration_ms": time spent running the commands,
+#  "response_size": size of the response, "response_crc": crc32 of the response, "response": the response (only if asked for).
+#  The response fields are left out when the command returned something other than text or binary data}
+
+import base64
+import gzip
+import json
+import os
+import tempfile
+import time
+import zlib
+
+TRACE_VERSION = 1
+
+default_trace_folder = os.path.join(tempfile.gettempdir(), 'promethean_traces')
+
+trace_file = None
+trace_path = None
+start_time = 0.0
+record_responses = False
+recorded = 0
+
+def is_recording():
+    return trace_file is not None
+
+def open_trace(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def start(path=None, responses=False):
+    """Starts writing a new trace, stopping the current one. Returns the path of the trace"""
+    global trace_file
+    global trace_path
+    global start_time
+    global record_responses
+    global recorded
+
+    stop()
+
+    if not path:
+        os.makedirs(default_trace_folder, exist_ok=True)
+        path = os.path.join(default_trace_folder, 'trace_' + time.strftime('%Y%m%d_%H%M%S') + '.jsonl.gz')
+
+    trace_file = open_trace(path, 'w')
+    trace_path = path
+    start_time = time.time()
+    record_responses = responses
+    recorded = 0
+
+    trace_file.write(json.dumps({'version': TRACE_VERSION, 'start_time': start_time, 'responses': responses}) + '\n')
+    return path
+
+def stop():
+    """Stops recording, returns the number of messages recorded"""
+    global trace_file
+
+    if trace_file:
+        trace_file.close()
+        trace_file = None
+
+    return recorded
+
+def get_response_bytes(response):
+    if isinstance(response, str):
+        return response.encode()
+    if isinstance(response, (bytes, bytearray, memoryview)):
+        return bytes(response)
+    return None
+
+def record(message, command, encoding, received_time, duration_ms, response):
+    global recorded
+
+    entry = {'t': round(received_time - start_time, 6), 'command': command}
+
+    # data can be a memoryview of shared memory, it is copied here since the block is closed once the message is handled
+    message = bytes(message)
+    try:
+        entry['message'] = message.decode('utf-8')
+    except UnicodeDecodeError:
+        entry['message_b64'] = base64.b64encode(message).decode('ascii')
+
+    if encoding != 'json':
+        entry['encoding'] = encoding
+
+    entry['duration_ms'] = round(duration_ms, 3)
+
+    # Responses aren't kept by default, the size and checksum are enough to tell if a replay gave the same result
+    response_bytes = get_response_bytes(response)
+    if response_bytes is not None:
+        entry['response_size'] = len(response_bytes)
+        entry['response_crc'] = zlib.crc32(response_bytes)
+
+        if record_responses:
+            try:
+                entry['response'] = response_bytes.decode('utf-8')
+            except UnicodeDecodeError:
+                entry['response_b64'] = base64.b64encode(response_bytes).decode('ascii')
+
+    trace_file.write(json.dumps(entry) + '\n')
+    # Flushed every message, so the trace is still readable if blender crashes during the session being recorded
+    trace_file.flush()
+    recorded += 1
+
+def read_trace(path):
+    """Returns (header, list of entries) with the messages decoded back to bytes"""
+    with open_trace(path, 'r') as file:
+        header = json.loads(file.readline())
+        entries = []
+
+        for line in file:
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            if 'message_b64' in entry:
+                entry['message'] = base64.b64decode(entry.pop('message_b64'))
+            else:
+                entry['message'] = entry['message'].encode('utf-8')
+            entries.append(entry)
+
+    return header, entries
@@ -1,6 +1,3 @@
-from cgi import test
-from gettext import translation
-from os import name
 import bpy
 from mathutils import Euler, Vector, Quaternion
 from math import *
@@ -8,7 +5,12 @@ import uuid
 from bpy_extras import view3d_utils
 import mathutils
 import os
-import bmesh
+
+try:
+    from . import object_index
+except ImportError:
+    # Imported as a top level module by the background tasks, which never register the index, see find_objects
+    object_index = None
 
 units_multiplier = 100
 
@@ -25,51 +27,81 @@ def convert_in(coordinate):
 def convert_out(coordinate):
     return coordinate * units_multiplier
 
+def find_objects(mesh=False, is_selected=None, is_visible=None):
+    """Same as object_index.find, scanning bpy.data.objects when the index can't be imported"""
+    if object_index:
+        return object_index.find(mesh, is_selected, is_visible)
+
+    return [object for object in bpy.data.objects if (not mesh or object.type == 'MESH')
+            and (is_selected is None or object.select_get() == is_selected)
+            and (is_visible is None or object.visible_get() == is_visible)]
+
+def get_object_positions(objects):
+    """Same as object_index.get_positions, scanning bpy.data.objects when the index can't be imported"""
+    if object_index:
+        return object_index.get_positions(objects)
+
+    positions = {object.name: index for index, object in enumerate(bpy.data.objects)}
+    return [positions[object.name] for object in objects]
+
 def get_all_mesh_objects():
-    return [obj for obj in bpy.data.objects if obj.type == 'MESH']
+    return find_objects(mesh=True)
 
 def get_visible_mesh_objects():
-    return [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.visible_get()]
+    return find_objects(mesh=True, is_visible=True)
 
 def get_selected_mesh_objects():
-    return [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.select_get()]
+    return find_objects(mesh=True, is_selected=True)
 
 def get_selected_objects():
-    return [obj for obj in bpy.data.objects if obj.select_get()]
+    return find_objects(is_selected=True)
 
 def get_unselected_objects():
-    return [obj for obj in bpy.data.objects if not obj.select_get()]
+    return find_objects(is_selected=False)
 
 def get_selected_and_visible_mesh_objects():
-    return [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.select_get() and obj.visible_get()]
+    return find_objects(mesh=True, is_selected=True, is_visible=True)
+
+def get_objects_visible_in_camera(use_bounds=False, objects=None):
+    """Visible meshes, or the given objects, whose origin is in any 3D viewport. With use_bounds, the objects with any corner
+    of their bounding box in a viewport. All objects are projected at once, see points_visible_in_any_region"""
+    if objects is None:
+        objects = get_visible_mesh_objects()
+    if not objects:
+        return []
+
+    if use_bounds:
+        corners = get_world_bounding_boxes(objects)
+        visible = points_visible_in_any_region(bpy.context, corners.reshape(-1, 3)).reshape(-1, 8).any(axis=1)
+    else:
+        #Using Object Origin:
+        visible = points_visible_in_any_region(bpy.context, read_objects_attribute(objects, 'location', 3))
 
-def get_objects_visible_in_camera(use_bounds=False):
-    objects = []
+    return [obj for obj, is_visible in zip(objects, visible) if is_visible]
 
-    for obj in bpy.data.objects:
-        if obj.type == 'MESH' and obj.visible_get():
-            #Using Object Origin:
-            
-            if use_bounds:
-                #Checking each point of bounding box:
-                bounds = get_bounding_box(obj)
-                for point in bounds:
-                    if point_visible_in_any_region(bpy.context, point):
-                        objects.append(obj)
-                        continue
-            else:
-                if point_visible_in_any_region(bpy.context, obj.location):
-                    objects.append(obj)
+def is_object_visible_camera(object):
+    return bool(points_visible_in_any_region(bpy.context, get_bounding_box(object)).any())
 
-    return objects
+def read_objects_attribute(objects, attribute, size):
+    """Reads an attribute of the objects with a single bpy.data.objects.foreach_get, as a (len(objects), size) array"""
+    import numpy
 
-def is_object_visible_camera(object):
-    bounds = get_bounding_box(object)
-    for point in bounds:
-        if point_visible_in_any_region(bpy.context, point):
-            return True
-    return False
+    values = numpy.empty(len(bpy.data.objects) * size, dtype=numpy.float64)
+    bpy.data.objects.foreach_get(attribute, values)
+    return values.reshape(-1, size)[get_object_positions(objects)]
+
+def get_world_bounding_boxes(objects, matrices=None):
+    """Same as get_bounding_box for every object, as a (len(objects), 8, 3) array. matrices are the objects' matrix_world
+    as read with read_objects_attribute, if the caller already has them"""
+    import numpy
 
+    # foreach_get gives each matrix column by column, which is the transposed matrix, so points multiply it from the left
+    if matrices is None:
+        matrices = read_objects_attribute(objects, 'matrix_world', 16)
+    matrices = matrices.reshape(-1, 4, 4)
+    corners = read_objects_attribute(objects, 'bound_box', 24).reshape(-1, 8, 3)
+    corners = numpy.concatenate((corners, numpy.ones((len(objects), 8, 1))), axis=2)
+    return (corners @ matrices)[:, :, :3]
 
 def get_reference_path(object):
     return bpy.path.abspath(object.data.library.filepath) if object.data.library else ''
@@ -236,6 +268,29 @@ def coord_visible_in_region(region, coord):
     
     return True
 
+def points_visible_in_any_region(context, points):
+    """point_visible_in_any_region for a (n, 3) array of points, returns an array of n booleans.
+    Does the same math as view3d_utils.location_3d_to_region_2d, with each viewport's matrix read once for all the points"""
+    import numpy
+
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+    points = numpy.concatenate((points, numpy.ones((len(points), 1))), axis=1)
+    visible = numpy.zeros(len(points), dtype=bool)
+
+    for area, region in get_all_viewports(context):
+        projected = points @ numpy.array(region.data.perspective_matrix).T
+        w = projected[:, 3]
+
+        # Points behind the origin of a perspective view are never visible
+        in_front = w > 0.0
+        w = numpy.where(in_front, w, 1.0)
+
+        x = region.width / 2.0 * (1.0 + projected[:, 0] / w)
+        y = region.height / 2.0 * (1.0 + projected[:, 1] / w)
+        visible |= in_front & (x >= 0) & (y >= 0) & (x <= region.width) & (y <= region.height)
+
+    return visible
+
 def point_visible_in_any_region(context, coord):
     for area, region in get_all_viewports(context):
         if coord_visible_in_region(region, coord):
@@ -352,6 +407,8 @@ def asset_path_to_blend_path(asset_path):
     return asset_path + ".blend"
 
 def get_bmesh(object):
+    import bmesh
+
     bm = bmesh.new()
 
     if object.mode == 'OBJECT':
@@ -362,6 +419,8 @@ def get_bmesh(object):
     return bm 
 
 def update_bmesh(object, bm):
+    import bmesh
+
     if object.mode == 'OBJECT':
         bm.to_mesh(object.data)
     else:
@@ -547,6 +606,57 @@ def get_triangle_positions(object):
     
     return out_verts
 
+def get_triangle_positions_array(object):
+    """Same as get_triangle_positions, as a (n, 3) float32 numpy array read with foreach_get"""
+    import numpy
+
+    mesh = object.data
+
+    coordinates = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get('co', coordinates)
+
+    loop_vertices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+
+    loop_starts = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    loop_totals = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    mesh.polygons.foreach_get('loop_total', loop_totals)
+
+    # Index of every loop, in polygon order
+    polygon_offsets = numpy.cumsum(loop_totals) - loop_totals
+    loop_indices = numpy.repeat(loop_starts - polygon_offsets, loop_totals) + numpy.arange(loop_totals.sum())
+
+    return coordinates.reshape(-1, 3)[loop_vertices[loop_indices]]
+
+def create_mesh_from_triangles(name, vertices, triangles):
+    """Creates a mesh from (n, 3) vertex positions and (m, 3) vertex indices. Uses foreach_set, which is much faster than from_pydata on large meshes"""
+    import numpy
+
+    vertices = numpy.asarray(vertices, dtype=numpy.float32).reshape(-1, 3)
+    triangles = numpy.asarray(triangles, dtype=numpy.int32).reshape(-1, 3)
+
+    mesh = bpy.data.meshes.new(name)
+
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set('co', vertices.ravel())
+
+    mesh.loops.add(triangles.size)
+    mesh.loops.foreach_set('vertex_index', triangles.ravel())
+
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set('loop_start', numpy.arange(0, triangles.size, 3, dtype=numpy.int32))
+    try:
+        mesh.polygons.foreach_set('loop_total', numpy.full(len(triangles), 3, dtype=numpy.int32))
+    except (AttributeError, TypeError, RuntimeError):
+        # loop_total is read only since blender 4.0, where it is worked out from loop_start
+        pass
+
+    mesh.update(calc_edges=True)
+    mesh.validate()
+
+    return mesh
+
 def get_poly_verts(object, polygon):
     verts = []
     